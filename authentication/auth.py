@@ -39,7 +39,8 @@ def get_user_by_email(db: Session, email: str):
     """Get user by email from database"""
     return db.query(InnovatorModel).filter(InnovatorModel.email == email).first()
 
-def verify_token(token: str, credentials_exception: HTTPException, db: Session, token_type: str = "access"):
+def verify_token_claims(token: str, credentials_exception: HTTPException, token_type: str = "access") -> str:
+    """Check the token's signature, expiry and type, returns its email without touching the database"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
@@ -56,6 +57,10 @@ def verify_token(token: str, credentials_exception: HTTPException, db: Session,
         logger.error(f"JWT Error: {str(e)}")
         raise credentials_exception
 
+    return email
+
+def verify_token(token: str, credentials_exception: HTTPException, db: Session, token_type: str = "access"):
+    email = verify_token_claims(token, credentials_exception, token_type)
     user = get_user_by_email(db, email=email)
 
     if not user:
@@ -64,12 +69,18 @@ def verify_token(token: str, credentials_exception: HTTPException, db: Session,
 
     return user
 
-async def get_current_innovator(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"}
     )
 
+# Plain def, so the connection checkout and the query run in the threadpool and an exhausted
+# pool makes the request wait there instead of stalling the event loop
+def get_current_innovator(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return verify_token(token, _credentials_exception(), db)
 
-    return verify_token(token, credentials_exception, db)
+async def get_current_innovator_email(token: str = Depends(oauth2_scheme)) -> str:
+    """Email of a valid access token, for endpoints that must not wait for a database connection"""
+    return verify_token_claims(token, _credentials_exception())
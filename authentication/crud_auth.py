@@ -1,10 +1,17 @@
 from fastapi import status, Depends, HTTPException
-from schema.schemas import Login
+from schema.schemas import Login, InnovatorResponse
 from sqlalchemy.orm import Session
 from database import database
 from models import models
 from crud.hashing import pwd_ctx
 from authentication import auth
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 async def login(credentials: Login, db: Session = Depends(database.get_db)):
     # Filter for the user whose email matches the credentials' email field
@@ -16,32 +23,42 @@ async def login(credentials: Login, db: Session = Depends(database.get_db)):
             detail=f"Invalid Email: user with such email not found"
         )
 
-    # Verification of the password 
-    if not pwd_ctx.verify(credentials.password, innovator.hashed_password):
+    # Verification of the password, also rehashes it when the stored hash uses outdated parameters
+    verified, upgraded_hash = pwd_ctx.verify_and_update(credentials.password, innovator.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Incorrect password"
         )
 
+    if upgraded_hash:
+        try:
+            db.execute(
+                update(models.Innovator)
+                .where(models.Innovator.id == innovator.id)
+                .values(hashed_password=upgraded_hash)
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            # The old hash still works, try again on the next login
+            db.rollback()
+            logger.error(f"Error upgrading password hash for {innovator.email}: {str(e)}")
+
     # Generate JWT Tokens using a short-lived access token
     access_token = auth.create_access_token(data={"sub": innovator.email})
 
     # Create the long-lived refresh token
     refresh_token = auth.create_refresh_token(data={"sub": innovator.email})
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    # For backward compatibility
-    verification_token = auth.verify_token(access_token, credentials_exception, db)
+    # The row is already loaded, no need to decode the new token and look the user up again
+    profile = InnovatorResponse.model_validate(innovator, from_attributes=True)
 
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "verification_token": verification_token
+        "profile": profile,
+        # Deprecated copy of the profile for older clients
+        "verification_token": profile
 
     }
@@ -0,0 +1,215 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, func
+from starlette.concurrency import run_in_threadpool
+from datetime import date, datetime, timedelta, timezone
+from collections import Counter
+from typing import Callable, Optional
+from models import models
+from database.database import insert_for
+import asyncio
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Rows younger than this are left for the next refresh, so transactions that commit
+# late with an earlier timestamp are not skipped by the watermark
+REFRESH_LAG = timedelta(minutes=1)
+# How often each worker folds new rows into the rollups, reads never refresh them
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ROLLUP_REFRESH_SECONDS", "60"))
+
+ENROLLMENTS_WATERMARK = "enrollments_per_domain_per_week"
+SIGNUPS_WATERMARK = "signups_per_language_per_month"
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _lock_watermark(name: str, db: Session, wait: bool = False) -> Optional[models.RollupWatermark]:
+    """
+      Row lock so concurrent refreshes cannot fold the same rows twice. Unless told to wait,
+      returns None when another refresh holds it and the caller skips this refresh.
+    """
+    # The first refreshes of a new rollup all try to create the row, only one insert lands
+    db.execute(insert_for(db, models.RollupWatermark).values(name=name, last_seen=None).on_conflict_do_nothing(index_elements=[models.RollupWatermark.name]))
+    return db.query(models.RollupWatermark).filter(models.RollupWatermark.name == name).with_for_update(skip_locked=not wait).first()
+
+def _fold(rollup_model, key_column: str, count_column: str, counts: Counter, db: Session):
+    for (key, period_start), count in counts.items():
+        row = db.get(rollup_model, {key_column: key, "period_start": period_start})
+        if row:
+            total = getattr(row, count_column) + count
+            # A period whose rows were all deleted has no row, as in a recount from the raw tables
+            if total > 0:
+                setattr(row, count_column, total)
+            else:
+                db.delete(row)
+        elif count > 0:
+            db.add(rollup_model(**{key_column: key, "period_start": period_start, count_column: count}))
+
+# Fold enrollments made since the watermark into the per domain per week rollup
+def refresh_enrollment_rollup(db: Session) -> int:
+    association = models.innovation_learner_association
+    upper_bound = datetime.now(timezone.utc) - REFRESH_LAG
+
+    try:
+        watermark = _lock_watermark(ENROLLMENTS_WATERMARK, db)
+        if watermark is None:
+            db.rollback()
+            logger.info("Enrollment rollup is being refreshed by another request, serving it as it is")
+            return 0
+
+        query = db.query(
+            models.Innovation.course_domain,
+            func.date(association.c.enrolled_at, type_=Date),
+            func.count(),
+            func.max(association.c.enrolled_at)
+        ).join(association, association.c.innovation_id == models.Innovation.id)\
+         .filter(association.c.enrolled_at <= upper_bound)
+        if watermark.last_seen:
+            query = query.filter(association.c.enrolled_at > watermark.last_seen)
+
+        rows = query.group_by(models.Innovation.course_domain, func.date(association.c.enrolled_at, type_=Date)).all()
+
+        counts = Counter()
+        for course_domain, day, count, _ in rows:
+            counts[(course_domain, week_start(day))] += count
+        _fold(models.EnrollmentRollup, "course_domain", "enrollments", counts, db)
+
+        if rows:
+            watermark.last_seen = max(last_seen for _, _, _, last_seen in rows)
+        db.commit()
+
+        logger.info(f"Folded {sum(counts.values())} enrollments into the enrollment rollup")
+        return sum(counts.values())
+
+    except Exception as e:
+        logger.error(f"Error refreshing enrollment rollup: {str(e)}")
+        db.rollback()
+        raise
+
+# Fold innovators who joined since the watermark into the per language per month rollup
+def refresh_signup_rollup(db: Session) -> int:
+    upper_bound = datetime.now(timezone.utc) - REFRESH_LAG
+
+    try:
+        watermark = _lock_watermark(SIGNUPS_WATERMARK, db)
+        if watermark is None:
+            db.rollback()
+            logger.info("Signup rollup is being refreshed by another request, serving it as it is")
+            return 0
+
+        query = db.query(
+            models.Innovator.language,
+            func.date(models.Innovator.date_joined, type_=Date),
+            func.count(),
+            func.max(models.Innovator.date_joined)
+        ).filter(models.Innovator.date_joined <= upper_bound)
+        if watermark.last_seen:
+            query = query.filter(models.Innovator.date_joined > watermark.last_seen)
+
+        rows = query.group_by(models.Innovator.language, func.date(models.Innovator.date_joined, type_=Date)).all()
+
+        counts = Counter()
+        for language, day, count, _ in rows:
+            counts[(language, month_start(day))] += count
+        _fold(models.SignupRollup, "language", "signups", counts, db)
+
+        if rows:
+            watermark.last_seen = max(last_seen for _, _, _, last_seen in rows)
+        db.commit()
+
+        logger.info(f"Folded {sum(counts.values())} signups into the signup rollup")
+        return sum(counts.values())
+
+    except Exception as e:
+        logger.error(f"Error refreshing signup rollup: {str(e)}")
+        db.rollback()
+        raise
+
+# Take enrollments about to be deleted out of the enrollment rollup
+def subtract_enrollments(condition, db: Session):
+    """
+      Called in the deleting transaction before the delete. The watermark stays locked until
+      that commits, so no refresh can fold the rows in between, and only rows up to the
+      watermark are subtracted as the newer ones were never folded.
+    """
+    association = models.innovation_learner_association
+    watermark = _lock_watermark(ENROLLMENTS_WATERMARK, db, wait=True)
+    if watermark.last_seen is None:
+        return
+
+    rows = db.query(
+        models.Innovation.course_domain,
+        func.date(association.c.enrolled_at, type_=Date),
+        func.count()
+    ).join(association, association.c.innovation_id == models.Innovation.id)\
+     .filter(condition, association.c.enrolled_at <= watermark.last_seen)\
+     .group_by(models.Innovation.course_domain, func.date(association.c.enrolled_at, type_=Date))\
+     .all()
+
+    counts = Counter()
+    for course_domain, day, count in rows:
+        counts[(course_domain, week_start(day))] -= count
+    _fold(models.EnrollmentRollup, "course_domain", "enrollments", counts, db)
+
+# Take innovators about to be deleted out of the signup rollup, the same way
+def subtract_signups(condition, db: Session):
+    watermark = _lock_watermark(SIGNUPS_WATERMARK, db, wait=True)
+    if watermark.last_seen is None:
+        return
+
+    rows = db.query(
+        models.Innovator.language,
+        func.date(models.Innovator.date_joined, type_=Date),
+        func.count()
+    ).filter(condition, models.Innovator.date_joined <= watermark.last_seen)\
+     .group_by(models.Innovator.language, func.date(models.Innovator.date_joined, type_=Date))\
+     .all()
+
+    counts = Counter()
+    for language, day, count in rows:
+        counts[(language, month_start(day))] -= count
+    _fold(models.SignupRollup, "language", "signups", counts, db)
+
+def refresh_rollups(session_factory: Callable[[], Session]):
+    db = session_factory()
+    try:
+        refresh_enrollment_rollup(db)
+        refresh_signup_rollup(db)
+    finally:
+        db.close()
+
+async def refresh_rollups_periodically(session_factory: Callable[[], Session], interval: float = ROLLUP_REFRESH_SECONDS):
+    """Fold new rows into the rollups every interval seconds, every worker runs one and skips a locked refresh"""
+    while True:
+        try:
+            await run_in_threadpool(refresh_rollups, session_factory)
+        except Exception as e:
+            logger.error(f"Error refreshing the analytics rollups: {str(e)}")
+        await asyncio.sleep(interval)
+
+# Get enrollments per domain per week
+def get_enrollments_per_domain(db: Session, current_innovator: models.Innovator, course_domain: Optional[str] = None, since: Optional[date] = None):
+    query = db.query(models.EnrollmentRollup)
+    if course_domain:
+        query = query.filter(models.EnrollmentRollup.course_domain == course_domain)
+    if since:
+        query = query.filter(models.EnrollmentRollup.period_start >= week_start(since))
+
+    return query.order_by(models.EnrollmentRollup.period_start, models.EnrollmentRollup.course_domain).all()
+
+# Get signups per language per month
+def get_signups_per_language(db: Session, current_innovator: models.Innovator, language: Optional[str] = None, since: Optional[date] = None):
+    query = db.query(models.SignupRollup)
+    if language:
+        query = query.filter(models.SignupRollup.language == language)
+    if since:
+        query = query.filter(models.SignupRollup.period_start >= month_start(since))
+
+    return query.order_by(models.SignupRollup.period_start, models.SignupRollup.language).all()
@@ -0,0 +1,53 @@
+"""
+  Offline export of the analytics aggregates with pandas.
+
+  Recomputes the same aggregates as the rollup tables from the raw tables, so the
+  rollups can be checked against a full scan or shipped to a warehouse:
+
+      python -m crud.analytics_export <output directory>
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from models import models
+import pandas as pd
+import os
+import sys
+
+
+def _period_start(timestamps: pd.Series, freq: str) -> pd.Series:
+    days = pd.to_datetime(timestamps).dt.tz_localize(None).dt.normalize()
+    if freq == "week":
+        return (days - pd.to_timedelta(days.dt.weekday, unit="D")).dt.date
+    return days.dt.to_period("M").dt.start_time.dt.date
+
+def enrollments_per_domain_per_week(db: Session) -> pd.DataFrame:
+    association = models.innovation_learner_association
+    statement = select(models.Innovation.course_domain, association.c.enrolled_at)\
+        .join(association, association.c.innovation_id == models.Innovation.id)
+    enrollments = pd.read_sql(statement, db.connection())
+
+    enrollments["period_start"] = _period_start(enrollments["enrolled_at"], "week")
+    return enrollments.groupby(["course_domain", "period_start"]).size()\
+        .rename("enrollments").reset_index().sort_values(["period_start", "course_domain"])
+
+def signups_per_language_per_month(db: Session) -> pd.DataFrame:
+    statement = select(models.Innovator.language, models.Innovator.date_joined)
+    signups = pd.read_sql(statement, db.connection())
+
+    signups["period_start"] = _period_start(signups["date_joined"], "month")
+    return signups.groupby(["language", "period_start"]).size()\
+        .rename("signups").reset_index().sort_values(["period_start", "language"])
+
+
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    os.makedirs(output_dir, exist_ok=True)
+
+    db = SessionLocal()
+    try:
+        enrollments_per_domain_per_week(db).to_csv(os.path.join(output_dir, "enrollments_per_domain_per_week.csv"), index=False)
+        signups_per_language_per_month(db).to_csv(os.path.join(output_dir, "signups_per_language_per_month.csv"), index=False)
+    finally:
+        db.close()
@@ -0,0 +1,114 @@
+"""
+  Benchmark the current innovator's course listing against Innovator.registered_courses.
+
+  Seeds one innovator enrolled in --enrollments courses, next to other learners spread
+  over the same courses, then times loading the relationship against paging through
+  get_current_innovator_courses, and prints the plan of the first page's statement as
+  the crud function compiles it. Everything runs in a transaction that is rolled back,
+  so it is safe against any DATABASE_URL:
+
+      DATABASE_URL=sqlite:// python -m crud.benchmark_courses --enrollments 5000
+"""
+from sqlalchemy import insert, select, text
+from database.testing import create_schema, isolated_session
+from models import models
+from crud.innovators import current_innovator_courses_statement, get_current_innovator_courses
+import statistics
+import argparse
+import random
+import time
+
+SAMPLES = 5
+CONTENT = {"intro": {"text": "x" * 1500}, "lessons": [{"title": f"lesson {i}", "minutes": 10} for i in range(20)]}
+
+
+def seed(db, enrollments: int, other_learners: int, courses_per_learner: int) -> int:
+    """Insert the courses and learners, returning the id of the innovator enrolled in all courses"""
+    db.execute(insert(models.Innovation), [
+        {
+            "course_name": f"benchmark course {i}",
+            "course_description": "benchmark",
+            "content": CONTENT,
+            "course_duration": 4,
+            "course_price": "0",
+            "course_tutor": "benchmark",
+            "course_image_path": "/static/images/icpc.png",
+            "course_domain": "benchmark"
+        }
+        for i in range(enrollments)
+    ])
+    db.execute(insert(models.Innovator), [
+        {"fullname": "benchmark", "email": f"benchmark{i}@example.com", "hashed_password": "-", "status": "student", "language": "en"}
+        for i in range(other_learners + 1)
+    ])
+
+    innovation_ids = db.scalars(select(models.Innovation.id).where(models.Innovation.course_domain == "benchmark")).all()
+    innovator_ids = db.scalars(select(models.Innovator.id).where(models.Innovator.fullname == "benchmark").order_by(models.Innovator.id)).all()
+    target_id, others = innovator_ids[0], innovator_ids[1:]
+
+    rows = [{"innovation_id": innovation_id, "innovator_id": target_id} for innovation_id in innovation_ids]
+    for innovator_id in others:
+        rows += [{"innovation_id": innovation_id, "innovator_id": innovator_id} for innovation_id in random.sample(innovation_ids, courses_per_learner)]
+    db.execute(insert(models.innovation_learner_association), rows)
+    db.flush()
+    return target_id
+
+def explain(db, statement) -> list:
+    """Plan of the statement compiled for the session's database, one line per step"""
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        return db.execute(text(f"EXPLAIN {sql}")).scalars().all()
+    if dialect.name == "sqlite":
+        return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()]
+    return []
+
+def median_ms(run, db) -> float:
+    timings = []
+    for _ in range(SAMPLES):
+        db.expire_all()
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def benchmark(enrollments: int, other_learners: int, courses_per_learner: int, page_size: int):
+    create_schema()
+    with isolated_session() as db:
+        target_id = seed(db, enrollments, other_learners, min(courses_per_learner, enrollments))
+        postgres = db.get_bind().dialect.name == "postgresql"
+        if postgres:
+            # Fresh statistics, so the planner sees the seeded table as it is
+            db.execute(text("ANALYZE innovation_learner_association"))
+        innovator = db.get(models.Innovator, target_id)
+
+        def relationship():
+            return len(innovator.registered_courses)
+
+        def first_page():
+            return get_current_innovator_courses(db, innovator, 0, page_size)
+
+        def all_pages():
+            after, has_more = 0, True
+            while has_more:
+                _, after, has_more = get_current_innovator_courses(db, innovator, after, page_size)
+
+        print(f"{enrollments} enrollments, {other_learners} other learners with {courses_per_learner} courses each")
+        print(f"registered_courses (full rows):   {median_ms(relationship, db):8.1f} ms")
+        print(f"first page of {page_size}:              {median_ms(first_page, db):8.1f} ms")
+        print(f"all pages of {page_size}:               {median_ms(all_pages, db):8.1f} ms")
+
+        plan = explain(db, current_innovator_courses_statement(target_id, 0, page_size))
+        if plan:
+            print("\n" + "\n".join(plan))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the paginated course listing of an innovator")
+    parser.add_argument("--enrollments", type=int, default=5000, help="Courses the benchmarked innovator is enrolled in")
+    parser.add_argument("--other-learners", type=int, default=200, help="Other innovators enrolled in the same courses")
+    parser.add_argument("--courses-per-learner", type=int, default=50, help="Courses each other innovator is enrolled in")
+    parser.add_argument("--page-size", type=int, default=50, help="Courses per page")
+    args = parser.parse_args()
+
+    benchmark(args.enrollments, args.other_learners, args.courses_per_learner, args.page_size)
@@ -0,0 +1,103 @@
+"""
+  Benchmark the size and serialization CPU of each response encoding.
+
+  Seeds innovators enrolled in courses, loads them the way GET /api/innovators/all does and
+  validates them through its response model once. The content is then rendered as JSON, as
+  MessagePack straight from the content, and as MessagePack through the JSON it used to be
+  parsed back from, and each body is compressed with gzip and brotli at the levels the
+  middleware uses. Everything runs in a transaction that is rolled back, so it is safe
+  against any DATABASE_URL:
+
+      DATABASE_URL=sqlite:// python -m crud.benchmark_encoding --innovators 500
+"""
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from typing import List
+from database.testing import create_schema, isolated_session
+from models import models
+from schema.schemas import ShowInnovator
+from crud.innovators import get_all_innovators
+from middleware.encoding import compress, brotli, msgpack
+import statistics
+import argparse
+import random
+import json
+import time
+
+SAMPLES = 20
+CONTENT = {"intro": {"text": "x" * 500}, "lessons": [{"title": f"lesson {i}", "minutes": 10} for i in range(5)]}
+
+
+def seed(db, innovators: int, courses: int, courses_per_innovator: int):
+    db.execute(insert(models.Innovation), [
+        {
+            "course_name": f"benchmark course {i}",
+            "course_description": "A course seeded to benchmark the response encodings",
+            "content": CONTENT,
+            "course_duration": 4,
+            "course_price": "0",
+            "course_tutor": "benchmark",
+            "course_image_path": "/static/images/icpc.png",
+            "course_domain": "benchmark"
+        }
+        for i in range(courses)
+    ])
+    db.execute(insert(models.Innovator), [
+        {"fullname": f"benchmark {i}", "email": f"benchmark{i}@example.com", "hashed_password": "-", "status": "student", "language": "en"}
+        for i in range(innovators)
+    ])
+    innovation_ids = db.scalars(select(models.Innovation.id).where(models.Innovation.course_domain == "benchmark")).all()
+    innovator_ids = db.scalars(select(models.Innovator.id).where(models.Innovator.hashed_password == "-")).all()
+    db.execute(insert(models.innovation_learner_association), [
+        {"innovation_id": innovation_id, "innovator_id": innovator_id}
+        for innovator_id in innovator_ids
+        for innovation_id in random.sample(innovation_ids, courses_per_innovator)
+    ])
+    db.flush()
+
+def median_cpu_ms(run):
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.process_time()
+        result = run()
+        timings.append((time.process_time() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def benchmark(innovators: int, courses: int, courses_per_innovator: int):
+    create_schema()
+    with isolated_session() as db:
+        seed(db, innovators, courses, min(courses_per_innovator, courses))
+        loaded = get_all_innovators(db, None)
+        adapter = TypeAdapter(List[ShowInnovator])
+        # Shared by every encoding, so it is timed once
+        start = time.process_time()
+        content = adapter.dump_python(adapter.validate_python(loaded, from_attributes=True), mode="json")
+        print(f"{len(loaded)} innovators with {courses_per_innovator} courses each, response model {(time.process_time() - start) * 1000:.1f} ms CPU")
+
+        renderers = {"json": lambda: JSONResponse(content).body}
+        if msgpack is not None:
+            renderers["msgpack"] = lambda: msgpack.packb(content, use_bin_type=True)
+            renderers["msgpack from json"] = lambda: msgpack.packb(json.loads(JSONResponse(content).body), use_bin_type=True)
+        encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+        print(f"{'encoding':24} {'bytes':>10} {'CPU ms':>8}")
+        for name, render in renderers.items():
+            render_ms, body = median_cpu_ms(render)
+            print(f"{name:24} {len(body):10} {render_ms:8.2f}")
+            if name == "msgpack from json":
+                continue
+            for encoding in encodings:
+                compress_ms, compressed = median_cpu_ms(lambda: compress(body, encoding))
+                print(f"{f'{name} + {encoding}':24} {len(compressed):10} {render_ms + compress_ms:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the size and serialization CPU of each response encoding")
+    parser.add_argument("--innovators", type=int, default=500, help="Innovators in the listing")
+    parser.add_argument("--courses", type=int, default=200, help="Courses they are enrolled in")
+    parser.add_argument("--courses-per-innovator", type=int, default=5, help="Courses each innovator is enrolled in")
+    args = parser.parse_args()
+
+    benchmark(args.innovators, args.courses, args.courses_per_innovator)
@@ -0,0 +1,97 @@
+"""
+  Benchmark time-to-first-content of the catalog page.
+
+  Before prerendering, the browser loaded the static page and then had to log in, fetch
+  the innovator and fetch the course list before showing any course. This times that
+  sequence of round trips against one request for the prerendered page, cold, warm and
+  revalidated with its ETag. Everything runs in a transaction that is rolled back, so it
+  is safe against any DATABASE_URL:
+
+      DATABASE_URL=sqlite:// ARGON2_TIME_COST=1 ARGON2_MEMORY_COST=8 ARGON2_PARALLELISM=1 \
+          python -m crud.benchmark_pages --courses 200
+"""
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from database.testing import create_schema, isolated_session, override_get_db
+from models import models
+from crud.pages import page_cache
+from main import app
+import statistics
+import argparse
+import time
+
+SAMPLES = 20
+EMAIL = "benchmark-pages@example.com"
+PASSWORD = "benchmark"
+
+
+def seed(db, courses: int):
+    db.execute(insert(models.Innovation), [
+        {
+            "course_name": f"benchmark course {i}",
+            "course_description": "A course seeded to benchmark the catalog page",
+            "content": {"intro": {"text": "benchmark"}},
+            "course_duration": 4,
+            "course_price": "0",
+            "course_tutor": "benchmark",
+            "course_image_path": "/static/images/icpc.png",
+            "course_domain": "benchmark"
+        }
+        for i in range(courses)
+    ])
+    db.flush()
+
+def median_ms(run) -> float:
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def benchmark(courses: int):
+    create_schema()
+    with isolated_session() as db:
+        override_get_db(app, db)
+        client = TestClient(app)
+        seed(db, courses)
+        client.post("/api/innovators/new", json={"fullname": "Benchmark", "email": EMAIL, "status": "student", "language": "en", "password": PASSWORD})
+        headers = {"Accept-Encoding": "br, gzip"}
+
+        def round_trips():
+            # Static page, then login, the innovator and the course list before the first course shows
+            client.get("/static/frontend.html", headers=headers)
+            token = client.post("/api/auth/login", data={"username": EMAIL, "password": PASSWORD}).json()["access_token"]
+            authorized = {**headers, "Authorization": f"Bearer {token}"}
+            client.get("/api/innovators/get-innovator", params={"email": EMAIL}, headers=authorized).raise_for_status()
+            client.get("/api/innovations/all", headers=authorized).raise_for_status()
+
+        def cold():
+            page_cache.clear()
+            client.get("/catalog", headers=headers)
+
+        def warm():
+            client.get("/catalog", headers=headers)
+
+        etag = client.get("/catalog", headers=headers).headers["etag"]
+
+        def revalidated():
+            client.get("/catalog", headers={**headers, "If-None-Match": etag})
+
+        response = client.get("/catalog", headers=headers)
+        encoding = response.headers.get("content-encoding")
+        page = page_cache.get("catalog", db)
+        print(f"{courses} courses, catalog page {len(page.bodies[None])} bytes, {len(page.bodies[encoding])} bytes with {encoding}")
+        print(f"static page and API round trips: {median_ms(round_trips):8.2f} ms")
+        print(f"prerendered page, cold:          {median_ms(cold):8.2f} ms")
+        print(f"prerendered page, warm:          {median_ms(warm):8.2f} ms")
+        print(f"prerendered page, 304:           {median_ms(revalidated):8.2f} ms")
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-content of the prerendered catalog page")
+    parser.add_argument("--courses", type=int, default=200, help="Courses in the catalog")
+    args = parser.parse_args()
+
+    benchmark(args.courses)
@@ -0,0 +1,117 @@
+"""
+  Benchmark the innovator write paths against the read-modify-write code they replaced.
+
+  Before, each write loaded the row through the ORM, changed it, committed and refreshed
+  it. Now create, update and delete are one INSERT, UPDATE or DELETE ... RETURNING each,
+  and a taken email is refused by one SELECT before the password is hashed. This times
+  every path and counts the statements it sends. Everything runs in a transaction that is
+  rolled back, so it is safe against any DATABASE_URL:
+
+      DATABASE_URL=sqlite:// ARGON2_TIME_COST=1 ARGON2_MEMORY_COST=8 ARGON2_PARALLELISM=1 \
+          python -m crud.benchmark_writes --samples 50
+"""
+from sqlalchemy import event
+from datetime import datetime
+from database.testing import create_schema, isolated_session
+from models.models import Innovator as InnovatorModel
+from schema.schemas import InnovatorCreate, InnovatorUpdate
+from crud import hashing
+from crud.innovation import ValidationException
+from crud.innovators import create_innovator, update_innovator, delete_innovator
+import statistics
+import argparse
+import time
+
+
+def innovator_data(schema, email: str):
+    return schema(fullname="Benchmark", email=email, status="student", language="en", password="benchmark")
+
+
+# The write paths as they were before they were collapsed into single statements
+def create_before(data: InnovatorCreate, db):
+    if db.query(InnovatorModel).filter(InnovatorModel.email == data.email).first():
+        raise ValueError(f"Innovator with the email: {data.email} already exists")
+    innovator = InnovatorModel(
+        fullname=data.fullname,
+        email=data.email,
+        hashed_password=hashing.Hash.argon2(data.password),
+        status=data.status,
+        language=data.language,
+        date_joined=datetime.now()
+    )
+    db.add(innovator)
+    db.commit()
+    db.refresh(innovator)
+    return innovator
+
+def update_before(email: str, data: InnovatorUpdate, db):
+    innovator = db.query(InnovatorModel).filter(InnovatorModel.email == email).first()
+    innovator.fullname = data.fullname
+    innovator.email = data.email
+    innovator.hashed_password = hashing.Hash.argon2(data.password)
+    innovator.status = data.status
+    innovator.language = data.language
+    db.commit()
+    db.refresh(innovator)
+    return innovator
+
+def delete_before(email: str, db):
+    innovator = db.query(InnovatorModel).filter(InnovatorModel.email == email).first()
+    db.delete(innovator)
+    db.commit()
+
+
+class Timings:
+    """Milliseconds and statements of every run of each write path"""
+
+    def __init__(self, db):
+        self.statements = 0
+        self.runs = {}
+        event.listen(db.get_bind(), "before_cursor_execute", self._count)
+
+    def _count(self, connection, cursor, statement: str, *args):
+        # The savepoints of the test transaction are not part of the write path
+        if not statement.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            self.statements += 1
+
+    def run(self, name: str, write):
+        statements = self.statements
+        start = time.perf_counter()
+        try:
+            write()
+        except (ValueError, ValidationException):
+            pass
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.runs.setdefault(name, []).append((elapsed_ms, self.statements - statements))
+
+    def report(self):
+        for name, runs in self.runs.items():
+            print(f"{name:28} {statistics.median(ms for ms, _ in runs):8.2f} ms  {max(count for _, count in runs):3} statements")
+
+
+def benchmark(samples: int):
+    create_schema()
+    with isolated_session() as db:
+        timings = Timings(db)
+        for version, create, update, delete in (
+            ("before", create_before, update_before, lambda email: delete_before(email, db)),
+            ("after", create_innovator, lambda email, data, db: update_innovator(email, data, db, None), lambda email: delete_innovator(email, db, None))
+        ):
+            for i in range(samples):
+                email, renamed = f"benchmark-{version}-{i}@example.com", f"benchmark-{version}-{i}-renamed@example.com"
+                timings.run(f"create {version}", lambda: create(innovator_data(InnovatorCreate, email), db))
+                timings.run(f"create taken email {version}", lambda: create(innovator_data(InnovatorCreate, email), db))
+                timings.run(f"update {version}", lambda: update(email, innovator_data(InnovatorUpdate, renamed), db))
+                timings.run(f"delete {version}", lambda: delete(renamed))
+                db.expunge_all()
+
+        print(f"{samples} samples per write path, median time and statements sent")
+        timings.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the innovator write paths before and after single-statement writes")
+    parser.add_argument("--samples", type=int, default=50, help="Runs of each write path")
+    args = parser.parse_args()
+
+    benchmark(args.samples)
@@ -0,0 +1,69 @@
+"""
+  Pick argon2 parameters for this machine.
+
+  Times argon2id hashes over a grid of memory and time costs and reports the strongest
+  setting whose median latency fits the budget. Run it on the target instance size:
+
+      python -m crud.calibrate_hashing --budget-ms 250 --max-memory-mib 64 --concurrency 4
+
+  --concurrency bounds memory: that many logins hashing at once must fit in
+  --max-memory-mib. Put the printed values in the environment; existing hashes are
+  upgraded on the next login.
+"""
+from passlib.hash import argon2
+from crud.hashing import ARGON2_PARALLELISM
+import statistics
+import argparse
+import time
+
+MEMORY_STEPS_MIB = [8, 12, 16, 19, 24, 32, 46, 64, 96, 128, 256]
+MAX_TIME_COST = 10
+SAMPLES = 5
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, samples: int = SAMPLES) -> float:
+    """Median milliseconds to hash one password with the given parameters"""
+    hasher = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(budget_ms: float, max_memory_mib: int, concurrency: int, parallelism: int):
+    """Strongest (memory, time) pair under the budget, trying larger memory first"""
+    memory_limit_mib = max_memory_mib // max(concurrency, 1)
+    candidates = [mib for mib in MEMORY_STEPS_MIB if mib <= memory_limit_mib] or [min(MEMORY_STEPS_MIB)]
+
+    best = None
+    for memory_mib in candidates:
+        for time_cost in range(1, MAX_TIME_COST + 1):
+            elapsed = measure(time_cost, memory_mib * 1024, parallelism)
+            print(f"memory={memory_mib:>4} MiB time_cost={time_cost:>2} parallelism={parallelism}: {elapsed:8.1f} ms")
+            if elapsed > budget_ms:
+                break
+            # More memory beats more passes against GPU attacks, so keep the largest memory that fits
+            if best is None or (memory_mib, time_cost) > (best[0], best[1]):
+                best = (memory_mib, time_cost, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate argon2 cost against a login latency budget")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Target hash latency in milliseconds")
+    parser.add_argument("--max-memory-mib", type=int, default=128, help="Memory the instance can spend on hashing")
+    parser.add_argument("--concurrency", type=int, default=2, help="Logins expected to hash at the same time")
+    parser.add_argument("--parallelism", type=int, default=ARGON2_PARALLELISM, help="Argon2 lanes, at most the number of cores")
+    args = parser.parse_args()
+
+    best = calibrate(args.budget_ms, args.max_memory_mib, args.concurrency, args.parallelism)
+    if best is None:
+        print("No setting fits the budget, raise --budget-ms or lower the memory")
+    else:
+        memory_mib, time_cost, elapsed = best
+        print(f"\nStrongest setting within {args.budget_ms} ms ({elapsed:.1f} ms):")
+        print(f"ARGON2_TIME_COST={time_cost}")
+        print(f"ARGON2_MEMORY_COST={memory_mib * 1024}")
+        print(f"ARGON2_PARALLELISM={args.parallelism}")
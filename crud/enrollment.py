@@ -0,0 +1,235 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, select, update
+from starlette.concurrency import run_in_threadpool
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+from models import models
+from database.database import insert_for, is_sqlite, release_session
+from recommender.co_enrollment import co_enrollment_index
+from recommender.typeahead import typeahead_index
+import asyncio
+import threading
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Enrollment requests for the same course are grouped for this long, or until the batch is full
+ENROLLMENT_BATCH_WINDOW_MS = float(os.getenv("ENROLLMENT_BATCH_WINDOW_MS", "5"))
+ENROLLMENT_BATCH_MAX = int(os.getenv("ENROLLMENT_BATCH_MAX", "200"))
+
+ENROLLED = "enrolled"
+ALREADY_ENROLLED = "already_enrolled"
+FULL = "full"
+NOT_FOUND = "not_found"
+
+
+# Enroll several innovators in one course with set-based statements, without touching the innovation row
+def enroll_innovators(course_name: str, innovator_ids: List[int], db: Session) -> Dict[int, str]:
+    association = models.innovation_learner_association
+    seats = models.InnovationSeats
+    innovator_ids = list(dict.fromkeys(innovator_ids))
+
+    try:
+        innovation_id = db.query(models.Innovation.id).filter(models.Innovation.course_name == course_name).scalar()
+        if innovation_id is None:
+            return {innovator_id: NOT_FOUND for innovator_id in innovator_ids}
+
+        existing = set(db.scalars(
+            select(association.c.innovator_id)
+            .where(association.c.innovation_id == innovation_id, association.c.innovator_id.in_(innovator_ids))
+        ).all())
+        fresh = [innovator_id for innovator_id in innovator_ids if innovator_id not in existing]
+
+        # Reserve seats for the whole batch with one conditional increment, no row means no limit
+        granted = len(fresh)
+        limited = False
+        if fresh:
+            grant = case(
+                (seats.taken >= seats.capacity, 0),
+                (seats.capacity - seats.taken < len(fresh), seats.capacity - seats.taken),
+                else_=len(fresh)
+            )
+            reserved = db.execute(
+                update(seats)
+                .where(seats.innovation_id == innovation_id)
+                .values(taken=seats.taken + grant, last_grant=grant)
+                .returning(seats.last_grant)
+            ).scalar()
+            if reserved is not None:
+                granted = reserved
+                limited = True
+
+        enrolled = {}
+        if granted:
+            statement = insert_for(db, association)\
+                .values([{"innovation_id": innovation_id, "innovator_id": innovator_id} for innovator_id in fresh[:granted]])\
+                .on_conflict_do_nothing()\
+                .returning(association.c.innovator_id, association.c.enrolled_at)
+            enrolled = dict(db.execute(statement).all())
+
+            # Give back seats reserved for innovators that another batch enrolled first
+            unused = granted - len(enrolled)
+            if limited and unused:
+                db.execute(update(seats).where(seats.innovation_id == innovation_id).values(taken=seats.taken - unused))
+
+        db.commit()
+
+    except Exception as e:
+        logger.error(f"Error enrolling {len(innovator_ids)} innovators in {course_name}: {str(e)}")
+        db.rollback()
+        raise
+
+    _record_co_enrollments(innovation_id, enrolled, db)
+    if enrolled:
+        typeahead_index.add_popularity(innovation_id, len(enrolled))
+
+    results = {}
+    for innovator_id in innovator_ids:
+        if innovator_id in enrolled:
+            results[innovator_id] = ENROLLED
+        elif innovator_id in existing or innovator_id in fresh[:granted]:
+            results[innovator_id] = ALREADY_ENROLLED
+        else:
+            results[innovator_id] = FULL
+
+    logger.info(f"Enrolled {len(enrolled)} of {len(innovator_ids)} innovators in {course_name}")
+    return results
+
+def _record_co_enrollments(innovation_id: int, enrolled: Dict[int, datetime], db: Session):
+    if not enrolled:
+        return
+
+    association = models.innovation_learner_association
+    try:
+        other_courses = defaultdict(list)
+        rows = db.execute(
+            select(association.c.innovator_id, association.c.innovation_id)
+            .where(association.c.innovator_id.in_(list(enrolled)), association.c.innovation_id != innovation_id)
+        ).all()
+        for innovator_id, other_id in rows:
+            other_courses[innovator_id].append(other_id)
+
+        for innovator_id, enrolled_at in enrolled.items():
+            co_enrollment_index.record_enrollment(innovation_id, other_courses[innovator_id], enrolled_at=enrolled_at)
+    except Exception as e:
+        logger.error(f"Error updating co-enrollment index for innovation {innovation_id}: {str(e)}")
+
+# Set or clear the seat limit of an innovation
+def set_seat_capacity(course_name: str, capacity: Optional[int], db: Session, current_innovator: models.Innovator):
+    association = models.innovation_learner_association
+    seats = models.InnovationSeats
+
+    try:
+        innovation_id = db.query(models.Innovation.id).filter(models.Innovation.course_name == course_name).scalar()
+        if innovation_id is None:
+            return None
+
+        if capacity is None:
+            db.execute(delete(seats).where(seats.innovation_id == innovation_id))
+            db.commit()
+            return {"course_name": course_name, "seat_capacity": None, "seats_taken": None}
+
+        # A new limit starts from the learners already enrolled
+        taken = select(func.count()).select_from(association).where(association.c.innovation_id == innovation_id).scalar_subquery()
+        statement = insert_for(db, seats)\
+            .values(innovation_id=innovation_id, capacity=capacity, taken=taken, last_grant=0)
+        statement = statement.on_conflict_do_update(index_elements=[seats.innovation_id], set_={"capacity": capacity})\
+            .returning(seats.capacity, seats.taken)
+        row = db.execute(statement).one()
+        db.commit()
+
+        return {"course_name": course_name, "seat_capacity": row.capacity, "seats_taken": row.taken}
+
+    except Exception as e:
+        logger.error(f"Error setting seat capacity of {course_name}: {str(e)}")
+        db.rollback()
+        raise
+
+
+class EnrollmentBatcher:
+    """
+      Groups concurrent enrollment requests per course and writes each group with
+      enroll_innovators in one transaction, so a registration spike costs one
+      round of statements per batch instead of per request.
+
+      Waiting requests hold no connection: their session, used so far only to
+      authenticate, is released before they wait, and a batch checks a connection out
+      again through the session of its first request alone. That way it runs on whatever
+      database the routes were given, test transactions included. SQLite has a single
+      writer and its in-memory mode a single connection, so batches are written one at a
+      time there.
+    """
+
+    def __init__(self, window_ms: float = ENROLLMENT_BATCH_WINDOW_MS, max_batch: int = ENROLLMENT_BATCH_MAX):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = defaultdict(list)
+        self._flush_handles = {}
+        # Batches being written, referenced until done so the loop cannot collect them mid-write
+        self._writes = set()
+        self._sqlite_lock = threading.Lock()
+
+    async def enroll(self, course_name: str, innovator_id: int, db: Session) -> str:
+        # A burst larger than the pool would otherwise have every waiting request hold a connection
+        release_session(db)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending[course_name]
+        pending.append((innovator_id, db, future))
+        if len(pending) >= self.max_batch:
+            self._flush(course_name)
+        elif course_name not in self._flush_handles:
+            self._flush_handles[course_name] = loop.call_later(self.window, self._flush, course_name)
+
+        return await future
+
+    def _flush(self, course_name: str):
+        handle = self._flush_handles.pop(course_name, None)
+        if handle:
+            handle.cancel()
+
+        batch = self._pending.pop(course_name, [])
+        if batch:
+            task = asyncio.ensure_future(self._write(course_name, batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, course_name: str, batch):
+        try:
+            results = await run_in_threadpool(self._write_batch, course_name, [innovator_id for innovator_id, _, _ in batch], batch[0][1])
+            for innovator_id, _, future in batch:
+                if not future.done():
+                    future.set_result(results[innovator_id])
+        except Exception as e:
+            logger.error(f"Error writing a batch of {len(batch)} enrollments in {course_name}: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _write_batch(self, course_name: str, innovator_ids: List[int], db: Session) -> Dict[int, str]:
+        # The batch is written for every request in it, so the request that brought the
+        # session must not cancel it by disconnecting
+        state = db.info.pop("request_state", None)
+        if state is not None and db in state.sessions:
+            state.sessions.remove(db)
+
+        if is_sqlite(db):
+            with self._sqlite_lock:
+                return enroll_innovators(course_name, innovator_ids, db)
+        return enroll_innovators(course_name, innovator_ids, db)
+
+    async def drain(self):
+        """Write the pending batches and wait for every batch being written, called on shutdown"""
+        for course_name in list(self._pending):
+            self._flush(course_name)
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+# Shared per-worker batcher used by the API
+enrollment_batcher = EnrollmentBatcher()
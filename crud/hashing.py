@@ -1,6 +1,31 @@
 from passlib.context import CryptContext
+import os
 
-pwd_ctx = CryptContext(schemes=["argon2"], deprecated="auto")
+def argon2_setting(name: str, default: int, minimum: int) -> int:
+    """Integer Argon2 parameter from the environment, refused at startup rather than on the first login"""
+    value = os.getenv(name, str(default))
+    try:
+        setting = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+    if setting < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {setting}")
+    return setting
+
+# Argon2 cost, tune for the instance with python -m crud.calibrate_hashing.
+# Stored hashes made with other parameters are upgraded on the next successful login.
+ARGON2_TIME_COST = argon2_setting("ARGON2_TIME_COST", 3, 1)
+ARGON2_PARALLELISM = argon2_setting("ARGON2_PARALLELISM", 4, 1)
+# KiB, Argon2 needs at least 8 per lane
+ARGON2_MEMORY_COST = argon2_setting("ARGON2_MEMORY_COST", 65536, 8 * ARGON2_PARALLELISM)
+
+pwd_ctx = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM
+)
 
 class Hash():
     def argon2(password: str):
@@ -0,0 +1,168 @@
+"""
+  Content-addressed storage of course images.
+
+  Uploads are streamed to disk while they are hashed, then stored once under their
+  SHA-256 digest, so the URL of an image never changes and can be cached forever:
+
+      /media/images/<digest[:2]>/<digest>.<ext>          original
+      /media/images/<digest[:2]>/<digest>.thumb.webp     thumbnail
+      /media/images/<digest[:2]>/<digest>.card.webp      card
+
+  The WebP variants are rendered in a process pool after the upload has been answered, and
+  only once the image has been attached to its course.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import AsyncIterator, Dict, Optional
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
+import tempfile
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MEDIA_DIR = os.getenv("MEDIA_DIR", "media")
+MEDIA_URL = "/media"
+IMAGE_DIR = os.path.join(MEDIA_DIR, "images")
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+
+# Variant name to the exact size it is cropped to
+IMAGE_VARIANTS = {
+    "thumb": (160, 160),
+    "card": (640, 360)
+}
+
+# Pillow format to the extension originals are stored with, other formats are refused
+IMAGE_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+
+class ImageTooLarge(Exception):
+    pass
+
+class UnsupportedImage(Exception):
+    pass
+
+
+def _image_path(digest: str, suffix: str) -> str:
+    return os.path.join(IMAGE_DIR, digest[:2], f"{digest}.{suffix}")
+
+def image_url(digest: str, suffix: str) -> str:
+    return f"{MEDIA_URL}/images/{digest[:2]}/{digest}.{suffix}"
+
+def variant_urls(digest: str) -> Dict[str, str]:
+    return {name: image_url(digest, f"{name}.webp") for name in IMAGE_VARIANTS}
+
+async def _stream_to_disk(chunks: AsyncIterator[bytes]):
+    """Write chunks to a temporary file next to the store, returning its path, digest and size"""
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=IMAGE_DIR, suffix=".upload")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(descriptor, "wb") as upload:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise ImageTooLarge(f"Images are limited to {MAX_IMAGE_BYTES} bytes")
+                digest.update(chunk)
+                upload.write(chunk)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    return temporary_path, digest.hexdigest(), size
+
+def _detect_format(path: str) -> str:
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception as e:
+        raise UnsupportedImage(f"Not a readable image: {str(e)}")
+    if image_format not in IMAGE_FORMATS:
+        raise UnsupportedImage(f"Unsupported image format {image_format}")
+    return IMAGE_FORMATS[image_format]
+
+async def store_image(chunks: AsyncIterator[bytes]) -> Dict:
+    """
+      Store an uploaded image under its digest. An image that is already stored is not
+      written again, created tells whether this upload wrote it.
+    """
+    temporary_path, digest, size = await _stream_to_disk(chunks)
+    try:
+        extension = await run_in_threadpool(_detect_format, temporary_path)
+        original_path = _image_path(digest, extension)
+        created = not os.path.exists(original_path)
+        if not created:
+            os.remove(temporary_path)
+        else:
+            os.makedirs(os.path.dirname(original_path), exist_ok=True)
+            os.chmod(temporary_path, 0o644)
+            os.replace(temporary_path, original_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    return {
+        "digest": digest,
+        "size": size,
+        "path": original_path,
+        "created": created,
+        "url": image_url(digest, extension),
+        "variants": variant_urls(digest)
+    }
+
+def discard_image(image: Dict):
+    """Remove an image stored by an upload that could not be attached to its course"""
+    if image["created"] and os.path.exists(image["path"]):
+        os.remove(image["path"])
+
+
+def render_variants(original_path: str, variant_paths: Dict[str, str]):
+    """
+      Render the missing WebP variants of an image, runs in a worker process. The paths are
+      passed in since a spawned worker does not share the settings of the server process.
+    """
+    with Image.open(original_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+
+        for name, size in IMAGE_VARIANTS.items():
+            path = variant_paths[name]
+            if os.path.exists(path):
+                continue
+            # Written beside the final name first, so a variant is either complete or absent
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            ImageOps.fit(image, size, Image.Resampling.LANCZOS).save(temporary_path, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(temporary_path, path)
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+def _variant_done(digest: str, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Could not render the variants of image {digest}: {str(future.exception())}")
+
+def schedule_variants(digest: str, original_path: str):
+    global _image_pool
+    variant_paths = {name: _image_path(digest, f"{name}.webp") for name in IMAGE_VARIANTS}
+    if all(os.path.exists(path) for path in variant_paths.values()):
+        return
+    if _image_pool is None:
+        # Spawned, a forked worker would copy the server's threads' locks in whatever state they were in
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=get_context("spawn"))
+    future = asyncio.get_running_loop().run_in_executor(_image_pool, render_variants, original_path, variant_paths)
+    future.add_done_callback(lambda done: _variant_done(digest, done))
+
+def shutdown_image_pool():
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=True)
+        _image_pool = None
@@ -1,12 +1,28 @@
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import desc, extract, func, union_all, literal, Numeric
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import desc, extract, func, union_all, literal, Numeric, select, insert, update, delete
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, List
+from collections import OrderedDict
 from schema.schemas import InnovationCreate, InnovationUpdate
 from models import models
-from database.database import get_db
+from database.database import get_db, insert_for, is_sqlite
+from recommender.co_enrollment import co_enrollment_index
+from recommender.content_similarity import content_similarity_index
+from recommender.typeahead import typeahead_index
+from crud.pages import page_cache
+from crud.analytics import subtract_enrollments
+import hashlib
+import json
+import threading
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 # Custom Exception class
 class ValidationException(Exception):
@@ -14,67 +30,183 @@ class ValidationException(Exception):
         self.detail = detail
         self.status_code = status_code
 
+# Postgres SQLSTATE for unique_violation
+UNIQUE_VIOLATION = "23505"
+
+def is_unique_violation(e: SQLAlchemyError) -> bool:
+    orig = getattr(e, "orig", None)
+    return (getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)) == UNIQUE_VIOLATION
+
+# Advisory lock serializing change log writers, so change ids are handed out in commit order
+CHANGE_LOG_LOCK_KEY = 7_310_037
+
+# Append to the innovation change log inside the caller's transaction
+def _record_change(db: Session, innovation_id: int, course_name: str, operation: str):
+    change = select(literal(innovation_id), literal(course_name), literal(operation))
+    # SQLite has a single writer already
+    if not is_sqlite(db):
+        change = change.select_from(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK_KEY)).subquery("change_log_lock"))
+
+    db.execute(insert(models.InnovationChange).from_select(["innovation_id", "course_name", "operation"], change))
+
+# Keep the in-memory indexes in step with a committed write, without failing the write itself
+def _index_innovation(innovation: models.Innovation):
+    page_cache.invalidate()
+    try:
+        typeahead_index.upsert(innovation.id, innovation.course_name, innovation.course_domain)
+        content_similarity_index.upsert(innovation.id, innovation.course_name, innovation.course_description, innovation.course_domain)
+    except Exception as e:
+        logger.error(f"Error indexing innovation {innovation.course_name}: {str(e)}")
+
+def _unindex_innovation(innovation: models.Innovation):
+    page_cache.invalidate()
+    try:
+        typeahead_index.remove(innovation.id)
+        content_similarity_index.remove(innovation.id)
+    except Exception as e:
+        logger.error(f"Error removing innovation {innovation.course_name} from indexes: {str(e)}")
+
 # Create new Innovation
 def create_innovation(innovation_data: InnovationCreate, db: Session, current_innovator: models.Innovator):
     try:
-        # Create the SQLAlchemy model from innovation data
-        new_innovation = models.Innovation(
+        # Insert and read back in one statement, an existing course name yields no row
+        statement = insert_for(db, models.Innovation).values(
             course_name=innovation_data.course_name,
             course_description=innovation_data.course_description,
-            content=innovation_data.content,
+            content=innovation_data.content.model_dump() if innovation_data.content else None,
             course_duration=innovation_data.course_duration,
             course_price=innovation_data.course_price,
+            course_tutor=innovation_data.course_tutor,
             course_image_path=innovation_data.course_image_path,
             course_domain=innovation_data.course_domain,
-            created_at=datetime.now(),
-            learners=innovation_data.learners
-        )
-
-        # Add new innovation to database session
-        db.add(new_innovation)
+            created_at=datetime.now()
+        ).on_conflict_do_nothing(index_elements=[models.Innovation.course_name]).returning(models.Innovation)
 
-        # Try to commit new innovation
         try:
+            new_innovation = db.scalars(statement).first()
+            if new_innovation:
+                _record_change(db, new_innovation.id, new_innovation.course_name, "created")
             db.commit()
-            db.refresh(new_innovation)
-            return new_innovation
-        
-        except ValidationError as e:
+
+        except SQLAlchemyError as e:
             db.rollback()
+            if is_unique_violation(e):
+                raise ValidationException(f"Innovation by name {innovation_data.course_name} already exists", status.HTTP_409_CONFLICT)
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(e)
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
             )
-        except SQLAlchemyError as e:
-            db.rollback()
-            if isinstance(e.__cause__, ValidationError):
-                if isinstance(e.__cause__, ValidationError):
-                    raise HTTPException(
-                      status_code=status.HTTP_400_BAD_REQUEST,
-                      detail=str(e.__cause__)
-                    )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Database error: {str(e)}"
-                )
+
+        if not new_innovation:
+            raise ValidationException(f"Innovation by name {innovation_data.course_name} already exists", status.HTTP_409_CONFLICT)
+
+        # A new course has no learners, no need to lazy load them for the response
+        set_committed_value(new_innovation, "learners", [])
+        _index_innovation(new_innovation)
+        return new_innovation
+
+    except (ValidationException, HTTPException):
+        raise
     except Exception as e:
         if 'db' in locals() and db.is_active:
             db.rollback()
-            raise HTTPException(
-              status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-              detail=f"Error creating sales entry: {str(e)}"
-            )
+        raise HTTPException(
+          status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+          detail=f"Error creating innovation: {str(e)}"
+        )
 
 # Retrieve innovation by name
 def get_innovation_by_name(course_name: str, db: Session, current_innovator: models.Innovator):
-    innovation_by_name = db.query(models.Innovation).filter(models.Innovation.course_name == course_name).first()
+    innovation_by_name = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).filter(models.Innovation.course_name == course_name).first()
 
     return innovation_by_name
 
+# Check that an innovation exists without loading it
+def innovation_exists(course_name: str, db: Session) -> bool:
+    return db.scalar(select(models.Innovation.id).where(models.Innovation.course_name == course_name)) is not None
+
+# Retrieve several innovations by name in a single query, keeping the input order
+def get_innovations_by_names(course_names: List[str], db: Session, current_innovator: models.Innovator):
+    # Drop duplicate names while keeping the first occurrence
+    course_names = list(dict.fromkeys(course_names))
+
+    innovations = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).filter(models.Innovation.course_name.in_(course_names)).all()
+    innovations_by_name = {innovation.course_name: innovation for innovation in innovations}
+
+    found = [innovations_by_name[name] for name in course_names if name in innovations_by_name]
+    missing = [name for name in course_names if name not in innovations_by_name]
+
+    return found, missing
+
+# Recommend innovations from what learners enrolled in the same courses also took
+def get_recommended_innovations(db: Session, current_innovator: models.Innovator, limit: int = 10):
+    association = models.innovation_learner_association
+    enrolled_ids = [
+        innovation_id for (innovation_id,) in
+        db.query(association.c.innovation_id).filter(association.c.innovator_id == current_innovator.id).all()
+    ]
+
+    recommended_ids = co_enrollment_index.recommend(enrolled_ids, limit)
+    if not recommended_ids:
+        return []
+
+    innovations = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).filter(models.Innovation.id.in_(recommended_ids)).all()
+    innovations_by_id = {innovation.id: innovation for innovation in innovations}
+
+    return [innovations_by_id[innovation_id] for innovation_id in recommended_ids if innovation_id in innovations_by_id]
+
+# Retrieve the innovations whose name, description and domain read most like the given one
+def get_related_innovations(course_name: str, db: Session, current_innovator: models.Innovator, limit: int = 10):
+    innovation_id = db.query(models.Innovation.id).filter(models.Innovation.course_name == course_name).scalar()
+
+    if innovation_id is None:
+        return None
+
+    related_ids = content_similarity_index.related(innovation_id, limit)
+    if not related_ids:
+        return []
+
+    innovations = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).filter(models.Innovation.id.in_(related_ids)).all()
+    innovations_by_id = {innovation.id: innovation for innovation in innovations}
+
+    return [innovations_by_id[related_id] for related_id in related_ids if related_id in innovations_by_id]
+
+# Get the catalog changes made after a cursor, in commit order
+def get_innovation_changes(db: Session, current_innovator: models.Innovator, since: int = 0, limit: int = 100):
+    changes = db.query(models.InnovationChange)\
+                .filter(models.InnovationChange.id > since)\
+                .order_by(models.InnovationChange.id)\
+                .limit(limit + 1)\
+                .all()
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Current state of every course still alive, in one query
+    live_ids = {change.innovation_id for change in changes if change.operation != "deleted"}
+    innovations_by_id = {}
+    if live_ids:
+        innovations = db.query(models.Innovation).filter(models.Innovation.id.in_(live_ids)).all()
+        innovations_by_id = {innovation.id: innovation for innovation in innovations}
+
+    entries = [
+        {
+            "cursor": change.id,
+            "operation": change.operation,
+            "innovation_id": change.innovation_id,
+            "course_name": change.course_name,
+            "changed_at": change.changed_at,
+            "innovation": None if change.operation == "deleted" else innovations_by_id.get(change.innovation_id)
+        }
+        for change in changes
+    ]
+
+    next_cursor = changes[-1].id if changes else since
+    return entries, next_cursor, has_more
+
 # Get all innovations belonging to a particular domain
 def get_all_innovations_by_domain(course_domain: str, db: Session, current_innovator: models.Innovator):
-    innovations_by_domain = db.query(models.Innovation).filter(models.Innovation.course_domain == course_domain).all()
+    innovations_by_domain = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).filter(models.Innovation.course_domain == course_domain).all()
 
     return innovations_by_domain
 
@@ -92,57 +224,191 @@ def get_innovators_on_innovation(course_name: str, db: Session, current_innovato
 
 # Get all innovations
 def get_all_innovations(db: Session, current_innovator: models.Innovator, skip: int = 0, limit: int = 100):
-    innovations = db.query(models.Innovation).all()
+    innovations = db.query(models.Innovation).options(selectinload(models.Innovation.learners)).all()
 
     return innovations
 
+# Section metadata per course, only recomputed when the course version changes. The least
+# recently used courses are dropped once SECTION_METADATA_CACHE_SIZE are cached.
+SECTION_METADATA_CACHE_SIZE = int(os.getenv("SECTION_METADATA_CACHE_SIZE", "1024"))
+_section_metadata_cache = OrderedDict()
+_section_metadata_lock = threading.Lock()
+
+def _cached_section_metadata(course_name: str, version: str):
+    with _section_metadata_lock:
+        cached = _section_metadata_cache.get(course_name)
+        if not cached or cached[0] != version:
+            return None
+        _section_metadata_cache.move_to_end(course_name)
+        return cached[1]
+
+def _cache_section_metadata(course_name: str, version: str, sections: list):
+    with _section_metadata_lock:
+        _section_metadata_cache[course_name] = (version, sections)
+        _section_metadata_cache.move_to_end(course_name)
+        while len(_section_metadata_cache) > SECTION_METADATA_CACHE_SIZE:
+            _section_metadata_cache.popitem(last=False)
+
+def _encode_section(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+def section_etag(value) -> str:
+    return hashlib.sha1(_encode_section(value)).hexdigest()
+
+def _course_version(created_at) -> str:
+    # created_at is reset on every update, so it doubles as the content version
+    return created_at.isoformat() if created_at else ""
+
+# List the sections of an innovation's content without loading the content when cached
+def get_innovation_sections(course_name: str, db: Session, current_innovator: models.Innovator):
+    created_at = db.query(models.Innovation.created_at).filter(models.Innovation.course_name == course_name).first()
+
+    if not created_at:
+        return None
+
+    version = _course_version(created_at[0])
+    cached = _cached_section_metadata(course_name, version)
+    if cached is not None:
+        return version, cached
+
+    content = db.query(models.Innovation.content).filter(models.Innovation.course_name == course_name).scalar() or {}
+    sections = []
+    for key, value in content.items():
+        encoded = _encode_section(value)
+        sections.append({"key": key, "size": len(encoded), "etag": hashlib.sha1(encoded).hexdigest()})
+
+    _cache_section_metadata(course_name, version, sections)
+    return version, sections
+
+# Retrieve several sections of an innovation's content, extracted by the database
+def get_innovation_sections_by_keys(course_name: str, section_keys: List[str], db: Session, current_innovator: models.Innovator):
+    section_keys = list(dict.fromkeys(section_keys))
+    columns = [models.Innovation.content[key] for key in section_keys]
+
+    row = db.query(models.Innovation.created_at, *columns).filter(models.Innovation.course_name == course_name).first()
+
+    if not row:
+        return None
+
+    found = []
+    missing = []
+    for key, value in zip(section_keys, row[1:]):
+        if value is None:
+            missing.append(key)
+        else:
+            found.append({"key": key, "etag": section_etag(value), "content": value})
+
+    return _course_version(row[0]), found, missing
+
+# Retrieve a single section of an innovation's content
+def get_innovation_section(course_name: str, section_key: str, db: Session, current_innovator: models.Innovator):
+    result = get_innovation_sections_by_keys(course_name, [section_key], db, current_innovator)
+
+    if not result or not result[1]:
+        return None
+
+    version, found, _ = result
+    return version, found[0]
+
 # Update innovations
 def update_innovations(course_name: str, innovation_data: InnovationUpdate, db: Session, current_innovator: models.Innovator):
     try:
-        course_to_update = db.query(models.Innovation).filter(models.Innovation.course_name == course_name).first()
-
-        if not course_to_update:
-            raise ValueError(f"Course by name {course_name} not found.")
-
-        course_data = innovation_data.model_dump()
-        for key, value in course_data.items():
-            setattr(course_to_update, key, value)
+        course_data = innovation_data.model_dump(exclude={"learners"})
+        course_data["created_at"] = datetime.now()
 
-        course_to_update.created_at = datetime.now()
+        # Update and read back in one statement, an unknown course name yields no row
+        statement = update(models.Innovation)\
+            .where(models.Innovation.course_name == course_name)\
+            .values(**course_data)\
+            .returning(models.Innovation)\
+            .execution_options(synchronize_session=False)
+        course_to_update = db.scalars(statement).first()
+        if course_to_update:
+            _record_change(db, course_to_update.id, course_to_update.course_name, "updated")
         db.commit()
-        db.refresh(course_to_update)
 
+        if not course_to_update:
+            return None
+
+        _index_innovation(course_to_update)
         return course_to_update
 
+    except SQLAlchemyError as e:
+        db.rollback()
+        if is_unique_violation(e):
+            raise ValidationException(f"Innovation by name {innovation_data.course_name} already exists", status.HTTP_409_CONFLICT)
+        raise HTTPException(
+          status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+          detail=f"Error updating innovation: {str(e)}"
+        )
+
     except Exception as e:
         if 'db' in locals() and db.is_active:
             db.rollback()
-            raise HTTPException(
-              status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-              detail=f"Error updating innovation: {str(e)}"
-            )
+        raise HTTPException(
+          status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+          detail=f"Error updating innovation: {str(e)}"
+        )
+
+# Point an innovation at a stored image
+def set_innovation_image(course_name: str, image_url: str, db: Session, current_innovator: models.Innovator):
+    try:
+        statement = update(models.Innovation)\
+            .where(models.Innovation.course_name == course_name)\
+            .values(course_image_path=image_url)\
+            .returning(models.Innovation.id)
+        innovation_id = db.scalars(statement).first()
+        if innovation_id is not None:
+            _record_change(db, innovation_id, course_name, "updated")
+        db.commit()
+        page_cache.invalidate()
+        return innovation_id is not None
+
+    except Exception as e:
+        logger.error(f"Error setting the image of innovation {course_name}: {str(e)}")
+        db.rollback()
+        raise
 
 # delete innovation
 def delete_innovation(course_name: str, db: Session, current_innovator: models.Innovator):
     try:
-        course_to_delete = db.query(models.Innovation).filter(models.Innovation.course_name == course_name).first()
+        association = models.innovation_learner_association
+        course_id = select(models.Innovation.id).where(models.Innovation.course_name == course_name).scalar_subquery()
 
-        if not course_to_delete:
-            raise ValueError(f"Course by name {course_name} not found.")
+        # The enrollments leave the analytics rollup with the course
+        subtract_enrollments(association.c.innovation_id == course_id, db)
+        removed_enrollments = delete(association).where(association.c.innovation_id == course_id)
+        statement = delete(models.Innovation)\
+            .where(models.Innovation.course_name == course_name)\
+            .returning(models.Innovation)\
+            .execution_options(synchronize_session=False)
 
-        db.delete(course_to_delete)
+        # Drop the enrollments and the course in one statement. Its parts run against the same snapshot
+        # in no set order, this works because the association's foreign keys are NO ACTION, checked at
+        # the end of the statement once both deletes are done (RESTRICT would check at once and fail).
+        # SQLite has no data-modifying CTEs, so it takes two statements there.
+        if is_sqlite(db):
+            db.execute(removed_enrollments)
+        else:
+            statement = statement.add_cte(removed_enrollments.cte("removed_enrollments"))
+        course_to_delete = db.scalars(statement).first()
+        if course_to_delete:
+            _record_change(db, course_to_delete.id, course_to_delete.course_name, "deleted")
         db.commit()
 
+        if not course_to_delete:
+            return None
+
+        with _section_metadata_lock:
+            _section_metadata_cache.pop(course_name, None)
+        _unindex_innovation(course_to_delete)
+
         return course_to_delete
 
     except Exception as e:
         if 'db' in locals() and db.is_active:
             db.rollback()
-            raise HTTPException(
-              status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-              detail=f"Error deleting innovation: {str(e)}"
-            )
-
-        
-        
-        
+        raise HTTPException(
+          status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+          detail=f"Error deleting innovation: {str(e)}"
+        )
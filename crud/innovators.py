@@ -1,11 +1,17 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import exc
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import exc, func, select, update, delete
+from fastapi import status
 import logging
 from datetime import datetime
-from schema.schemas import InnovatorCreate, InnovatorResponse, InnovatorUpdate, ShowInnovator
-from models.models import Innovator as InnovatorModel
+from schema.schemas import InnovatorCreate, InnovatorResponse, InnovatorUpdate, ShowInnovator, InnovationSummary, normalize_email
+from models.models import Innovator as InnovatorModel, Innovation, InnovationSeats, innovation_learner_association
 from crud import hashing
+from crud.innovation import ValidationException, is_unique_violation
+from crud.analytics import subtract_enrollments, subtract_signups
+from database.database import insert_for, is_sqlite
+from recommender.typeahead import typeahead_index
+from recommender.co_enrollment import co_enrollment_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,30 +20,35 @@ logger.setLevel(logging.INFO)
 # Create innovator
 def create_innovator(innovator_data: InnovatorCreate, db: Session) -> InnovatorResponse:
     try:
-        # Check if innovator email already exists
-        existing_innovator_email = db.query(InnovatorModel).filter(InnovatorModel.email == innovator_data.email).first()
+        # A taken email is refused before paying for the password hash
+        if db.scalar(select(InnovatorModel.id).where(InnovatorModel.email == innovator_data.email)) is not None:
+            raise ValidationException(f"Innovator with the email: {innovator_data.email} already exists", status.HTTP_409_CONFLICT)
 
-        if existing_innovator_email:
-            raise ValueError(f"Innovator with the email: {innovator_data.email} already exists")
-        
         hashed_password = hashing.Hash.argon2(innovator_data.password)
-        # Create new innovator
-        new_innovator = InnovatorModel(
+
+        # Insert and read back in one statement, an email taken since the check above yields no row
+        statement = insert_for(db, InnovatorModel).values(
             fullname=innovator_data.fullname,
             email=innovator_data.email,
             hashed_password=hashed_password,
             status=innovator_data.status,
             language=innovator_data.language,
             date_joined=datetime.now()
-        )
+        ).on_conflict_do_nothing(index_elements=[InnovatorModel.email]).returning(InnovatorModel)
 
-        db.add(new_innovator)
+        new_innovator = db.scalars(statement).first()
         db.commit()
-        db.refresh(new_innovator)
+
+        if not new_innovator:
+            raise ValidationException(f"Innovator with the email: {innovator_data.email} already exists", status.HTTP_409_CONFLICT)
 
         logger.info(f"Created  new innovator: {new_innovator.fullname}")
         return new_innovator
 
+    except ValidationException:
+        db.rollback()
+        raise
+
     except exc.IntegrityError as e:
         logger.error(f"Database error while creating user: {str(e)}")
         db.rollback()
@@ -60,16 +71,62 @@ def get_innovator(email: str, db: Session, current_innovator: InnovatorModel) ->
         logger.error(f"Error retrieving innovator by email {email}: {str(e)}")
         raise
 
+# Get several innovators by email in a single query, keeping the input order
+def get_innovators_by_emails(emails: List[str], db: Session, current_innovator: InnovatorModel) -> Tuple[List[InnovatorResponse], List[str]]:
+    try:
+        # Drop duplicate emails while keeping the first occurrence
+        emails = list(dict.fromkeys(emails))
+        # Look up each email the way it was stored, but report the missing ones as given
+        normalized = {email: normalize_email(email) for email in emails}
+
+        innovators = db.query(InnovatorModel).filter(InnovatorModel.email.in_(set(normalized.values()))).all()
+        innovators_by_email = {innovator.email: innovator for innovator in innovators}
+
+        found = [innovators_by_email[email] for email in dict.fromkeys(normalized.values()) if email in innovators_by_email]
+        missing = [email for email in emails if normalized[email] not in innovators_by_email]
+        logger.info(f"Retrieved {len(found)} of {len(emails)} innovators by email.")
+        return found, missing
+
+    except Exception as e:
+        logger.error(f"Error retrieving innovators by email: {str(e)}")
+        raise
+
 # Get a list of innovators
 def get_all_innovators(db: Session, current_innovator: InnovatorModel) -> List[ShowInnovator]:
     try:
-        innovators = db.query(InnovatorModel).all()
+        # Load the courses and their learners up front, the response serializes both
+        innovators = db.query(InnovatorModel)\
+                       .options(selectinload(InnovatorModel.registered_courses).selectinload(Innovation.learners))\
+                       .all()
         logger.info(f"Retrieved {len(innovators)}.")
+        return innovators
 
     except Exception as e:
         logger.error(f"Error retrieving innovators: {str(e)}")
         raise
 
+# Courses of the current innovator, one keyset page at a time in innovation id order
+def current_innovator_courses_statement(innovator_id: int, after: int, limit: int):
+    # Only the summary columns, so neither content nor learners are read
+    summary_columns = [getattr(Innovation, field) for field in InnovationSummary.model_fields]
+    return select(*summary_columns)\
+        .select_from(innovation_learner_association)\
+        .join(Innovation, Innovation.id == innovation_learner_association.c.innovation_id)\
+        .where(
+            innovation_learner_association.c.innovator_id == innovator_id,
+            innovation_learner_association.c.innovation_id > after
+        )\
+        .order_by(innovation_learner_association.c.innovation_id)\
+        .limit(limit + 1)
+
+def get_current_innovator_courses(db: Session, current_innovator: InnovatorModel, after: int = 0, limit: int = 50):
+    courses = db.execute(current_innovator_courses_statement(current_innovator.id, after, limit)).all()
+
+    has_more = len(courses) > limit
+    courses = courses[:limit]
+    next_cursor = courses[-1].id if courses else after
+    return courses, next_cursor, has_more
+
 # Get the current innovator's information
 def get_current_active_innovator(email: str, db: Session, current_innovator: InnovatorModel) -> Optional[InnovatorResponse]:
     try:
@@ -85,21 +142,25 @@ def get_current_active_innovator(email: str, db: Session, current_innovator: Inn
 # Update an existing innovator
 def update_innovator(email: str, innovator_data: InnovatorUpdate, db: Session, current_innovator: InnovatorModel) -> ShowInnovator:
     try:
-        existing_innovator = db.query(InnovatorModel).filter(InnovatorModel.email == email).first()
-        if not existing_innovator:
-            raise ValueError(f"Innovator by name {email} not found.")
-        
         hashed_password = hashing.Hash.argon2(innovator_data.password)
-        # Update innovator data
-        existing_innovator.fullname = innovator_data.fullname
-        existing_innovator.email = innovator_data.email
-        existing_innovator.hashed_password = hashed_password
-        existing_innovator.status = innovator_data.status
-        existing_innovator.language = innovator_data.language
-        existing_innovator.updated_at = datetime.now()
 
+        # Update and read back in one statement, an unknown email yields no row
+        statement = update(InnovatorModel)\
+            .where(InnovatorModel.email == email)\
+            .values(
+                fullname=innovator_data.fullname,
+                email=innovator_data.email,
+                hashed_password=hashed_password,
+                status=innovator_data.status,
+                language=innovator_data.language
+            )\
+            .returning(InnovatorModel)\
+            .execution_options(synchronize_session=False)
+        existing_innovator = db.scalars(statement).first()
         db.commit()
-        db.refresh(existing_innovator)
+
+        if not existing_innovator:
+            raise ValueError(f"Innovator by name {email} not found.")
 
         logger.info(f"Updated innovator: {email}.")
         return existing_innovator
@@ -107,6 +168,8 @@ def update_innovator(email: str, innovator_data: InnovatorUpdate, db: Session, c
     except exc.IntegrityError as e:
         logger.error(f"Database error updating innovator: {str(e)}.")
         db.rollback()
+        if is_unique_violation(e):
+            raise ValidationException(f"Innovator with the email: {innovator_data.email} already exists", status.HTTP_409_CONFLICT)
         raise ValueError(f"Error updating innovator. Please check if the innovator {email} exists.")
     
     except Exception as e:
@@ -115,16 +178,52 @@ def update_innovator(email: str, innovator_data: InnovatorUpdate, db: Session, c
         raise ValueError(f"Error updating innovator. Please check if the innovator {email} exists.")
 
 # Delete innovator
-def delete_innovator(email: str, db: Session, current_innovator: InnovatorModel) -> None:
+def delete_innovator(email: str, db: Session, current_innovator: InnovatorModel) -> InnovatorResponse:
     try:
-        innovator_to_delete = db.query(InnovatorModel).filter(InnovatorModel.email == email).first()
+        association = innovation_learner_association
+        innovator_id = select(InnovatorModel.id).where(InnovatorModel.email == email).scalar_subquery()
+
+        # The innovator and their enrollments leave the analytics rollups with them
+        subtract_enrollments(association.c.innovator_id == innovator_id, db)
+        subtract_signups(InnovatorModel.email == email, db)
+        removed_enrollments = delete(association)\
+            .where(association.c.innovator_id == innovator_id)\
+            .returning(association.c.innovation_id)
+        statement = delete(InnovatorModel)\
+            .where(InnovatorModel.email == email)\
+            .execution_options(synchronize_session=False)
+
+        # Drop the enrollments, give back their seats and drop the innovator in one statement. Its parts
+        # run against the same snapshot in no set order: the seats follow the removed enrollments through
+        # RETURNING, and the innovator can go before its enrollments because the association's foreign
+        # keys are NO ACTION, checked at the end of the statement (RESTRICT would check at once and fail).
+        # SQLite has no data-modifying CTEs, so it takes three statements there.
+        if is_sqlite(db):
+            course_ids = db.scalars(removed_enrollments).all()
+            if course_ids:
+                db.execute(update(InnovationSeats).where(InnovationSeats.innovation_id.in_(course_ids)).values(taken=InnovationSeats.taken - 1))
+            innovator_to_delete = db.scalars(statement.returning(InnovatorModel)).first()
+        else:
+            removed = removed_enrollments.cte("removed_enrollments")
+            released_seats = update(InnovationSeats)\
+                .where(InnovationSeats.innovation_id.in_(select(removed.c.innovation_id)))\
+                .values(taken=InnovationSeats.taken - 1)\
+                .cte("released_seats")
+            removed_course_ids = select(func.array_agg(removed.c.innovation_id)).scalar_subquery()
+            row = db.execute(statement.add_cte(removed).add_cte(released_seats).returning(InnovatorModel, removed_course_ids)).first()
+            innovator_to_delete, course_ids = row if row else (None, None)
+        db.commit()
+
         if not innovator_to_delete:
             raise ValueError(f"Innovator {email} not found.")
 
-        db.delete(innovator_to_delete)
-        db.commit()
+        for course_id in course_ids or []:
+            typeahead_index.add_popularity(course_id, -1)
+        if course_ids:
+            co_enrollment_index.record_withdrawals(course_ids)
 
         logger.info(f"Deleted innovator {email}.")
+        return innovator_to_delete
 
     except exc.IntegrityError as e:
         logger.error(f"Database error deleting innovator: {str(e)}.")
@@ -0,0 +1,172 @@
+"""
+  Prerendered HTML pages.
+
+  The landing and catalog pages are rendered on the server with the course list already in
+  them as cards, and the catalog also as JSON for its search script, so the browser shows
+  courses without any API round-trip. Each page is kept in memory with its ETag and its gzip
+  and brotli bodies, and is only rendered again once the innovation change log has moved on.
+  Writes made by this worker invalidate the pages at once, other workers see the new change
+  id within PAGE_VERSION_CHECK_SECONDS.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, func, select
+from typing import Callable, Dict, List, Optional
+from models import models
+import gzip
+import hashlib
+import html
+import json
+import threading
+import time
+import os
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TEMPLATE_DIR = "frontend"
+PAGE_VERSION_CHECK_SECONDS = float(os.getenv("PAGE_VERSION_CHECK_SECONDS", "5"))
+LANDING_COURSES = int(os.getenv("LANDING_COURSES", "6"))
+CATALOG_COURSES = int(os.getenv("CATALOG_COURSES", "500"))
+# Pages are compressed once per catalog change, brotli 11 is many times slower than 9 for next to no gain
+PAGE_GZIP_LEVEL = 9
+PAGE_BROTLI_QUALITY = 9
+
+# Placeholders the templates carry where the prerendered parts go
+COURSES_PLACEHOLDER = "<!-- prerendered:courses -->"
+DATA_PLACEHOLDER = "<!-- prerendered:data -->"
+
+COURSE_COLUMNS = (
+    models.Innovation.id,
+    models.Innovation.course_name,
+    models.Innovation.course_description,
+    models.Innovation.course_duration,
+    models.Innovation.course_price,
+    models.Innovation.course_tutor,
+    models.Innovation.course_image_path,
+    models.Innovation.course_domain
+)
+
+
+class PrerenderedPage:
+    """A rendered page with its ETag and its body in every encoding, compressed once"""
+
+    def __init__(self, body: bytes, version: int):
+        self.version = version
+        # Weak, the same tag stands for the identity, gzip and brotli bodies
+        self.etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.bodies = {None: body, "gzip": gzip.compress(body, compresslevel=PAGE_GZIP_LEVEL)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=PAGE_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+        self.rendered_at = time.time()
+
+
+def catalog_version(db: Session) -> int:
+    """Id of the latest catalog change, it moves on with every create, update and delete"""
+    return db.execute(select(func.max(models.InnovationChange.id))).scalar() or 0
+
+def _courses(db: Session, order_by, limit: int) -> List[Dict]:
+    rows = db.execute(select(*COURSE_COLUMNS).order_by(order_by).limit(limit)).mappings().all()
+    return [dict(row) for row in rows]
+
+def _course_card(course: Dict) -> str:
+    field = {key: html.escape(str(value)) for key, value in course.items()}
+    return (
+        '<div class="course-card">'
+        f'<img src="{field["course_image_path"]}" alt="{field["course_name"]}" class="course-image" loading="lazy">'
+        '<div class="course-info">'
+        f'<h3>{field["course_name"]}</h3>'
+        f'<div class="course-domain">{field["course_domain"]}</div>'
+        f'<p class="course-description">{field["course_description"]}</p>'
+        '<div class="course-footer">'
+        f'<span class="course-tutor">{field["course_tutor"]}</span>'
+        f'<span class="course-duration">{field["course_duration"]} weeks</span>'
+        f'<span class="course-price">{field["course_price"]}</span>'
+        '</div></div></div>'
+    )
+
+def _course_data(courses: List[Dict]) -> str:
+    # "<" is escaped so a course name cannot close the script element
+    payload = json.dumps(courses, separators=(",", ":")).replace("<", "\\u003c")
+    return f'<script id="catalog-data" type="application/json">{payload}</script>'
+
+def _with_courses(template: str, courses: List[Dict]) -> str:
+    cards = "\n".join(_course_card(course) for course in courses) or '<p class="course-empty">New courses are on their way.</p>'
+    return template.replace(COURSES_PLACEHOLDER, cards).replace(DATA_PLACEHOLDER, _course_data(courses))
+
+def _read_template(filename: str) -> str:
+    with open(os.path.join(TEMPLATE_DIR, filename), encoding="utf-8") as template:
+        return template.read()
+
+def render_home(db: Session) -> str:
+    return _with_courses(_read_template("frontend.html"), _courses(db, desc(models.Innovation.created_at), LANDING_COURSES))
+
+def render_catalog(db: Session) -> str:
+    return _with_courses(_read_template("catalog.html"), _courses(db, models.Innovation.course_name, CATALOG_COURSES))
+
+def render_try(db: Session) -> str:
+    return _read_template("try.html")
+
+
+# Page name to its renderer
+PAGES: Dict[str, Callable[[Session], str]] = {
+    "home": render_home,
+    "catalog": render_catalog,
+    "try": render_try
+}
+
+
+class PageCache:
+    """Prerendered pages of one worker, rendered again when the catalog version changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages: Dict[str, PrerenderedPage] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self.renders = 0
+
+    def fresh(self, name: str) -> Optional[PrerenderedPage]:
+        """The cached page when the catalog version was confirmed recently, without touching the database"""
+        page = self._pages.get(name)
+        if page is None or page.version != self._version or time.monotonic() - self._checked_at > PAGE_VERSION_CHECK_SECONDS:
+            return None
+        return page
+
+    def get(self, name: str, db: Session) -> PrerenderedPage:
+        """The page for the current catalog version, rendering it when the catalog moved on"""
+        with self._lock:
+            page = self.fresh(name)
+            if page is not None:
+                return page
+
+            version = catalog_version(db)
+            self._version = version
+            self._checked_at = time.monotonic()
+            page = self._pages.get(name)
+            if page is None or page.version != version:
+                started_at = time.perf_counter()
+                page = PrerenderedPage(PAGES[name](db).encode("utf-8"), version)
+                self._pages[name] = page
+                self.renders += 1
+                logger.info(f"Prerendered page {name} for catalog version {version} in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+            return page
+
+    def invalidate(self):
+        """Make the next request check the catalog version, called after this worker changed the catalog"""
+        self._checked_at = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._checked_at = 0.0
+
+
+# Shared per-worker page cache
+page_cache = PageCache()
@@ -0,0 +1,120 @@
+from sqlalchemy import event
+from database.database import engine, replica_engine
+from collections import Counter
+from typing import Dict
+import threading
+import time
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Upper bounds in milliseconds of the connection hold time histogram
+HOLD_TIME_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class PoolMetrics:
+    """
+      Counts checkouts of an engine's pool and how long each connection stays checked out,
+      the hold time being the interval between checkout and checkin.
+    """
+
+    def __init__(self, name: str, pool_engine):
+        self.name = name
+        self.engine = pool_engine
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.hold_ms_total = 0.0
+        self.hold_ms_max = 0.0
+        self.histogram = [0] * (len(HOLD_TIME_BUCKETS_MS) + 1)
+
+        event.listen(pool_engine, "checkout", self._on_checkout)
+        event.listen(pool_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return
+
+        held_ms = (time.perf_counter() - checked_out_at) * 1000
+        bucket = next((i for i, bound in enumerate(HOLD_TIME_BUCKETS_MS) if held_ms <= bound), len(HOLD_TIME_BUCKETS_MS))
+        with self._lock:
+            self.checkins += 1
+            self.hold_ms_total += held_ms
+            self.hold_ms_max = max(self.hold_ms_max, held_ms)
+            self.histogram[bucket] += 1
+
+    def in_use(self) -> int:
+        pool = self.engine.pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else self.checkouts - self.checkins
+
+    def waiting(self) -> int:
+        """Callers blocked on a checkout right now"""
+        return getattr(self.engine.pool, "waiting", 0)
+
+    def checkout_wait_ms(self) -> float:
+        pool = self.engine.pool
+        return pool.checkout_wait_ms() if hasattr(pool, "checkout_wait_ms") else 0.0
+
+    def capacity(self) -> int:
+        """Connections the pool hands out before callers have to wait, 0 when unbounded"""
+        pool = self.engine.pool
+        if not hasattr(pool, "size"):
+            return 0
+        return pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+
+    def snapshot(self) -> Dict:
+        pool = self.engine.pool
+        with self._lock:
+            labels = [f"le_{bound}" for bound in HOLD_TIME_BUCKETS_MS] + ["inf"]
+            return {
+                "name": self.name,
+                "pool_size": pool.size() if hasattr(pool, "size") else 0,
+                "capacity": self.capacity(),
+                "checked_out": self.in_use(),
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else 0,
+                "waiting": self.waiting(),
+                "checkout_wait_ms": self.checkout_wait_ms(),
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "mean_hold_ms": self.hold_ms_total / self.checkins if self.checkins else 0.0,
+                "max_hold_ms": self.hold_ms_max,
+                "hold_ms_histogram": dict(zip(labels, self.histogram))
+            }
+
+
+class QueryMetrics:
+    """Queries cut off per route, by their deadline or by the client disconnecting"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timeouts = Counter()
+        self.cancellations = Counter()
+
+    def record_timeout(self, route: str):
+        with self._lock:
+            self.timeouts[route] += 1
+
+    def record_cancellation(self, route: str):
+        with self._lock:
+            self.cancellations[route] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"timeouts": dict(self.timeouts), "cancellations": dict(self.cancellations)}
+
+
+primary_pool_metrics = PoolMetrics("primary", engine)
+replica_pool_metrics = PoolMetrics("replica", replica_engine) if replica_engine is not None else None
+
+query_metrics = QueryMetrics()
+
+def pool_snapshots():
+    return [metrics.snapshot() for metrics in (primary_pool_metrics, replica_pool_metrics) if metrics is not None]
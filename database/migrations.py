@@ -0,0 +1,57 @@
+"""
+  Changes to tables that already exist.
+
+  create_all only creates missing tables, it never alters an existing one, so columns and
+  indexes added to existing tables are listed here and applied with IF NOT EXISTS. Running
+  it again, or against a database create_all just built, changes nothing. It runs at
+  startup right after create_all and can be run by hand before a deploy:
+
+      python -m database.migrations
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from database.database import engine, Base
+from models import models
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Advisory lock taken while upgrading, so workers starting together apply the changes one at a time
+MIGRATION_LOCK_ID = 8_031_044
+
+# Columns added to existing tables. Postgres fills existing rows with the default as of the
+# migration, so enrollments older than enrolled_at are counted in the week it was added.
+# SQLite databases are only ever built by create_all and always have them.
+POSTGRES_ADDED_COLUMNS = [
+    "ALTER TABLE innovation_learner_association ADD COLUMN IF NOT EXISTS enrolled_at TIMESTAMP WITH TIME ZONE DEFAULT now()"
+]
+
+# Indexes added to existing tables, by table and index name as the models declare them
+ADDED_INDEXES = [
+    ("innovation_learner_association", "ix_innovation_learner_association_enrolled_at"),
+    ("innovators", "ix_innovators_date_joined"),
+    ("innovation_learner_association", "ix_innovation_learner_innovator_innovation")
+]
+
+
+def _index(table_name: str, index_name: str):
+    return next(index for index in Base.metadata.tables[table_name].indexes if index.name == index_name)
+
+def upgrade_schema(connection: Connection):
+    """Bring existing tables up to the models, in the caller's transaction"""
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        for statement in POSTGRES_ADDED_COLUMNS:
+            connection.execute(text(statement))
+
+    for table_name, index_name in ADDED_INDEXES:
+        connection.execute(CreateIndex(_index(table_name, index_name), if_not_exists=True))
+    logger.info(f"Schema is up to date with {len(ADDED_INDEXES)} added indexes")
+
+
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        upgrade_schema(connection)
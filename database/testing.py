@@ -0,0 +1,48 @@
+"""
+  In-memory SQLite backend for tests and local benchmarks.
+
+  Point the app at it before anything imports database.database:
+
+      DATABASE_URL=sqlite:// ARGON2_TIME_COST=1 ARGON2_MEMORY_COST=8 ARGON2_PARALLELISM=1
+
+  create_schema() builds the tables once. Each test then runs inside
+  isolated_session(): the session joins an outer transaction through savepoints,
+  so commits made by the app are rolled back when the test ends.
+
+      with isolated_session() as db:
+          override_get_db(app, db)
+          client.post("/api/innovators/new", json={...})
+"""
+from contextlib import contextmanager
+from sqlalchemy.orm import Session
+from database.database import engine, SessionLocal, Base, get_db
+
+
+def create_schema():
+    # Import the models so they are registered on Base.metadata
+    from models import models
+    from database.migrations import upgrade_schema
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        upgrade_schema(connection)
+
+
+@contextmanager
+def isolated_session():
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def override_get_db(app, db: Session):
+    """Make every request of app use db instead of a new session"""
+    def get_test_db():
+        yield db
+
+    app.dependency_overrides[get_db] = get_test_db
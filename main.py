@@ -1,22 +1,69 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from router import innovation, innovator, auth
-from database.database import engine
+from router import innovation, innovator, auth, analytics, metrics, pages
+from database.database import engine, SessionLocal
+from database.migrations import upgrade_schema
 from models import models
+from middleware.encoding import CompressionMiddleware
+from middleware.idempotency import IdempotencyMiddleware
+from middleware.load_shedding import LoadSheddingMiddleware, CRITICAL, LOW
+from middleware.static import ImmutableStaticFiles
+from crud.images import IMAGE_DIR, MEDIA_DIR, MEDIA_URL, shutdown_image_pool
+from crud.enrollment import enrollment_batcher
+from crud.analytics import refresh_rollups_periodically
+from recommender.co_enrollment import build_periodically as build_co_enrollment_periodically, CO_ENROLLMENT_BUILD_SECONDS
+from recommender.typeahead import typeahead_index
 from contextlib import asynccontextmanager
+import asyncio
+import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables
+    # Startup: Create tables, then add what create_all cannot to the tables that already existed
     models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        upgrade_schema(connection)
+    # Build the typeahead index before serving suggestions, then keep it in step with the other workers
+    db = SessionLocal()
+    try:
+        typeahead_index.build(db)
+    finally:
+        db.close()
+    typeahead_index.start_rebuilds(SessionLocal)
+    # Analytics reads are served from the rollups as they are, this keeps them current
+    rollup_refresh = asyncio.create_task(refresh_rollups_periodically(SessionLocal))
+    # The recommender's delta only holds this worker's enrollments until the artifact is rebuilt
+    co_enrollment_build = asyncio.create_task(build_co_enrollment_periodically(SessionLocal)) if CO_ENROLLMENT_BUILD_SECONDS > 0 else None
     yield
     # Shutdown: cleanup if needed
+    rollup_refresh.cancel()
+    if co_enrollment_build:
+        co_enrollment_build.cancel()
+    typeahead_index.stop_rebuilds()
+    await enrollment_batcher.drain()
+    shutdown_image_pool()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Shed low priority routes first when the database pool or the event loop falls behind, anything unlisted is normal
+app.add_middleware(
+    LoadSheddingMiddleware,
+    priorities=[
+        # auth router
+        (r"/api/auth/.*", CRITICAL),
+        # innovation router
+        (r"/api/innovations/[^/]+/enroll", CRITICAL),
+        (r"/api/innovations/(all|changes|recommended|domain/[^/]+|[^/]+/related)", LOW),
+        # innovator router
+        (r"/api/innovators/all", LOW),
+        # analytics and metrics routers
+        (r"/api/analytics/.*", LOW),
+        (r"/api/metrics/.*", CRITICAL)
+    ]
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,9 +72,26 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Create endpoints that clients retry, repeated Idempotency-Key headers replay the first successful
+# response. The store lives in the process, so this relies on running a single worker.
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        r"/api/innovators/new",
+        r"/api/innovations/new",
+        r"/api/innovations/[^/]+/enroll"
+    ]
+)
+
+# Negotiated brotli/gzip compression for responses above the size threshold
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(auth.router)
 app.include_router(innovation.router)
 app.include_router(innovator.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+app.include_router(pages.router)
 
 @app.get("/")
 def root():
@@ -36,20 +100,9 @@ def root():
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
-# Serve frontend.html at root path
-@app.get("/home")
-def landing_page():
-    return FileResponse("frontend/frontend.html")
-
-# Catalog page
-@app.get("/catalog")
-def catalog():
-    return FileResponse("frontend/catalog.html")
-
-# Try page
-@app.get("/try")
-def try_page():
-    return FileResponse("frontend/try.html")
+# Uploaded images, named by content hash
+os.makedirs(IMAGE_DIR, exist_ok=True)
+app.mount(MEDIA_URL, ImmutableStaticFiles(directory=MEDIA_DIR), name="media")
 
 
 
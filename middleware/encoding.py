@@ -0,0 +1,185 @@
+from fastapi import Request, Response
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from contextvars import ContextVar
+from starlette.background import BackgroundTask
+from typing import Any, Callable, Mapping
+from middleware.sessions import SessionRoute
+import gzip
+import os
+import re
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Responses smaller than this are sent as-is, compressing them costs more than it saves
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", MSGPACK_MEDIA_TYPE, "text/")
+
+# Media type the current request negotiated, read when the endpoint's content is rendered
+negotiated_media_type: ContextVar[str] = ContextVar("negotiated_media_type", default="application/json")
+
+
+def add_vary(raw_headers: list, header: str) -> list:
+    """Raw ASGI headers with header added to Vary, keeping the fields already listed"""
+    vary = [value.decode("latin-1") for key, value in raw_headers if key.lower() == b"vary"]
+    if any(header.lower() == field.strip().lower() for value in vary for field in value.split(",")):
+        return raw_headers
+    raw_headers = [(key, value) for key, value in raw_headers if key.lower() != b"vary"]
+    raw_headers.append((b"vary", ", ".join(vary + [header]).encode("latin-1")))
+    return raw_headers
+
+
+def accepts(header: str, token: str) -> bool:
+    """Check whether a comma separated Accept style header allows the given token"""
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != token:
+            continue
+        # An explicit q=0 means the client refuses this encoding
+        if params.replace(" ", "").lower() in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            return False
+        return True
+    return False
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists etag, comparing opaque tags weakly as RFC 9110 asks"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    return opaque_tag in re.findall(r'"[^"]*"', if_none_match)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    if brotli is not None and accepts(accept_encoding, "br"):
+        return "br"
+    if accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+      Negotiate brotli/gzip compression for buffered responses above a size threshold.
+      Streaming responses and already encoded bodies are passed through untouched. Every
+      response of a compressible type carries Vary: Accept-Encoding, compressed or not, so
+      shared caches keep the variants apart.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict((key.decode("latin-1").lower(), value.decode("latin-1")) for key, value in scope["headers"])
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = dict((key.decode("latin-1").lower(), value.decode("latin-1")) for key, value in start_message["headers"])
+            content_type = response_headers.get("content-type", "")
+            negotiable = "content-encoding" not in response_headers and content_type.startswith(COMPRESSIBLE_TYPES)
+
+            if encoding is None or not negotiable or message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                if negotiable:
+                    start_message = {**start_message, "headers": add_vary(list(start_message["headers"]), "Accept-Encoding")}
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            raw_headers = add_vary([
+                (key, value) for key, value in start_message["headers"]
+                if key.lower() != b"content-length"
+            ], "Accept-Encoding")
+            raw_headers.append((b"content-encoding", encoding.encode("latin-1")))
+            raw_headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+
+            await send({**start_message, "headers": raw_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that renders the endpoint's content as MessagePack when the request negotiated it"""
+
+    def __init__(self, content: Any, status_code: int = 200, headers: Mapping[str, str] | None = None, media_type: str | None = None, background: BackgroundTask | None = None):
+        if negotiated_media_type.get() == MSGPACK_MEDIA_TYPE:
+            self.media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+
+class NegotiatedRoute(SessionRoute):
+    """
+      Route class that answers with MessagePack when the client asks for application/msgpack
+      in its Accept header. The validated response content goes straight to msgpack, the
+      JSON is never rendered and parsed back. Responses the endpoint builds itself stay JSON.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, *, response_class=Default(JSONResponse), **kwargs):
+        if msgpack is not None and (response_class.value if isinstance(response_class, DefaultPlaceholder) else response_class) is JSONResponse:
+            response_class = NegotiatedResponse
+        super().__init__(path, endpoint, response_class=response_class, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def negotiated_route_handler(request: Request) -> Response:
+            wants_msgpack = msgpack is not None and accepts(request.headers.get("accept", ""), MSGPACK_MEDIA_TYPE)
+            token = negotiated_media_type.set(MSGPACK_MEDIA_TYPE if wants_msgpack else "application/json")
+            try:
+                response = await original_route_handler(request)
+            finally:
+                negotiated_media_type.reset(token)
+            response.raw_headers[:] = add_vary(response.raw_headers, "Accept")
+            return response
+
+        return negotiated_route_handler
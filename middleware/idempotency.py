@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+import asyncio
+import hashlib
+import json
+import re
+import time
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+class IdempotencyStore:
+    """
+      Bounded, per-process store of completed responses keyed by idempotency key.
+      Entries expire after ttl seconds and the least recently used ones are evicted first.
+      Nothing is shared between processes, so the app must run as a single worker (the
+      default uvicorn command in render.yaml): a retry served by another worker is not
+      recognised and does the work again.
+    """
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._responses = OrderedDict()
+        self._in_flight = {}
+
+    def get(self, key):
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.monotonic():
+            del self._responses[key]
+            return None
+        self._responses.move_to_end(key)
+        return entry
+
+    def put(self, key, fingerprint: str, status: int, headers: list, body: bytes):
+        self._responses[key] = {
+            "fingerprint": fingerprint,
+            "status": status,
+            "headers": headers,
+            "body": body,
+            "expires_at": time.monotonic() + self.ttl
+        }
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_keys:
+            self._responses.popitem(last=False)
+
+    def in_flight(self, key) -> Optional[asyncio.Future]:
+        return self._in_flight.get(key)
+
+    def start(self, key) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        return future
+
+    def finish(self, key, future: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if not future.done():
+            future.set_result(None)
+
+
+class IdempotencyMiddleware:
+    """
+      Replays the stored response for POST requests that repeat an Idempotency-Key header.
+      Keys are scoped to the path and the caller's Authorization header. A duplicate that
+      arrives while the first request is still running waits for its result instead of
+      doing the work again. Only successful responses are stored, so a retry made once the
+      cause of a client or server error is fixed gets a fresh answer, not the stored error.
+    """
+
+    def __init__(self, app, paths: Iterable[str], store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.paths = [re.compile(path) for path in paths]
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not any(path.fullmatch(scope["path"]) for path in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the whole request body once, so it can be fingerprinted and then replayed to the app
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        key = (scope["path"], headers.get(b"authorization", b""), idempotency_key)
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        while True:
+            entry = self.store.get(key)
+            if entry is not None:
+                await self._replay(entry, fingerprint, send)
+                return
+
+            future = self.store.in_flight(key)
+            if future is None:
+                break
+            await asyncio.shield(future)
+
+        future = self.store.start(key)
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": None, "headers": [], "body": b""}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+                if not message.get("more_body", False) and 200 <= response["status"] < 300:
+                    self.store.put(key, fingerprint, response["status"], response["headers"], response["body"])
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            self.store.finish(key, future)
+
+    async def _replay(self, entry, fingerprint: str, send):
+        if entry["fingerprint"] != fingerprint:
+            body = json.dumps({"detail": "Idempotency-Key was already used with a different request body"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 422,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        logger.info("Replaying stored response for a repeated Idempotency-Key")
+        await send({
+            "type": "http.response.start",
+            "status": entry["status"],
+            "headers": entry["headers"] + [(b"idempotent-replayed", b"true")]
+        })
+        await send({"type": "http.response.body", "body": entry["body"]})
@@ -0,0 +1,133 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+from database.metrics import primary_pool_metrics, replica_pool_metrics
+import asyncio
+import json
+import re
+import time
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Priority classes, critical requests are never shed
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+# Pressure at which each class starts being shed: checkout wait in ms and event loop lag in ms
+SHED_LOW_WAIT_MS = float(os.getenv("SHED_LOW_WAIT_MS", "50"))
+SHED_LOW_LAG_MS = float(os.getenv("SHED_LOW_LAG_MS", "100"))
+SHED_NORMAL_WAIT_MS = float(os.getenv("SHED_NORMAL_WAIT_MS", "1000"))
+SHED_NORMAL_LAG_MS = float(os.getenv("SHED_NORMAL_LAG_MS", "500"))
+SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", "2"))
+
+LOOP_LAG_INTERVAL_SECONDS = 0.1
+
+
+class LoopLagMonitor:
+    """
+      Measures how late the event loop wakes up from a short sleep. A loop busy with
+      blocking work wakes up late, so the lag is how long any new request waits to start.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag_ms = max((time.monotonic() - started_at - self.interval) * 1000, 0.0)
+            # Rise at once, fade over a few intervals
+            self.lag_ms = max(lag_ms, self.lag_ms * 0.5)
+
+
+class LoadMetrics:
+    """Pressure signals and requests shed per priority class since startup"""
+
+    def __init__(self):
+        self.loop_lag = LoopLagMonitor()
+        self.shed = Counter()
+
+    def pool_pressure(self) -> Tuple[int, float]:
+        """Callers waiting for a connection and the worst recent checkout wait over all pools"""
+        pools = [metrics for metrics in (primary_pool_metrics, replica_pool_metrics) if metrics is not None]
+        return sum(metrics.waiting() for metrics in pools), max(metrics.checkout_wait_ms() for metrics in pools)
+
+    def snapshot(self) -> Dict:
+        waiting, checkout_wait_ms = self.pool_pressure()
+        return {
+            "loop_lag_ms": self.loop_lag.lag_ms,
+            "pool_waiting": waiting,
+            "checkout_wait_ms": checkout_wait_ms,
+            "shed": dict(self.shed)
+        }
+
+
+load_metrics = LoadMetrics()
+
+
+class LoadSheddingMiddleware:
+    """
+      Admission control in front of the routers. Each request gets the priority class of
+      the first pattern matching its path. While connections are being waited for or the
+      event loop is lagging, low priority requests are answered with an immediate 503 and
+      Retry-After instead of queueing for a connection, and normal ones follow once the
+      pressure gets severe, so critical routes keep the pool to themselves.
+    """
+
+    def __init__(self, app, priorities: Iterable[Tuple[str, str]], default: str = NORMAL, metrics: Optional[LoadMetrics] = None):
+        self.app = app
+        self.priorities = [(re.compile(path), priority) for path, priority in priorities]
+        self.default = default
+        self.metrics = metrics or load_metrics
+
+    def priority_of(self, path: str) -> str:
+        for pattern, priority in self.priorities:
+            if pattern.fullmatch(path):
+                return priority
+        return self.default
+
+    def should_shed(self, priority: str) -> bool:
+        if priority == CRITICAL:
+            return False
+
+        waiting, checkout_wait_ms = self.metrics.pool_pressure()
+        lag_ms = self.metrics.loop_lag.lag_ms
+        if priority == LOW:
+            return waiting > 0 or checkout_wait_ms >= SHED_LOW_WAIT_MS or lag_ms >= SHED_LOW_LAG_MS
+        return checkout_wait_ms >= SHED_NORMAL_WAIT_MS or lag_ms >= SHED_NORMAL_LAG_MS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.metrics.loop_lag.start()
+        priority = self.priority_of(scope["path"])
+        if not self.should_shed(priority):
+            await self.app(scope, receive, send)
+            return
+
+        self.metrics.shed[priority] += 1
+        logger.warning(f"Shedding {priority} priority request to {scope['path']}")
+        body = json.dumps({"detail": "The server is overloaded, retry later", "error": "overloaded", "priority": priority}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(SHED_RETRY_AFTER_SECONDS).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
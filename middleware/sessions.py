@@ -0,0 +1,117 @@
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from typing import Callable
+from database.database import RequestState, current_request_state, is_query_canceled, release_session
+from database.metrics import query_metrics
+import asyncio
+import functools
+import inspect
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Not a registered status code, but the common one for a client that closed the request
+CLIENT_CLOSED_REQUEST = 499
+
+
+def release_request_sessions(state: RequestState):
+    for db in state.sessions:
+        try:
+            release_session(db)
+        except Exception as e:
+            logger.error(f"Could not release database session: {str(e)}")
+
+def has_body(request: Request) -> bool:
+    return request.headers.get("content-length", "0") != "0" or "transfer-encoding" in request.headers
+
+async def watch_disconnect(state: RequestState):
+    """Cancel the request's queries as soon as the client disconnects"""
+    while True:
+        message = await state.receive()
+        if message["type"] == "http.disconnect":
+            state.disconnected = True
+            state.cancel_queries()
+            return
+
+def scoped_endpoint(endpoint: Callable) -> Callable:
+    """
+      Wrap an endpoint so its sessions are released before the response is serialized.
+      Async endpoints of requests without a body also watch for the client disconnecting
+      while they run, endpoints streaming a body themselves keep the receive channel.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapped_endpoint(*args, **kwargs):
+            state = current_request_state.get()
+            if state is None:
+                return await endpoint(*args, **kwargs)
+
+            watcher = asyncio.ensure_future(watch_disconnect(state)) if state.receive else None
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if watcher:
+                    watcher.cancel()
+                release_request_sessions(state)
+    else:
+        @functools.wraps(endpoint)
+        def wrapped_endpoint(*args, **kwargs):
+            state = current_request_state.get()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if state is not None:
+                    release_request_sessions(state)
+    return wrapped_endpoint
+
+
+class SessionRoute(APIRoute):
+    """
+      Route class that scopes database work to the request: queries get the route's
+      deadline as statement_timeout, are cancelled when the client disconnects, and the
+      connection goes back to the pool once the endpoint returns instead of being held
+      while the response is serialized and sent. Queries cut off by the deadline answer
+      with a structured 504.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, scoped_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def session_route_handler(request: Request) -> Response:
+            state = RequestState(receive=None if has_body(request) else request.receive)
+            token = current_request_state.set(state)
+            try:
+                return await original_route_handler(request)
+            except Exception as e:
+                # Endpoints wrap errors in HTTPException, the cancelled query is what they were raised from
+                if not is_query_canceled(e):
+                    raise
+                return self.canceled_response(state)
+            finally:
+                current_request_state.reset(token)
+
+        return session_route_handler
+
+    def canceled_response(self, state: RequestState) -> Response:
+        if state.disconnected:
+            query_metrics.record_cancellation(self.path)
+            logger.info(f"Cancelled the queries of {self.path} after the client disconnected")
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+        query_metrics.record_timeout(self.path)
+        logger.warning(f"Queries of {self.path} ran past their {state.deadline_ms} ms deadline")
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={
+                "detail": f"The request did not finish within its {state.deadline_ms} ms query deadline",
+                "error": "query_timeout",
+                "route": self.path,
+                "deadline_ms": state.deadline_ms
+            }
+        )
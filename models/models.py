@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, event, UUID, Table
+from sqlalchemy import Column, ForeignKey, BigInteger, Integer, String, Float, Date, DateTime, JSON, event, UUID, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.mutable import MutableDict
@@ -13,7 +13,11 @@ innovation_learner_association = Table(
     'innovation_learner_association',
     Base.metadata,
     Column("innovation_id", Integer, ForeignKey("innovation.id"), primary_key=True),
-    Column("innovator_id", Integer, ForeignKey("innovators.id"), primary_key=True)
+    Column("innovator_id", Integer, ForeignKey("innovators.id"), primary_key=True),
+    # When the enrollment happened, the analytics rollups read new enrollments from this
+    Column("enrolled_at", DateTime(timezone=True), server_default=func.now(), index=True),
+    # The primary key leads with innovation_id, this serves lookups of an innovator's courses
+    Index("ix_innovation_learner_innovator_innovation", "innovator_id", "innovation_id")
 )
 
 
@@ -26,7 +30,7 @@ class Innovator(Base):
     hashed_password = Column(String, nullable=False)
     status = Column(String, nullable=False)
     language = Column(String, nullable=False)
-    date_joined = Column(DateTime(timezone=True), server_default=func.now())
+    date_joined = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Many-to-Many relationship: An Innovator can register for many Innovations
     # Use 'secondary' to specify the association table
@@ -42,7 +46,8 @@ class Innovation(Base):
     id = Column(Integer, primary_key=True, index=True)
     course_name = Column(String, unique=True, nullable=False)
     course_description = Column(String, nullable=False)
-    content = Column(MutableDict.as_mutable(JSONB), nullable=True)
+    # JSONB on Postgres, plain JSON on other backends such as the in-memory SQLite used for tests
+    content = Column(MutableDict.as_mutable(JSON().with_variant(JSONB(), "postgresql")), nullable=True)
     course_duration = Column(Integer, nullable=False)
     course_price = Column(String, nullable=False)
     course_tutor = Column(String, nullable=False)
@@ -56,4 +61,50 @@ class Innovation(Base):
         back_populates="registered_courses")
 
 
-    
\ No newline at end of file
+# Rollup tables for the analytics endpoints, refreshed incrementally from a watermark
+class EnrollmentRollup(Base):
+    __tablename__ = "enrollment_rollup"
+
+    course_domain = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    enrollments = Column(Integer, nullable=False, default=0)
+
+
+class SignupRollup(Base):
+    __tablename__ = "signup_rollup"
+
+    language = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    signups = Column(Integer, nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermark"
+
+    name = Column(String, primary_key=True)
+    # Newest source timestamp already folded into the rollup
+    last_seen = Column(DateTime(timezone=True), nullable=True)
+
+
+# Change log of the innovation catalog, read by the change feed in id order
+class InnovationChange(Base):
+    __tablename__ = "innovation_changes"
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    innovation_id = Column(Integer, nullable=False, index=True)
+    course_name = Column(String, nullable=False)
+    # created, updated or deleted
+    operation = Column(String, nullable=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Optional seat limit of an innovation, kept off the innovation row so enrollments never lock it
+class InnovationSeats(Base):
+    __tablename__ = "innovation_seats"
+
+    innovation_id = Column(Integer, ForeignKey("innovation.id", ondelete="CASCADE"), primary_key=True)
+    capacity = Column(Integer, nullable=False)
+    taken = Column(Integer, nullable=False, default=0)
+    # Seats handed out by the latest reservation, written in the same UPDATE as taken
+    last_grant = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,58 @@
+from typing import Any, Dict
+import threading
+import joblib
+import time
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ARTIFACT_DIR = os.getenv("RECOMMENDER_ARTIFACT_DIR", "artifacts")
+
+# How often a worker checks whether the offline job wrote a newer artifact
+RELOAD_CHECK_SECONDS = 30
+
+
+def dump_artifact(artifact: Dict[str, Any], path: str):
+    """Persist an artifact uncompressed so it can be memory-mapped"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write next to the target and swap, so workers never map a half written file
+    tmp_path = f"{path}.tmp"
+    joblib.dump(artifact, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+
+class MemoryMappedArtifact:
+    """
+      Base class for per-worker indexes backed by a joblib artifact.
+      The artifact is memory-mapped and reloaded when the offline job replaces it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _load(self, artifact: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            self._load(joblib.load(self.path, mmap_mode="r"))
+            self._mtime = mtime
+            logger.info(f"Loaded artifact {self.path}")
@@ -0,0 +1,263 @@
+"""
+  Item-item recommendations from the innovation_learner_association co-enrollment matrix.
+
+  The offline job (python -m recommender.co_enrollment) counts how often two innovations
+  share a learner and persists the sparse co-occurrence matrix with joblib. Workers
+  memory-map the artifact and score candidates as cosine similarity:
+
+      sim(i, j) = C[i, j] / sqrt(n_i * n_j)
+
+  The artifact holds the enrollments made up to its build watermark, a minute before the
+  build started so transactions still in flight are not missed. Enrollments and withdrawals
+  are also kept as an in-memory delta on top of the artifact with their time, and a newly
+  loaded artifact only drops the ones it already holds. The delta is per worker: it only has
+  the enrollments this worker wrote, those written by other workers show up once the next
+  build is loaded. The app rebuilds the artifact every CO_ENROLLMENT_BUILD_SECONDS, and the
+  delta is capped at MAX_DELTA_EVENTS should builds stop.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import select, text
+from starlette.concurrency import run_in_threadpool
+from scipy import sparse
+from typing import Callable, Dict, Iterable, List, Optional
+from models.models import innovation_learner_association
+from recommender.artifact import ARTIFACT_DIR, MemoryMappedArtifact, dump_artifact
+import numpy as np
+import asyncio
+import time
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ARTIFACT_PATH = os.path.join(ARTIFACT_DIR, "co_enrollment.joblib")
+
+# Enrollments younger than this are left to the delta, so transactions that commit late
+# with an earlier enrolled_at are neither missed by the build nor dropped from the delta
+BUILD_LAG = timedelta(minutes=1)
+
+# How often the app rebuilds the artifact, 0 leaves it to a job running this module
+CO_ENROLLMENT_BUILD_SECONDS = float(os.getenv("CO_ENROLLMENT_BUILD_SECONDS", "3600"))
+# Advisory lock held while building, so workers sharing the artifact directory build one at a time
+BUILD_LOCK_ID = 8_029_001
+# Recorded events kept on top of the artifact, the oldest are dropped past this
+MAX_DELTA_EVENTS = int(os.getenv("CO_ENROLLMENT_MAX_DELTA_EVENTS", "100000"))
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def build_co_enrollment_artifact(db: Session, path: str = ARTIFACT_PATH) -> int:
+    """Build the co-occurrence matrix from the association table and persist it, returns the item count"""
+    built_through = datetime.now(timezone.utc) - BUILD_LAG
+    rows = db.execute(select(
+        innovation_learner_association.c.innovation_id,
+        innovation_learner_association.c.innovator_id
+    ).where(innovation_learner_association.c.enrolled_at <= built_through)).all()
+
+    enrollments = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    item_ids, item_index = np.unique(enrollments[:, 0], return_inverse=True)
+    _, user_index = np.unique(enrollments[:, 1], return_inverse=True)
+
+    # Learners x innovations incidence matrix, C = X^T X counts shared learners
+    incidence = sparse.csr_matrix(
+        (np.ones(len(enrollments), dtype=np.float32), (user_index, item_index)),
+        shape=(int(user_index.max(initial=-1)) + 1, len(item_ids))
+    )
+    co_occurrence = (incidence.T @ incidence).tocsr()
+    counts = co_occurrence.diagonal().astype(np.float32)
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+
+    artifact = {
+        "item_ids": item_ids,
+        "counts": counts,
+        "data": co_occurrence.data.astype(np.float32),
+        "indices": co_occurrence.indices.astype(np.int32),
+        "indptr": co_occurrence.indptr.astype(np.int32),
+        "built_through": built_through,
+    }
+
+    dump_artifact(artifact, path)
+
+    logger.info(f"Built co-enrollment artifact with {len(item_ids)} innovations and {co_occurrence.nnz} pairs")
+    return len(item_ids)
+
+def build_if_due(session_factory: Callable[[], Session], interval: float, path: str = ARTIFACT_PATH) -> bool:
+    """Build the artifact unless another worker built it within interval or is building it now"""
+    try:
+        if time.time() - os.stat(path).st_mtime < interval:
+            return False
+    except FileNotFoundError:
+        pass
+
+    db = session_factory()
+    try:
+        if db.get_bind().dialect.name == "postgresql" and not db.execute(text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": BUILD_LOCK_ID}).scalar():
+            return False
+        build_co_enrollment_artifact(db, path)
+        return True
+    finally:
+        db.rollback()
+        db.close()
+
+async def build_periodically(session_factory: Callable[[], Session], interval: float = CO_ENROLLMENT_BUILD_SECONDS):
+    """Keep the artifact at most interval seconds old, every worker runs one and at most one of them builds"""
+    while True:
+        try:
+            await run_in_threadpool(build_if_due, session_factory, interval)
+        except Exception as e:
+            logger.error(f"Error building the co-enrollment artifact: {str(e)}")
+        await asyncio.sleep(interval / 2)
+
+
+class CoEnrollmentIndex(MemoryMappedArtifact):
+    """Serving side of the recommender, one instance per worker"""
+
+    def __init__(self, path: str = ARTIFACT_PATH):
+        super().__init__(path)
+        self._item_ids = np.empty(0, dtype=np.int64)
+        self._position: Dict[int, int] = {}
+        self._counts = np.empty(0, dtype=np.float32)
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._delta_events = []
+        self._reset_delta()
+
+    def _reset_delta(self, built_through: Optional[datetime] = None):
+        """Rebuild the delta from the recorded enrollments newer than built_through, all of them when None"""
+        if built_through is not None:
+            self._delta_events = [event for event in self._delta_events if event[0] > built_through]
+        self._delta_pairs: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        self._delta_counts: Dict[int, float] = defaultdict(float)
+        for _, innovation_id, other_innovation_ids, delta in self._delta_events:
+            self._apply(innovation_id, other_innovation_ids, delta)
+
+    def _apply(self, innovation_id: int, other_innovation_ids: Iterable[int], delta: int):
+        self._delta_counts[innovation_id] += delta
+        for other_id in other_innovation_ids:
+            if other_id == innovation_id:
+                continue
+            self._delta_pairs[innovation_id][other_id] += delta
+            self._delta_pairs[other_id][innovation_id] += delta
+
+    def _load(self, artifact):
+        n_items = len(artifact["item_ids"])
+        self._matrix = sparse.csr_matrix(
+            (artifact["data"], artifact["indices"], artifact["indptr"]),
+            shape=(n_items, n_items),
+            copy=False
+        )
+        self._item_ids = artifact["item_ids"]
+        self._counts = artifact["counts"]
+        self._position = {int(item_id): position for position, item_id in enumerate(self._item_ids)}
+        # Keep what the artifact does not hold yet, an artifact without a watermark holds everything
+        built_through = artifact.get("built_through")
+        if built_through is None:
+            self._delta_events = []
+        else:
+            built_through = _as_utc(built_through)
+        self._reset_delta(built_through)
+
+    def record_enrollment(self, innovation_id: int, other_innovation_ids: Iterable[int], delta: int = 1, enrolled_at: Optional[datetime] = None):
+        """Apply one enrollment (delta=1) or withdrawal (delta=-1) given the learner's other courses"""
+        other_innovation_ids = tuple(other_innovation_ids)
+        enrolled_at = _as_utc(enrolled_at) if enrolled_at else datetime.now(timezone.utc)
+        with self._lock:
+            self._delta_events.append((enrolled_at, innovation_id, other_innovation_ids, delta))
+            self._apply(innovation_id, other_innovation_ids, delta)
+            if len(self._delta_events) > MAX_DELTA_EVENTS:
+                self._drop_oldest_events()
+
+    def record_withdrawals(self, innovation_ids: Iterable[int]):
+        """Take a learner out of all of innovation_ids at once, each pair of them is counted down once"""
+        innovation_ids = list(innovation_ids)
+        for position, innovation_id in enumerate(innovation_ids):
+            self.record_enrollment(innovation_id, innovation_ids[position + 1:], delta=-1)
+
+    def _drop_oldest_events(self):
+        # A tenth at a time, so a full delta is not trimmed on every enrollment
+        dropped = len(self._delta_events) - MAX_DELTA_EVENTS * 9 // 10
+        for _, innovation_id, other_innovation_ids, delta in self._delta_events[:dropped]:
+            self._apply(innovation_id, other_innovation_ids, -delta)
+        del self._delta_events[:dropped]
+        logger.warning(f"Dropped the {dropped} oldest co-enrollment events, the artifact has not been rebuilt for a while")
+
+    def _base_count(self, item_id: int) -> float:
+        position = self._position.get(item_id)
+        return float(self._counts[position]) if position is not None else 0.0
+
+    def recommend(self, enrolled_ids: List[int], limit: int = 10) -> List[int]:
+        """Top innovation ids for a learner enrolled in enrolled_ids, best first"""
+        self._maybe_reload()
+        enrolled_ids = list(dict.fromkeys(enrolled_ids))
+        if not enrolled_ids:
+            return []
+
+        with self._lock:
+            weights = {item_id: 1.0 / np.sqrt(max(self._base_count(item_id) + self._delta_counts.get(item_id, 0.0), 1.0)) for item_id in enrolled_ids}
+
+            # Only the rows of the enrolled items are read, their weighted sum is sparse over the co-enrolled items.
+            # Scores are summed in float64 like the delta, so a withdrawal cancels its enrollment exactly.
+            base_ids = [item_id for item_id in enrolled_ids if item_id in self._position]
+            if base_ids:
+                row_weights = sparse.csr_matrix(np.array([[weights[item_id] for item_id in base_ids]], dtype=np.float64))
+                combined = (row_weights @ self._matrix[[self._position[item_id] for item_id in base_ids]]).tocsr()
+                combined.sort_indices()
+                candidate_ids = self._item_ids[combined.indices]
+                scores = combined.data.astype(np.float64)
+                counts = self._counts[combined.indices].astype(np.float64)
+            else:
+                candidate_ids = np.empty(0, dtype=np.int64)
+                scores = np.empty(0, dtype=np.float64)
+                counts = np.empty(0, dtype=np.float64)
+
+            # Pairs recorded since the build, candidate_ids is sorted as the artifact ids are
+            delta_scores = defaultdict(float)
+            for item_id in enrolled_ids:
+                for other_id, delta in self._delta_pairs.get(item_id, {}).items():
+                    delta_scores[other_id] += delta * weights[item_id]
+            new_ids, new_scores = [], []
+            for item_id, score in delta_scores.items():
+                index = np.searchsorted(candidate_ids, item_id)
+                if index < len(candidate_ids) and candidate_ids[index] == item_id:
+                    scores[index] += score
+                else:
+                    new_ids.append(item_id)
+                    new_scores.append(score)
+            if new_ids:
+                candidate_ids = np.concatenate([candidate_ids, np.array(new_ids, dtype=np.int64)])
+                scores = np.concatenate([scores, new_scores])
+                counts = np.concatenate([counts, [self._base_count(item_id) for item_id in new_ids]])
+            if self._delta_counts and len(candidate_ids):
+                counts += np.array([self._delta_counts.get(item_id, 0.0) for item_id in candidate_ids.tolist()])
+
+        scores /= np.sqrt(np.maximum(counts, 1.0))
+        scores[np.isin(candidate_ids, enrolled_ids)] = 0.0
+
+        limit = min(limit, int(np.count_nonzero(scores > 0)))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [int(item_id) for item_id in candidate_ids[top]]
+
+
+# Shared per-worker index used by the API
+co_enrollment_index = CoEnrollmentIndex()
+
+
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        build_co_enrollment_artifact(db)
+    finally:
+        db.close()
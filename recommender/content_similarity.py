@@ -0,0 +1,213 @@
+"""
+  "Related courses" from TF-IDF vectors of course_name, course_description and course_domain.
+
+  The offline job (python -m recommender.content_similarity) fits the IDF weights, vectorizes
+  every innovation and precomputes its nearest neighbours, so a lookup is a row read from the
+  memory-mapped artifact. Writes go through upsert/remove, which vectorize a single course with
+  the frozen IDF weights and patch the affected neighbour lists in memory instead of refitting.
+  Those patches are per worker: the other workers keep serving the artifact's lists for the
+  courses written until the next build is loaded.
+"""
+from sqlalchemy.orm import Session
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize
+from scipy import sparse
+from typing import Dict, List, Tuple
+from models.models import Innovation
+from recommender.artifact import ARTIFACT_DIR, MemoryMappedArtifact, dump_artifact
+import numpy as np
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ARTIFACT_PATH = os.path.join(ARTIFACT_DIR, "content_similarity.joblib")
+
+# Neighbours kept per course
+NEIGHBOURS = 20
+# Rows scored at once while precomputing neighbours, bounds the dense block to CHUNK_SIZE x n_courses
+CHUNK_SIZE = 256
+
+# Stateless, so new courses are vectorized without refitting a vocabulary
+vectorizer = HashingVectorizer(n_features=2 ** 18, alternate_sign=False, norm=None, stop_words="english")
+
+
+def course_text(course_name: str, course_description: str, course_domain: str) -> str:
+    return f"{course_name} {course_description} {course_domain}"
+
+
+def _top_neighbours(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k of a dense score block, best first"""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def build_content_similarity_artifact(db: Session, path: str = ARTIFACT_PATH) -> int:
+    """Fit IDF weights, precompute neighbours for every innovation and persist them, returns the item count"""
+    rows = db.query(Innovation.id, Innovation.course_name, Innovation.course_description, Innovation.course_domain).all()
+
+    item_ids = np.array([row.id for row in rows], dtype=np.int64)
+    counts = vectorizer.transform([course_text(row.course_name, row.course_description, row.course_domain) for row in rows])
+    transformer = TfidfTransformer(sublinear_tf=True).fit(counts)
+    vectors = normalize(counts @ sparse.diags(transformer.idf_)).astype(np.float32).tocsr()
+
+    k = min(NEIGHBOURS, max(len(item_ids) - 1, 0))
+    neighbour_ids = np.full((len(item_ids), k), -1, dtype=np.int64)
+    neighbour_scores = np.zeros((len(item_ids), k), dtype=np.float32)
+
+    if k:
+        for start in range(0, len(item_ids), CHUNK_SIZE):
+            block = (vectors[start:start + CHUNK_SIZE] @ vectors.T).toarray()
+            # A course is not related to itself
+            block[np.arange(len(block)), np.arange(start, start + len(block))] = -1.0
+            top, top_scores = _top_neighbours(block, k)
+            neighbour_ids[start:start + len(block)] = item_ids[top]
+            neighbour_scores[start:start + len(block)] = top_scores
+
+    artifact = {
+        "item_ids": item_ids,
+        "idf": transformer.idf_.astype(np.float32) if len(item_ids) else np.ones(vectorizer.n_features, dtype=np.float32),
+        "data": vectors.data,
+        "indices": vectors.indices.astype(np.int32),
+        "indptr": vectors.indptr.astype(np.int32),
+        "neighbour_ids": neighbour_ids,
+        "neighbour_scores": neighbour_scores,
+    }
+    dump_artifact(artifact, path)
+
+    logger.info(f"Built content similarity artifact with {len(item_ids)} innovations")
+    return len(item_ids)
+
+
+class ContentSimilarityIndex(MemoryMappedArtifact):
+    """Serving side of related courses, one instance per worker"""
+
+    def __init__(self, path: str = ARTIFACT_PATH):
+        super().__init__(path)
+        self._item_ids = np.empty(0, dtype=np.int64)
+        self._position: Dict[int, int] = {}
+        self._idf = np.ones(vectorizer.n_features, dtype=np.float32)
+        self._vectors = sparse.csr_matrix((0, vectorizer.n_features), dtype=np.float32)
+        self._neighbour_ids = np.empty((0, 0), dtype=np.int64)
+        self._neighbour_scores = np.empty((0, 0), dtype=np.float32)
+        self._reset_delta()
+
+    def _reset_delta(self):
+        # Courses written since the last build, and neighbour lists patched by those writes
+        self._delta_vectors: Dict[int, sparse.csr_matrix] = {}
+        self._neighbour_overrides: Dict[int, Tuple[List[int], List[float]]] = {}
+        self._removed = set()
+
+    def _load(self, artifact):
+        self._item_ids = artifact["item_ids"]
+        self._position = {int(item_id): position for position, item_id in enumerate(self._item_ids)}
+        self._idf = artifact["idf"]
+        self._vectors = sparse.csr_matrix(
+            (artifact["data"], artifact["indices"], artifact["indptr"]),
+            shape=(len(self._item_ids), vectorizer.n_features),
+            copy=False
+        )
+        self._neighbour_ids = artifact["neighbour_ids"]
+        self._neighbour_scores = artifact["neighbour_scores"]
+        self._reset_delta()
+
+    def _neighbours(self, item_id: int) -> Tuple[List[int], List[float]]:
+        if item_id in self._neighbour_overrides:
+            return self._neighbour_overrides[item_id]
+        position = self._position.get(item_id)
+        if position is None or not self._neighbour_ids.shape[1]:
+            return [], []
+        return self._neighbour_ids[position].tolist(), self._neighbour_scores[position].tolist()
+
+    def related(self, item_id: int, limit: int = 10) -> List[int]:
+        """Innovation ids most similar to item_id, best first"""
+        self._maybe_reload()
+
+        with self._lock:
+            ids, _ = self._neighbours(item_id)
+            return [other_id for other_id in ids if other_id >= 0 and other_id not in self._removed][:limit]
+
+    def upsert(self, item_id: int, course_name: str, course_description: str, course_domain: str):
+        """Vectorize one created or updated course and patch the neighbour lists it affects"""
+        self._maybe_reload()
+        counts = vectorizer.transform([course_text(course_name, course_description, course_domain)])
+        vector = normalize(counts.multiply(self._idf).tocsr()).astype(np.float32)
+
+        with self._lock:
+            self._removed.discard(item_id)
+            self._delta_vectors[item_id] = vector
+
+            # Score against the artifact and every course written since, ignoring stale copies of item_id
+            scores = (self._vectors @ vector.T).toarray().ravel()
+            candidate_ids = self._item_ids
+            delta_ids = [other_id for other_id in self._delta_vectors if other_id != item_id]
+            if delta_ids:
+                delta_scores = (sparse.vstack([self._delta_vectors[other_id] for other_id in delta_ids]) @ vector.T).toarray().ravel()
+                # A delta vector supersedes the artifact row of the same course
+                stale = [self._position[other_id] for other_id in delta_ids if other_id in self._position]
+                scores[stale] = 0.0
+                scores = np.concatenate([scores, delta_scores])
+                candidate_ids = np.concatenate([candidate_ids, np.array(delta_ids, dtype=np.int64)])
+            if item_id in self._position:
+                scores[self._position[item_id]] = 0.0
+
+            k = min(NEIGHBOURS, int(np.count_nonzero(scores > 0)))
+            if k:
+                top, top_scores = _top_neighbours(scores[None, :], k)
+                self._neighbour_overrides[item_id] = (candidate_ids[top[0]].tolist(), top_scores[0].tolist())
+            else:
+                self._neighbour_overrides[item_id] = ([], [])
+
+            # Courses whose weakest neighbour scores below the new course take it into their list,
+            # and courses that listed the old version of it get its new score or lose it
+            weakest = np.zeros(len(scores), dtype=np.float32)
+            if self._neighbour_ids.shape[1] >= NEIGHBOURS:
+                weakest[:len(self._item_ids)] = self._neighbour_scores[:, -1]
+            affected = set(np.nonzero(scores > weakest)[0].tolist())
+            candidate_position = {int(other_id): len(self._item_ids) + offset for offset, other_id in enumerate(delta_ids)}
+            listing_ids = {int(other_id) for other_id in self._item_ids[np.nonzero(self._neighbour_ids == item_id)[0]]}
+            listing_ids.update(other_id for other_id, (ids, _) in self._neighbour_overrides.items() if item_id in ids)
+            for other_id in listing_ids - {item_id}:
+                position = candidate_position.get(other_id, self._position.get(other_id))
+                if position is not None:
+                    affected.add(position)
+
+            for position in affected:
+                other_id = int(candidate_ids[position])
+                ids, other_scores = self._neighbours(other_id)
+                pairs = [(i, s) for i, s in zip(ids, other_scores) if i != item_id and i >= 0]
+                listed = item_id in ids
+                joins = scores[position] > 0 and (len(pairs) < NEIGHBOURS or pairs[-1][1] < scores[position])
+                if not joins and not listed:
+                    continue
+                if joins:
+                    pairs.append((item_id, float(scores[position])))
+                    pairs.sort(key=lambda pair: -pair[1])
+                    pairs = pairs[:NEIGHBOURS]
+                self._neighbour_overrides[other_id] = ([i for i, _ in pairs], [s for _, s in pairs])
+
+    def remove(self, item_id: int):
+        with self._lock:
+            self._removed.add(item_id)
+            self._delta_vectors.pop(item_id, None)
+            self._neighbour_overrides.pop(item_id, None)
+
+
+# Shared per-worker index used by the API
+content_similarity_index = ContentSimilarityIndex()
+
+
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        build_content_similarity_artifact(db)
+    finally:
+        db.close()
@@ -0,0 +1,290 @@
+"""
+  Typeahead suggestions over course_name and course_domain.
+
+  Courses are indexed by the words of their name and domain, and the words by their padded
+  trigrams. Each word of a query is matched against that vocabulary, by prefix for the word
+  still being typed and by shared trigrams otherwise, so "pyt" finds "python" and "icpx"
+  still finds "icpc". Only the most popular courses of the best matching words are scored,
+  popularity being the number of learners enrolled, which keeps a lookup well under a
+  millisecond whatever the size of the catalog. The index lives in the memory of each worker.
+  It is built at startup and patched by the crud write paths of that worker only, so courses
+  and enrollments written through other workers, popularity included, only show up once it
+  is rebuilt every TYPEAHEAD_REBUILD_SECONDS.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from bisect import bisect_left, insort
+from models.models import Innovation, innovation_learner_association
+import asyncio
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Share of a word's trigrams a vocabulary word must have to match it, and at least two of them
+# so a single shared first letter is not a match. Words shorter than three letters only match by prefix.
+MIN_SIMILARITY = 0.3
+MIN_SHARED_TRIGRAMS = 2
+MIN_FUZZY_LENGTH = 3
+PREFIX_BONUS = 0.5
+WORD_PREFIX_BONUS = 0.25
+POPULARITY_WEIGHT = 0.3
+# Bounds on the work of one lookup
+MAX_COURSES_PER_WORD = 100
+MAX_CANDIDATES = 300
+# How often each worker rebuilds its index from the database
+TYPEAHEAD_REBUILD_SECONDS = float(os.getenv("TYPEAHEAD_REBUILD_SECONDS", "300"))
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+def trigrams(word: str, prefix: bool = False) -> Set[str]:
+    """Trigrams of a word padded like pg_trgm, a prefix gets no end padding"""
+    padded = "  " + word + ("" if prefix else " ")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# What a rebuild swaps in at once
+INDEX_STATE = ("_courses", "_word_courses", "_vocabulary", "_gram_words", "_max_popularity")
+
+
+class TypeaheadIndex:
+    """In-memory index of the course catalog, one instance per worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_task = None
+        # Catalog writes made while a rebuild reads the database, replayed on the rebuilt index
+        self._writes_during_build: Optional[List[Tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        self._courses: Dict[int, Dict] = {}
+        # Vocabulary word to its courses as (-popularity, id), most popular first
+        self._word_courses: Dict[str, List[Tuple[int, int]]] = {}
+        self._vocabulary: List[str] = []
+        self._gram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._max_popularity = 0
+
+    def build(self, db: Session) -> int:
+        """
+          Index every course with its learner count, returns the number of courses. The new
+          index is built aside and swapped in, so suggestions are only held up by the swap.
+        """
+        with self._lock:
+            self._writes_during_build = []
+        try:
+            rows = db.query(Innovation.id, Innovation.course_name, Innovation.course_domain, func.count(innovation_learner_association.c.innovator_id))\
+                     .outerjoin(innovation_learner_association, innovation_learner_association.c.innovation_id == Innovation.id)\
+                     .group_by(Innovation.id)\
+                     .all()
+
+            staged = TypeaheadIndex()
+            for innovation_id, course_name, course_domain, popularity in rows:
+                staged._add(innovation_id, course_name, course_domain, popularity)
+        except Exception:
+            with self._lock:
+                self._writes_during_build = None
+            raise
+
+        with self._lock:
+            for name in INDEX_STATE:
+                setattr(self, name, getattr(staged, name))
+            # Courses created, renamed or deleted meanwhile may be missing from what was read
+            for write in self._writes_during_build:
+                self._apply_write(*write)
+            self._writes_during_build = None
+            words = len(self._vocabulary)
+
+        logger.info(f"Built typeahead index with {len(rows)} innovations and {words} words")
+        return len(rows)
+
+    def _rebuild(self, session_factory: Callable[[], Session]):
+        db = session_factory()
+        try:
+            self.build(db)
+        finally:
+            db.close()
+
+    async def _rebuild_periodically(self, session_factory: Callable[[], Session], interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self._rebuild, session_factory)
+            except Exception as e:
+                logger.error(f"Error rebuilding typeahead index: {str(e)}")
+
+    def start_rebuilds(self, session_factory: Callable[[], Session], interval: float = TYPEAHEAD_REBUILD_SECONDS):
+        """Rebuild the index every interval seconds, picking up what other workers wrote"""
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild_periodically(session_factory, interval))
+
+    def stop_rebuilds(self):
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+
+    def _add(self, innovation_id: int, course_name: str, course_domain: str, popularity: int):
+        name = normalize_text(course_name)
+        words = frozenset(f"{name} {normalize_text(course_domain)}".split())
+        self._courses[innovation_id] = {
+            "course_name": course_name,
+            "course_domain": course_domain,
+            "name": name,
+            "words": words,
+            "popularity": popularity
+        }
+        for word in words:
+            if word not in self._word_courses:
+                self._word_courses[word] = []
+                insort(self._vocabulary, word)
+                for gram in trigrams(word):
+                    self._gram_words[gram].add(word)
+            insort(self._word_courses[word], (-popularity, innovation_id))
+        self._max_popularity = max(self._max_popularity, popularity)
+
+    def _discard(self, innovation_id: int) -> Optional[Dict]:
+        course = self._courses.pop(innovation_id, None)
+        if course is None:
+            return None
+        key = (-course["popularity"], innovation_id)
+        for word in course["words"]:
+            courses = self._word_courses[word]
+            del courses[bisect_left(courses, key)]
+            if not courses:
+                del self._word_courses[word]
+                del self._vocabulary[bisect_left(self._vocabulary, word)]
+                for gram in trigrams(word):
+                    self._gram_words[gram].discard(word)
+                    if not self._gram_words[gram]:
+                        del self._gram_words[gram]
+        return course
+
+    def _apply_write(self, operation: str, innovation_id: int, *args):
+        if operation == "upsert":
+            previous = self._discard(innovation_id)
+            self._add(innovation_id, *args, previous["popularity"] if previous else 0)
+        else:
+            self._discard(innovation_id)
+
+    def _write(self, *write):
+        with self._lock:
+            self._apply_write(*write)
+            if self._writes_during_build is not None:
+                self._writes_during_build.append(write)
+
+    def upsert(self, innovation_id: int, course_name: str, course_domain: str):
+        """Index a created or renamed course, keeping the popularity it had"""
+        self._write("upsert", innovation_id, course_name, course_domain)
+
+    def remove(self, innovation_id: int):
+        self._write("remove", innovation_id)
+
+    def add_popularity(self, innovation_id: int, delta: int = 1):
+        with self._lock:
+            course = self._courses.get(innovation_id)
+            if course is None:
+                return
+            popularity = max(course["popularity"] + delta, 0)
+            # Moved within each of its words' rankings, found by binary search on (-popularity, id)
+            old_key, new_key = (-course["popularity"], innovation_id), (-popularity, innovation_id)
+            for word in course["words"]:
+                courses = self._word_courses[word]
+                del courses[bisect_left(courses, old_key)]
+                insort(courses, new_key)
+            course["popularity"] = popularity
+            self._max_popularity = max(self._max_popularity, popularity)
+
+    def _match_word(self, word: str, prefix: bool) -> Dict[str, float]:
+        """Vocabulary words matching a query word, with how well they match"""
+        matches = {}
+        if prefix:
+            position = bisect_left(self._vocabulary, word)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(word) and len(matches) < MAX_CANDIDATES:
+                matches[self._vocabulary[position]] = 1.0
+                position += 1
+        if len(word) < MIN_FUZZY_LENGTH:
+            return matches
+
+        grams = trigrams(word, prefix)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._gram_words.get(gram, ()))
+        min_shared = min(MIN_SHARED_TRIGRAMS, len(grams))
+        for candidate, count in shared.items():
+            if candidate in matches or count < min_shared:
+                continue
+            # A word being typed only has to be contained in the candidate, a finished one has to resemble it
+            similarity = count / len(grams) if prefix else count / len(grams | trigrams(candidate))
+            if similarity >= MIN_SIMILARITY:
+                matches[candidate] = similarity
+        return matches
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        """Best matching courses for what has been typed so far, best first"""
+        started_at = time.perf_counter()
+        text = normalize_text(query)
+        words = text.split()
+        if not words:
+            return []
+
+        with self._lock:
+            word_matches = [self._match_word(word, position == len(words) - 1) for position, word in enumerate(words)]
+            matched = [matches for matches in word_matches if matches]
+            if not matched:
+                return []
+
+            # Candidates are the most popular courses of the most selective query word, best matching words first
+            anchor = min(matched, key=lambda matches: sum(len(self._word_courses[word]) for word in matches))
+            candidates = set()
+            for word, _ in sorted(anchor.items(), key=lambda item: -item[1]):
+                candidates.update(innovation_id for _, innovation_id in self._word_courses[word][:MAX_COURSES_PER_WORD])
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+
+            popularity_scale = math.log1p(self._max_popularity) or 1.0
+            scored = []
+            for innovation_id in candidates:
+                course = self._courses[innovation_id]
+                similarity = sum(max((matches.get(word, 0.0) for word in course["words"]), default=0.0) for matches in word_matches) / len(words)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                score = similarity + POPULARITY_WEIGHT * math.log1p(course["popularity"]) / popularity_scale
+                if course["name"].startswith(text):
+                    score += PREFIX_BONUS
+                elif f" {text}" in f" {course['name']}":
+                    score += WORD_PREFIX_BONUS
+                scored.append((score, course["popularity"], innovation_id))
+
+            suggestions = [
+                {
+                    "id": innovation_id,
+                    "course_name": self._courses[innovation_id]["course_name"],
+                    "course_domain": self._courses[innovation_id]["course_domain"],
+                    "popularity": popularity,
+                    "score": round(score, 4)
+                }
+                for score, popularity, innovation_id in heapq.nlargest(limit, scored)
+            ]
+
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        if elapsed_ms > 1:
+            logger.warning(f"Typeahead lookup for {query!r} took {elapsed_ms:.2f} ms")
+        return suggestions
+
+
+# Shared per-worker index used by the API
+typeahead_index = TypeaheadIndex()
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+import logging
+from models.models import Innovator as InnovatorModel
+
+from schema.schemas import (
+    EnrollmentRollup,
+    SignupRollup
+)
+from database.database import get_db
+from crud.analytics import (
+    get_enrollments_per_domain as get_enrollments_per_domain_crud,
+    get_signups_per_language as get_signups_per_language_crud
+)
+from middleware.encoding import NegotiatedRoute
+from authentication.auth import (
+    get_current_innovator
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["Analytics"],
+    route_class=NegotiatedRoute,
+    responses={
+        404: {"description": "Not found"},
+        403: {"description": "Forbidden"},
+        400: {"description": "Bad request"}
+    }
+)
+
+# Get enrollments per domain per week
+@router.get(
+    "/enrollments-per-domain",
+    response_model=List[EnrollmentRollup],
+    summary="Get enrollments per domain per week",
+    description="Get the number of enrollments in each course domain per week, served from the enrollment rollup. New enrollments show up within ROLLUP_REFRESH_SECONDS plus a minute",
+    response_description="Weekly enrollment counts per domain"
+)
+async def get_enrollments_per_domain(course_domain: Optional[str] = None, since: Optional[date] = None, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        rollup = get_enrollments_per_domain_crud(db, current_innovator, course_domain, since)
+        logger.info(f"Retrieved {len(rollup)} enrollment rollup rows")
+        return rollup
+    except Exception as e:
+        logger.error(f"Error retrieving enrollments per domain: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the enrollments per domain"
+        )
+
+# Get signups per language per month
+@router.get(
+    "/signups-per-language",
+    response_model=List[SignupRollup],
+    summary="Get signups per language per month",
+    description="Get the number of innovators who joined per language per month, served from the signup rollup. New signups show up within ROLLUP_REFRESH_SECONDS plus a minute",
+    response_description="Monthly signup counts per language"
+)
+async def get_signups_per_language(language: Optional[str] = None, since: Optional[date] = None, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        rollup = get_signups_per_language_crud(db, current_innovator, language, since)
+        logger.info(f"Retrieved {len(rollup)} signup rollup rows")
+        return rollup
+    except Exception as e:
+        logger.error(f"Error retrieving signups per language: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the signups per language"
+        )
@@ -1,18 +1,19 @@
 from fastapi import APIRouter, status, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from schema.schemas import Login
+from schema.schemas import Login, LoginResponse
 from sqlalchemy.orm import Session
 from database.database import get_db
 from authentication import crud_auth, auth
+from middleware.encoding import NegotiatedRoute
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-router = APIRouter(prefix="/api/auth", tags=["Authentication"])
+router = APIRouter(prefix="/api/auth", tags=["Authentication"], route_class=NegotiatedRoute)
 
-@router.post("/login", status_code=status.HTTP_200_OK)
+@router.post("/login", status_code=status.HTTP_200_OK, response_model=LoginResponse)
 async def login(credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # Convert OAuth2PasswordRequestForm to Login schema if needed
     login_data = Login(email=credentials.username, password=credentials.password)
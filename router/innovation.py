@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime, date
 from models.models import (
@@ -14,6 +15,18 @@ from schema.schemas import (
     InnovationUpdate,
     InnovationResponse,
     InnovationMaterial,
+    InnovationBatchRequest,
+    InnovationBatchResponse,
+    InnovationChangeFeed,
+    InnovationSections,
+    InnovationSection,
+    InnovationSectionBatchRequest,
+    InnovationSectionBatchResponse,
+    InnovationImage,
+    InnovationSuggestion,
+    EnrollmentResult,
+    SeatCapacity,
+    SeatCapacityResponse,
     Innovator,
     InnovatorCreate,
     InnovatorUpdate,
@@ -21,18 +34,46 @@ from schema.schemas import (
     ShowInnovator
 )
 
-from database.database import get_db
+from database.database import get_db, query_deadline, LISTING_QUERY_DEADLINE_MS
 from crud.innovation import (
     create_innovation as create_innovation_crud,
     get_innovation_by_name as get_innovation_by_name_crud,
+    get_innovations_by_names as get_innovations_by_names_crud,
+    get_recommended_innovations as get_recommended_innovations_crud,
+    get_innovation_changes as get_innovation_changes_crud,
     get_all_innovations_by_domain as get_all_innovations_by_domain_crud,
     get_innovators_on_innovation as get_innovators_on_innovation_crud,
+    get_related_innovations as get_related_innovations_crud,
+    get_innovation_sections as get_innovation_sections_crud,
+    get_innovation_section as get_innovation_section_crud,
+    get_innovation_sections_by_keys as get_innovation_sections_by_keys_crud,
     get_all_innovations as get_all_innovations_crud,
     update_innovations as update_innovations_crud,
-    delete_innovation as delete_innovation_crud
+    delete_innovation as delete_innovation_crud,
+    set_innovation_image as set_innovation_image_crud,
+    innovation_exists as innovation_exists_crud,
+    ValidationException
 )
+from crud.enrollment import (
+    enrollment_batcher,
+    set_seat_capacity as set_seat_capacity_crud,
+    ENROLLED,
+    ALREADY_ENROLLED,
+    FULL
+)
+from recommender.typeahead import typeahead_index
+from crud.images import (
+    store_image,
+    discard_image,
+    schedule_variants,
+    ImageTooLarge,
+    UnsupportedImage,
+    MAX_IMAGE_BYTES
+)
+from middleware.encoding import NegotiatedRoute, etag_matches
 from authentication.auth import (
-    get_current_innovator
+    get_current_innovator,
+    get_current_innovator_email
 )
 
 import logging
@@ -41,9 +82,15 @@ import logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Sections requested with a matching version never change, so clients may keep them forever,
+# but only in their own cache as sections are only served to logged in innovators
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
 router = APIRouter(
     prefix="/api/innovations",
     tags=["Innovations"],
+    route_class=NegotiatedRoute,
     responses={
         404: {"description": "Not found"},
         403: {"description": "Forbidden"},
@@ -78,6 +125,8 @@ async def create_innovation(innovation_data: InnovationCreate, db: Session = Dep
         logger.info(f"Created new innovation: {new_innovation.course_name}")
         return new_innovation
     
+    except ValidationException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error creating innovation: {str(e)}")
         raise HTTPException(
@@ -85,43 +134,131 @@ async def create_innovation(innovation_data: InnovationCreate, db: Session = Dep
             detail="An error occurred while creating the innovation"
         )
 
-# Get innovation by name
+# Get several innovations by name in one request
+@router.post(
+    "/batch",
+    response_model=InnovationBatchResponse,
+    summary="Get innovations by name in batch",
+    description="Get several innovations by their names in a single query. Results follow the input order and unknown names are reported as missing",
+    response_description="The innovations found and the names that were not found"
+)
+async def get_innovations_by_names(batch_request: InnovationBatchRequest, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        innovations, missing = await run_in_threadpool(get_innovations_by_names_crud, batch_request.course_names, db, current_innovator)
+        logger.info(f"Retrieved {len(innovations)} innovations in batch, {len(missing)} missing")
+        return {"innovations": innovations, "missing": missing}
+
+    except Exception as e:
+        logger.error(f"Error retrieving innovations in batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the innovations in batch"
+        )
+
+# Get catalog changes since a cursor
 @router.get(
-    "/{course_name}",
+    "/changes",
+    response_model=InnovationChangeFeed,
+    summary="Get innovation changes",
+    description="Get the innovations created, updated and deleted after a cursor, in commit order. Pass next_cursor back as since to resume",
+    response_description="Catalog changes and the cursor to resume from"
+)
+async def get_innovation_changes(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        changes, next_cursor, has_more = await run_in_threadpool(get_innovation_changes_crud, db, current_innovator, since, limit)
+        logger.info(f"Retrieved {len(changes)} innovation changes since cursor {since}")
+        return {"changes": changes, "next_cursor": next_cursor, "has_more": has_more}
+
+    except Exception as e:
+        logger.error(f"Error retrieving innovation changes: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the innovation changes"
+        )
+
+# Get recommended innovations for the current innovator
+@router.get(
+    "/recommended",
     response_model=List[InnovationResponse],
-    summary="Get innovation by name",
-    description="Get a specific innovation by their name",
-    response_description="Innovation information"
+    summary="Get recommended innovations",
+    description="Get innovations that learners enrolled in the same courses as the current innovator also took",
+    response_description="Recommended innovations, best match first"
 )
-async def get_innovation_by_name(course_name: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+async def get_recommended_innovations(limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovation = get_innovation_by_name_crud(course_name, db, current_innovator)
-        if not innovation:
+        innovations = await run_in_threadpool(get_recommended_innovations_crud, db, current_innovator, limit)
+        logger.info(f"Retrieved {len(innovations)} recommended innovations for: {current_innovator.email}")
+        return innovations
+
+    except Exception as e:
+        logger.error(f"Error retrieving recommended innovations: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the recommended innovations"
+        )
+
+# Suggest innovations for a partially typed search
+@router.get(
+    "/suggest",
+    response_model=List[InnovationSuggestion],
+    summary="Suggest innovations while typing",
+    description="Match a partial or misspelled query against course names and domains, the most popular close matches first. The token is checked from its claims and suggestions are served from memory, so no database query is made",
+    response_description="Suggested innovations, best match first"
+)
+async def suggest_innovations(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(8, ge=1, le=20), current_email: str = Depends(get_current_innovator_email)):
+    try:
+        return typeahead_index.suggest(q, limit)
+
+    except Exception as e:
+        logger.error(f"Error suggesting innovations for {q}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while suggesting innovations"
+        )
+
+# Get all innovations
+@router.get(
+    "/all",
+    response_model=List[InnovationResponse],
+    summary="Get all innovations",
+    description="Get a list of all innovations",
+    response_description="List of innovations",
+    dependencies=[Depends(query_deadline(LISTING_QUERY_DEADLINE_MS))]
+)
+async def get_all_innovations(db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        innovations = await run_in_threadpool(get_all_innovations_crud, db, current_innovator)
+
+        if not innovations:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Innovation by name {course_name} not found"
+                detail="Innovations not found"
             )
-        logger.info(f"Retrieved innovation by name: {course_name}")
-        return innovation
-    
+        logger.info("Retrieved all innovations")
+        return innovations
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error retrieving innovation by name: {str(e)}")
+        logger.error(f"Error retrieving all innovations: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while retrieving the innovation by name"
+            detail="An error occurred while retrieving all innovations."
         )
 
 # Get all innovations by domain
 @router.get(
-    "/{course_domain}",
+    "/domain/{course_domain}",
     response_model=List[InnovationResponse],
     summary="Get all innovations by domain",
-    description="Get a list of all innovations under a particular domain",
-    response_description="List of innovations under a particular domain"
+    description="Get a list of all innovations under a particular domain. Served at /domain/{course_domain}: the former /{course_domain} path was shadowed by the lookup by name and never reached this listing",
+    response_description="List of innovations under a particular domain",
+    dependencies=[Depends(query_deadline(LISTING_QUERY_DEADLINE_MS))]
 )
 async def get_all_innovations_by_domain(course_domain: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovations_by_domain = get_all_innovations_by_domain_crud(course_domain, db, current_innovator)
+        # Off the event loop, so a client disconnect can cancel the query while it runs, as in every query endpoint
+        innovations_by_domain = await run_in_threadpool(get_all_innovations_by_domain_crud, course_domain, db, current_innovator)
 
         if not innovations_by_domain:
             raise HTTPException(
@@ -130,7 +267,9 @@ async def get_all_innovations_by_domain(course_domain: str, db: Session = Depend
             )
         logger.info(f"Retrieved innovations under: {course_domain}")
         return innovations_by_domain
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving innovation under {course_domain}: {str(e)}")
         raise HTTPException(
@@ -138,6 +277,32 @@ async def get_all_innovations_by_domain(course_domain: str, db: Session = Depend
             detail=f"An error occurred while retrieving the innovation under {course_domain}."
         )
 
+# Get innovation by name
+@router.get(
+    "/{course_name}",
+    response_model=List[InnovationResponse],
+    summary="Get innovation by name",
+    description="Get a specific innovation by their name",
+    response_description="Innovation information"
+)
+async def get_innovation_by_name(course_name: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        innovation = await run_in_threadpool(get_innovation_by_name_crud, course_name, db, current_innovator)
+        if not innovation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+        logger.info(f"Retrieved innovation by name: {course_name}")
+        return innovation
+    
+    except Exception as e:
+        logger.error(f"Error retrieving innovation by name: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the innovation by name"
+        )
+
 # Get innovators on innovation
 @router.get(
     "/{course_name}/innovators",
@@ -148,7 +313,7 @@ async def get_all_innovations_by_domain(course_domain: str, db: Session = Depend
 )
 async def get_innovators_on_innovation(course_name: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovators_on_innovation = get_innovators_on_innovation_crud(course_name, db, current_innovator)
+        innovators_on_innovation = await run_in_threadpool(get_innovators_on_innovation_crud, course_name, db, current_innovator)
 
         if not innovators_on_innovation:
             raise HTTPException(
@@ -165,31 +330,254 @@ async def get_innovators_on_innovation(course_name: str, db: Session = Depends(g
             detail=f"An error occurred while retrieving the innovators on innovation {course_name}."
         )
 
-# Get all innovations
+# Get innovations related to an innovation
 @router.get(
-    "/all",
+    "/{course_name}/related",
     response_model=List[InnovationResponse],
-    summary="Get all innovations",
-    description="Get a list of all innovations",
-    response_description="List of innovations"
+    summary="Get related innovations",
+    description="Get the innovations whose name, description and domain are most similar to a particular innovation",
+    response_description="Related innovations, most similar first"
 )
-async def get_all_innovations(db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+async def get_related_innovations(course_name: str, limit: int = Query(10, ge=1, le=20), db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovations = get_all_innovations_crud(db, current_innovator)
+        innovations = await run_in_threadpool(get_related_innovations_crud, course_name, db, current_innovator, limit)
 
-        if not innovations:
+        if innovations is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Innovations not found"
+                detail=f"Innovation by name {course_name} not found"
             )
-        logger.info("Retrieved all innovations")
+        logger.info(f"Retrieved {len(innovations)} innovations related to: {course_name}")
         return innovations
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error retrieving all innovations: {str(e)}")
+        logger.error(f"Error retrieving innovations related to {course_name}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while retrieving all innovations."
+            detail=f"An error occurred while retrieving the innovations related to {course_name}."
+        )
+
+# List the content sections of an innovation
+@router.get(
+    "/{course_name}/sections",
+    response_model=InnovationSections,
+    summary="List innovation content sections",
+    description="Get the key, size and ETag of every section of an innovation's content without the content itself",
+    response_description="Section metadata of the innovation"
+)
+async def get_innovation_sections(course_name: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        result = await run_in_threadpool(get_innovation_sections_crud, course_name, db, current_innovator)
+
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+        version, sections = result
+        logger.info(f"Retrieved {len(sections)} sections of innovation: {course_name}")
+        return {"course_name": course_name, "version": version, "sections": sections}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving sections of innovation {course_name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while retrieving the sections of innovation {course_name}."
+        )
+
+# Get several content sections of an innovation at once
+@router.post(
+    "/{course_name}/sections/batch",
+    response_model=InnovationSectionBatchResponse,
+    summary="Get innovation content sections in batch",
+    description="Get several sections of an innovation's content in a single request. Unknown section keys are reported as missing",
+    response_description="The sections found and the keys that were not found"
+)
+async def get_innovation_sections_by_keys(course_name: str, batch_request: InnovationSectionBatchRequest, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        result = await run_in_threadpool(get_innovation_sections_by_keys_crud, course_name, batch_request.sections, db, current_innovator)
+
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+        version, sections, missing = result
+        logger.info(f"Retrieved {len(sections)} sections of innovation {course_name} in batch, {len(missing)} missing")
+        return {"course_name": course_name, "version": version, "sections": sections, "missing": missing}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving sections of innovation {course_name} in batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while retrieving the sections of innovation {course_name}."
+        )
+
+# Get a single content section of an innovation
+@router.get(
+    "/{course_name}/sections/{section_key}",
+    response_model=InnovationSection,
+    summary="Get an innovation content section",
+    description="Get one section of an innovation's content. Pass the section ETag as v to receive an immutable, cache-forever response",
+    response_description="The requested content section"
+)
+async def get_innovation_section(course_name: str, section_key: str, request: Request, v: Optional[str] = None, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        result = await run_in_threadpool(get_innovation_section_crud, course_name, section_key, db, current_innovator)
+
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Section {section_key} of innovation {course_name} not found"
+            )
+        _, section = result
+        etag = f'"{section["etag"]}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if v == section["etag"] else REVALIDATE_CACHE_CONTROL
+        }
+
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        logger.info(f"Retrieved section {section_key} of innovation: {course_name}")
+        return JSONResponse(content=InnovationSection(**section).model_dump(mode="json"), headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving section {section_key} of innovation {course_name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while retrieving section {section_key} of innovation {course_name}."
+        )
+
+# Upload the image of an innovation
+@router.post(
+    "/{course_name}/image",
+    response_model=InnovationImage,
+    status_code=status.HTTP_201_CREATED,
+    summary="Upload innovation image",
+    description="Upload a JPEG, PNG, WebP or GIF image as the raw request body. The image is stored under its content hash and served from a cache-forever URL, thumbnail and card WebP variants follow shortly",
+    response_description="Stored image and its variant URLs"
+)
+async def upload_innovation_image(course_name: str, request: Request, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        try:
+            content_length = int(request.headers.get("content-length") or 0)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid Content-Length header: {request.headers.get('content-length')}"
+            )
+        if content_length > MAX_IMAGE_BYTES:
+            raise ImageTooLarge(f"Images are limited to {MAX_IMAGE_BYTES} bytes")
+        # Nothing is read or stored for a course that does not exist
+        if not innovation_exists_crud(course_name, db):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+
+        image = await store_image(request.stream())
+        if not set_innovation_image_crud(course_name, image["url"], db, current_innovator):
+            # Deleted while the image was uploading
+            discard_image(image)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+        schedule_variants(image["digest"], image["path"])
+
+        logger.info(f"Stored image {image['digest']} for innovation: {course_name}")
+        return InnovationImage(course_name=course_name, course_image_path=image["url"], digest=image["digest"], size=image["size"], variants=image["variants"])
+
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading the image of innovation {course_name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while uploading the image of innovation {course_name}."
+        )
+
+# Enroll the current innovator in an innovation
+@router.post(
+    "/{course_name}/enroll",
+    response_model=EnrollmentResult,
+    status_code=status.HTTP_201_CREATED,
+    summary="Enroll in innovation",
+    description="Enroll the current innovator in an innovation. Concurrent enrollments are written together in small batches",
+    response_description="Enrollment status, 200 if the innovator was already enrolled and 409 if the innovation is full"
+)
+async def enroll_in_innovation(course_name: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        result = await enrollment_batcher.enroll(course_name, current_innovator.id, db)
+
+        if result == FULL:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Innovation by name {course_name} has no seats left"
+            )
+        if result not in (ENROLLED, ALREADY_ENROLLED):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+
+        content = EnrollmentResult(course_name=course_name, status=result).model_dump()
+        if result == ALREADY_ENROLLED:
+            return JSONResponse(content=content, status_code=status.HTTP_200_OK)
+        return content
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error enrolling {current_innovator.email} in innovation {course_name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while enrolling in the innovation by name {course_name}."
+        )
+
+# Set the seat capacity of an innovation
+@router.put(
+    "/{course_name}/capacity",
+    response_model=SeatCapacityResponse,
+    summary="Set innovation seat capacity",
+    description="Limit the number of learners of an innovation, or remove the limit with a null seat_capacity",
+    response_description="Seat capacity and seats taken"
+)
+async def set_seat_capacity(course_name: str, capacity: SeatCapacity, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        result = set_seat_capacity_crud(course_name, capacity.seat_capacity, db, current_innovator)
+
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Innovation by name {course_name} not found"
+            )
+        logger.info(f"Set seat capacity of innovation {course_name} to {capacity.seat_capacity}")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error setting seat capacity of innovation {course_name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while setting the seat capacity of innovation {course_name}."
         )
 
 # Update innovation
@@ -212,6 +600,10 @@ async def update_innovation(course_name: str, innovation_data: InnovationUpdate,
         logger.info(f"Updated innovation by name: {course_name}")
         return innovation
     
+    except ValidationException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating innovation by name {course_name}: {str(e)}")
         raise HTTPException(
@@ -238,6 +630,8 @@ async def delete_innovation(course_name: str, db: Session = Depends(get_db), cur
         logger.info(f"Deleted innovation by name: {course_name}")
         return innovation
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting innovation by name {course_name}: {str(e)}")
         raise HTTPException(
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List
 import logging
 from models.models import Innovator as InnovatorModel
@@ -9,17 +10,24 @@ from schema.schemas import (
     InnovatorCreate,
     InnovatorUpdate,
     InnovatorResponse,
-    ShowInnovator
+    ShowInnovator,
+    InnovatorBatchRequest,
+    InnovatorBatchResponse,
+    InnovatorCourses
 )
-from database.database import get_db
+from database.database import get_db, query_deadline, LISTING_QUERY_DEADLINE_MS
+from crud.innovation import ValidationException
 from crud.innovators import (
     create_innovator as create_innovator_crud,
     get_all_innovators as get_all_innovators_crud,
     get_innovator as get_innovator_crud,
+    get_innovators_by_emails as get_innovators_by_emails_crud,
     update_innovator as update_innovator_crud,
     delete_innovator as delete_innovator_crud,
-    get_current_active_innovator as get_current_active_innovator_crud
+    get_current_active_innovator as get_current_active_innovator_crud,
+    get_current_innovator_courses as get_current_innovator_courses_crud
 )
+from middleware.encoding import NegotiatedRoute
 from authentication.auth import (
     get_current_innovator
 )
@@ -31,6 +39,7 @@ logger.setLevel(logging.INFO)
 router = APIRouter(
     prefix="/api/innovators",
     tags=["Innovators"],
+    route_class=NegotiatedRoute,
     responses={
         404: {"description": "Not found"},
         403: {"description": "Forbidden"},
@@ -54,6 +63,8 @@ async def create_innovator(innovator_data: InnovatorCreate, db: Session = Depend
         logger.info(f"Created new innovator: {new_innovator.fullname}")
         return new_innovator
     
+    except ValidationException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error creating innovator: {str(e)}")
         raise HTTPException(
@@ -67,11 +78,13 @@ async def create_innovator(innovator_data: InnovatorCreate, db: Session = Depend
     response_model=List[ShowInnovator],
     summary="Get all innovators",
     description="Get a list of all innovators",
-    response_description="List of innovators"
+    response_description="List of innovators",
+    dependencies=[Depends(query_deadline(LISTING_QUERY_DEADLINE_MS))]
 )
 async def get_all_innovators(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovators = get_all_innovators_crud(db, current_innovator)
+        # Off the event loop, so a client disconnect can cancel the query while it runs
+        innovators = await run_in_threadpool(get_all_innovators_crud, db, current_innovator)
         logger.info(f"Retrieved {len(innovators)} innovators.")
         return innovators
     except Exception as e:
@@ -91,7 +104,7 @@ async def get_all_innovators(skip: int = 0, limit: int = 100, db: Session = Depe
 )
 async def get_innovator(email: str, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovator = get_innovator_crud(email, db, current_innovator)
+        innovator = await run_in_threadpool(get_innovator_crud, email, db, current_innovator)
         if not innovator:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -106,6 +119,26 @@ async def get_innovator(email: str, db: Session = Depends(get_db), current_innov
             detail="An error occurred while retrieving the innovator by email"
         )
 
+# Get several innovators by email in one request
+@router.post(
+    "/batch",
+    response_model=InnovatorBatchResponse,
+    summary="Get innovators by email in batch",
+    description="Get several innovators by their emails in a single query. Results follow the input order and unknown emails are reported as missing",
+    response_description="The innovators found and the emails that were not found"
+)
+async def get_innovators_by_emails(batch_request: InnovatorBatchRequest, db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        innovators, missing = await run_in_threadpool(get_innovators_by_emails_crud, batch_request.emails, db, current_innovator)
+        logger.info(f"Retrieved {len(innovators)} innovators in batch, {len(missing)} missing")
+        return {"innovators": innovators, "missing": missing}
+    except Exception as e:
+        logger.error(f"Error retrieving innovators in batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the innovators in batch"
+        )
+
 # Update an existing innovator
 @router.put(
     "/update-innovator",
@@ -124,6 +157,8 @@ async def update_innovator(email: str, innovator_data: InnovatorUpdate, db: Sess
             )
         logger.info(f"Updated innovator by email: {email}")
         return innovator
+    except ValidationException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error updating innovator by email {email}: {str(e)}")
         raise HTTPException(
@@ -134,6 +169,7 @@ async def update_innovator(email: str, innovator_data: InnovatorUpdate, db: Sess
 # Delete an innovator
 @router.delete(
     "/delete-innovator",
+    response_model=InnovatorResponse,
     summary="Delete an innovator",
     description="Delete an innovator by their email",
     response_description="The deleted innovator"
@@ -155,6 +191,26 @@ async def delete_innovator(email: str, db: Session = Depends(get_db), current_in
             detail="An error occurred while deleting the innovator by email"
         )
 
+# Get the current innovator's courses
+@router.get(
+    "/current/courses",
+    response_model=InnovatorCourses,
+    summary="Get the current innovator's courses",
+    description="Get the courses the current innovator is enrolled in as lean summaries, a page at a time. Pass next_cursor as after to get the next page",
+    response_description="A page of course summaries"
+)
+async def get_current_innovator_courses(after: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200), db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        courses, next_cursor, has_more = await run_in_threadpool(get_current_innovator_courses_crud, db, current_innovator, after, limit)
+        logger.info(f"Retrieved {len(courses)} courses of: {current_innovator.email}")
+        return {"courses": courses, "next_cursor": next_cursor, "has_more": has_more}
+    except Exception as e:
+        logger.error(f"Error retrieving the courses of {current_innovator.email}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the current innovator's courses"
+        )
+
 # Get the current innovator's information
 @router.get(
     "/current",
@@ -165,7 +221,7 @@ async def delete_innovator(email: str, db: Session = Depends(get_db), current_in
 )
 async def get_current_innovator(db: Session = Depends(get_db), current_innovator: InnovatorModel = Depends(get_current_innovator)):
     try:
-        innovator = get_current_innovator_crud(db, current_innovator)
+        innovator = await run_in_threadpool(get_current_innovator_crud, db, current_innovator)
         if not innovator:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+import logging
+from models.models import Innovator as InnovatorModel
+
+from schema.schemas import (
+    PoolStats,
+    QueryStats,
+    LoadStats
+)
+from database.metrics import pool_snapshots, query_metrics
+from middleware.load_shedding import load_metrics
+from middleware.encoding import NegotiatedRoute
+from authentication.auth import (
+    get_current_innovator
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["Metrics"],
+    route_class=NegotiatedRoute,
+    responses={
+        404: {"description": "Not found"},
+        403: {"description": "Forbidden"},
+        400: {"description": "Bad request"}
+    }
+)
+
+# Get connection pool metrics
+@router.get(
+    "/pool",
+    response_model=List[PoolStats],
+    summary="Get connection pool metrics",
+    description="Get checkout counts and connection hold times of the primary and replica pools since startup",
+    response_description="Pool metrics per engine"
+)
+async def get_pool_metrics(current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        return pool_snapshots()
+    except Exception as e:
+        logger.error(f"Error retrieving pool metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the pool metrics"
+        )
+
+# Get query deadline metrics
+@router.get(
+    "/queries",
+    response_model=QueryStats,
+    summary="Get query deadline metrics",
+    description="Get how many requests per route had their queries cut off by the deadline or by the client disconnecting",
+    response_description="Timeouts and cancellations per route"
+)
+async def get_query_metrics(current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        return query_metrics.snapshot()
+    except Exception as e:
+        logger.error(f"Error retrieving query metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the query metrics"
+        )
+
+# Get load shedding metrics
+@router.get(
+    "/load",
+    response_model=LoadStats,
+    summary="Get load shedding metrics",
+    description="Get the event loop lag and pool pressure the load shedder acts on, and how many requests it shed per priority class",
+    response_description="Pressure signals and shed requests"
+)
+async def get_load_metrics(current_innovator: InnovatorModel = Depends(get_current_innovator)):
+    try:
+        return load_metrics.snapshot()
+    except Exception as e:
+        logger.error(f"Error retrieving load metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving the load metrics"
+        )
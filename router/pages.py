@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import logging
+
+from database.database import get_db
+from crud.pages import page_cache, PrerenderedPage
+from middleware.encoding import choose_encoding, etag_matches
+from middleware.sessions import SessionRoute
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Cached by browsers but revalidated on every visit, a 304 costs no render and no body
+PAGE_CACHE_CONTROL = "public, no-cache"
+
+router = APIRouter(
+    tags=["Pages"],
+    route_class=SessionRoute,
+    include_in_schema=False
+)
+
+
+def page_response(page: PrerenderedPage, request: Request) -> Response:
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": PAGE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding not in page.bodies:
+        encoding = None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=page.bodies[encoding], media_type="text/html; charset=utf-8", headers=headers)
+
+async def serve_page(name: str, request: Request, db: Session) -> Response:
+    try:
+        page = page_cache.fresh(name)
+        if page is None:
+            page = await run_in_threadpool(page_cache.get, name, db)
+        return page_response(page, request)
+
+    except Exception as e:
+        logger.error(f"Error rendering page {name}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while rendering the {name} page"
+        )
+
+# Landing page with the latest courses
+@router.get("/home")
+async def landing_page(request: Request, db: Session = Depends(get_db)):
+    return await serve_page("home", request, db)
+
+# Catalog page with every course
+@router.get("/catalog")
+async def catalog(request: Request, db: Session = Depends(get_db)):
+    return await serve_page("catalog", request, db)
+
+# Try page
+@router.get("/try")
+async def try_page(request: Request, db: Session = Depends(get_db)):
+    return await serve_page("try", request, db)
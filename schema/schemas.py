@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, EmailStr, computed_field, field_validator, ValidationInfo, RootModel
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter, computed_field, field_validator, ValidationInfo, RootModel
 from typing import Optional, List, Any, Dict
-from datetime import datetime
+from datetime import datetime, date
 from enum import Enum
 import uuid
 import json
@@ -34,6 +34,7 @@ class Innovation(BaseModel):
     content: Optional[DynamicCourseContent] = None
     course_duration: int
     course_price: str
+    course_tutor: str
     course_image_path: str
     course_domain: str
     created_at: datetime
@@ -97,6 +98,165 @@ class InnovationMaterial(Innovation):
     class Config(Innovation.Config):
         from_attributes = True
 
+# Upper bound on the number of keys a batch lookup may resolve in one query
+MAX_BATCH_SIZE = 100
+
+class InnovationSummary(BaseModel):
+    id: int
+    course_name: str
+    course_description: str
+    course_duration: int
+    course_price: str
+    course_tutor: str
+    course_image_path: str
+    course_domain: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class InnovationChange(BaseModel):
+    cursor: int
+    operation: str
+    innovation_id: int
+    course_name: str
+    changed_at: Optional[datetime] = None
+    # Current state of the course, None for deletions and for courses deleted since
+    innovation: Optional[InnovationSummary] = None
+
+class InnovationChangeFeed(BaseModel):
+    changes: List[InnovationChange] = []
+    next_cursor: int
+    has_more: bool
+
+class InnovatorCourses(BaseModel):
+    courses: List[InnovationSummary] = []
+    next_cursor: int
+    has_more: bool
+
+class InnovationBatchRequest(BaseModel):
+    course_names: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class InnovationBatchResponse(BaseModel):
+    innovations: List[InnovationResponse] = []
+    missing: List[str] = []
+
+_email_adapter = TypeAdapter(EmailStr)
+
+def normalize_email(email: str) -> str:
+    """The email as EmailStr stores it, with its domain lowercased"""
+    return _email_adapter.validate_python(email)
+
+class InnovatorBatchRequest(BaseModel):
+    # Validated but kept as sent, so missing emails are reported the way the caller wrote them
+    emails: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+    @field_validator("emails")
+    @classmethod
+    def validate_emails(cls, emails: List[str]) -> List[str]:
+        for email in emails:
+            normalize_email(email)
+        return emails
+
+class InnovatorBatchResponse(BaseModel):
+    innovators: List[InnovatorResponse] = []
+    missing: List[str] = []
+
+class InnovationSectionMeta(BaseModel):
+    key: str
+    size: int
+    etag: str
+
+class InnovationSections(BaseModel):
+    course_name: str
+    version: str
+    sections: List[InnovationSectionMeta] = []
+
+class InnovationSection(BaseModel):
+    key: str
+    etag: str
+    content: Any = None
+
+class InnovationSectionBatchRequest(BaseModel):
+    sections: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class InnovationSectionBatchResponse(BaseModel):
+    course_name: str
+    version: str
+    sections: List[InnovationSection] = []
+    missing: List[str] = []
+
+class InnovationImage(BaseModel):
+    course_name: str
+    course_image_path: str
+    digest: str
+    size: int
+    # WebP variant name to its URL, rendered shortly after the upload
+    variants: Dict[str, str] = {}
+
+class InnovationSuggestion(BaseModel):
+    id: int
+    course_name: str
+    course_domain: str
+    # Learners enrolled, used to rank close matches
+    popularity: int
+    score: float
+
+class EnrollmentResult(BaseModel):
+    course_name: str
+    # enrolled, already_enrolled or full
+    status: str
+
+class SeatCapacity(BaseModel):
+    # None removes the limit
+    seat_capacity: Optional[int] = Field(None, ge=0)
+
+class SeatCapacityResponse(SeatCapacity):
+    course_name: str
+    seats_taken: Optional[int] = None
+
+class EnrollmentRollup(BaseModel):
+    course_domain: str
+    period_start: date
+    enrollments: int
+
+    class Config:
+        from_attributes = True
+
+class SignupRollup(BaseModel):
+    language: str
+    period_start: date
+    signups: int
+
+    class Config:
+        from_attributes = True
+
+class PoolStats(BaseModel):
+    name: str
+    pool_size: int
+    capacity: int
+    checked_out: int
+    overflow: int
+    waiting: int
+    checkout_wait_ms: float
+    checkouts: int
+    checkins: int
+    mean_hold_ms: float
+    max_hold_ms: float
+    hold_ms_histogram: Dict[str, int] = {}
+
+class QueryStats(BaseModel):
+    # Per route path
+    timeouts: Dict[str, int] = {}
+    cancellations: Dict[str, int] = {}
+
+class LoadStats(BaseModel):
+    loop_lag_ms: float
+    pool_waiting: int
+    checkout_wait_ms: float
+    # Requests shed per priority class
+    shed: Dict[str, int] = {}
+
 class Login(BaseModel):
     email: str
     password: str
@@ -106,6 +266,12 @@ class Token(BaseModel):
     refresh_token: str
     token_type: str
 
+class LoginResponse(Token):
+    # Built from the row loaded to check the password, so the client needs no follow-up lookup
+    profile: InnovatorResponse
+    # Kept for clients that still read the profile from the old field name
+    verification_token: InnovatorResponse = Field(deprecated="Same as profile, which clients should read instead")
+
 class TokenData(BaseModel):
     email: Optional[str] = None
 
@@ -0,0 +1,70 @@
+"""
+  Tests run against the in-memory SQLite backend unless DATABASE_URL points elsewhere, with
+  cheap password hashing. Every test runs inside isolated_session(), so whatever the API
+  commits is rolled back when the test ends:
+
+      python -m pytest -q
+      DATABASE_URL=postgresql+psycopg://... python -m pytest -q
+"""
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_MEMORY_COST", "8")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from database.testing import create_schema, isolated_session, override_get_db
+from main import app
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    create_schema()
+
+@pytest.fixture
+def db():
+    with isolated_session() as session:
+        yield session
+
+@pytest.fixture
+def client(db):
+    override_get_db(app, db)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def signup(client, email: str, fullname: str = "Ada Lovelace"):
+    response = client.post("/api/innovators/new", json={"fullname": fullname, "email": email, "status": "student", "language": "en", "password": PASSWORD})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def login(client, email: str) -> dict:
+    response = client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_course(client, headers: dict, course_name: str, course_domain: str = "Computer Science"):
+    response = client.post("/api/innovations/new", headers=headers, json={
+        "course_name": course_name,
+        "course_description": f"Learn {course_name}",
+        "content": {"intro": {"text": "Welcome"}, "lessons": [{"title": "First steps"}]},
+        "course_duration": 4,
+        "course_price": "0",
+        "course_tutor": "Grace Hopper",
+        "course_image_path": "/static/images/icpc.png",
+        "course_domain": course_domain,
+        "created_at": "2024-01-01T00:00:00"
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+@pytest.fixture
+def headers(client):
+    signup(client, "ada@example.com")
+    return login(client, "ada@example.com")
@@ -0,0 +1,94 @@
+from sqlalchemy import delete, insert, select, text
+from datetime import datetime, timedelta, timezone
+from database.database import SessionLocal, is_sqlite, insert_for
+from crud.analytics import refresh_enrollment_rollup, refresh_signup_rollup, ENROLLMENTS_WATERMARK, SIGNUPS_WATERMARK
+from crud.analytics_export import enrollments_per_domain_per_week, signups_per_language_per_month
+from crud.innovation import delete_innovation
+from crud.innovators import delete_innovator
+from models import models
+import pytest
+
+
+def test_reads_do_not_refresh_and_the_first_refresh_creates_the_watermark(client, headers, db):
+    existing = set(db.scalars(select(models.RollupWatermark.name)).all())
+    assert client.get("/api/analytics/signups-per-language", headers=headers).status_code == 200
+    assert client.get("/api/analytics/enrollments-per-domain", headers=headers).status_code == 200
+    assert set(db.scalars(select(models.RollupWatermark.name)).all()) == existing
+
+    refresh_signup_rollup(db)
+    refresh_enrollment_rollup(db)
+    names = db.scalars(select(models.RollupWatermark.name)).all()
+    assert {SIGNUPS_WATERMARK, ENROLLMENTS_WATERMARK} <= set(names)
+
+def _rollups(db):
+    enrollments = db.query(models.EnrollmentRollup.period_start, models.EnrollmentRollup.enrollments)\
+                    .filter(models.EnrollmentRollup.course_domain == "Drift").order_by(models.EnrollmentRollup.period_start).all()
+    signups = db.query(models.SignupRollup.period_start, models.SignupRollup.signups)\
+                .filter(models.SignupRollup.language == "drift").order_by(models.SignupRollup.period_start).all()
+    return [tuple(row) for row in enrollments], [tuple(row) for row in signups]
+
+def _recounted(db):
+    enrollments = enrollments_per_domain_per_week(db)
+    signups = signups_per_language_per_month(db)
+    enrollments = enrollments[enrollments["course_domain"] == "Drift"]
+    signups = signups[signups["language"] == "drift"]
+    return list(zip(enrollments["period_start"], enrollments["enrollments"])), list(zip(signups["period_start"], signups["signups"]))
+
+def test_deletes_are_taken_out_of_the_rollups(db):
+    # Old enough for the refresh to fold them
+    long_ago = datetime.now(timezone.utc) - timedelta(days=3)
+    db.execute(insert(models.Innovation), [
+        {"course_name": name, "course_description": "drift", "content": {}, "course_duration": 1, "course_price": "0",
+         "course_tutor": "drift", "course_image_path": "/static/images/icpc.png", "course_domain": "Drift"}
+        for name in ("Drift One", "Drift Two")
+    ])
+    db.execute(insert(models.Innovator), [
+        {"fullname": "drift", "email": f"drift{i}@example.com", "hashed_password": "-", "status": "student", "language": "drift", "date_joined": long_ago}
+        for i in range(3)
+    ])
+    courses = dict(db.execute(select(models.Innovation.course_name, models.Innovation.id).where(models.Innovation.course_domain == "Drift")).all())
+    learners = db.scalars(select(models.Innovator.id).where(models.Innovator.language == "drift").order_by(models.Innovator.id)).all()
+    enrollments = [(courses["Drift One"], learner) for learner in learners] + [(courses["Drift Two"], learner) for learner in learners[:2]]
+    db.execute(insert(models.innovation_learner_association), [
+        {"innovation_id": innovation_id, "innovator_id": innovator_id, "enrolled_at": long_ago}
+        for innovation_id, innovator_id in enrollments
+    ])
+    db.flush()
+
+    refresh_enrollment_rollup(db)
+    refresh_signup_rollup(db)
+    assert [count for _, count in _rollups(db)[0]] == [5]
+    assert _rollups(db) == _recounted(db)
+
+    delete_innovator("drift0@example.com", db, None)
+    delete_innovation("Drift One", db, None)
+    db.expire_all()
+
+    assert _rollups(db) == _recounted(db)
+    enrollment_counts, signup_counts = _rollups(db)
+    assert [count for _, count in enrollment_counts] == [1]
+    assert [count for _, count in signup_counts] == [2]
+
+def test_refresh_skips_a_watermark_locked_by_another_refresh(db):
+    if is_sqlite(db):
+        pytest.skip("SQLite has no row locks")
+
+    with SessionLocal() as setup:
+        existed = setup.get(models.RollupWatermark, SIGNUPS_WATERMARK) is not None
+        setup.execute(insert_for(setup, models.RollupWatermark).values(name=SIGNUPS_WATERMARK).on_conflict_do_nothing())
+        setup.commit()
+
+    holder, refresher = SessionLocal(), SessionLocal()
+    try:
+        holder.query(models.RollupWatermark).filter(models.RollupWatermark.name == SIGNUPS_WATERMARK).with_for_update().one()
+        # Fails the test instead of hanging it should the refresh wait for the lock
+        refresher.execute(text("SET LOCAL lock_timeout = '2s'"))
+        assert refresh_signup_rollup(refresher) == 0
+    finally:
+        holder.rollback()
+        holder.close()
+        refresher.close()
+        if not existed:
+            with SessionLocal() as cleanup:
+                cleanup.execute(delete(models.RollupWatermark).where(models.RollupWatermark.name == SIGNUPS_WATERMARK))
+                cleanup.commit()
@@ -0,0 +1,38 @@
+from conftest import signup, login, create_course, PASSWORD
+
+
+def test_signup_login_create_enroll_delete(client):
+    innovator = signup(client, "ada@example.com")
+    assert innovator["email"] == "ada@example.com"
+    assert client.post("/api/auth/login", data={"username": "ada@example.com", "password": "wrong"}).status_code != 200
+    headers = login(client, "ada@example.com")
+
+    response = client.get("/api/innovators/get-innovator", params={"email": "ada@example.com"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "ada@example.com"
+
+    course = create_course(client, headers, "ICPC")
+    assert course["course_name"] == "ICPC"
+    assert client.post("/api/innovations/ICPC/enroll", headers=headers).status_code == 201
+
+    response = client.get("/api/innovators/current/courses", headers=headers)
+    assert response.status_code == 200
+    assert [summary["course_name"] for summary in response.json()["courses"]] == ["ICPC"]
+
+    response = client.get("/api/innovations/ICPC/innovators", headers=headers)
+    assert response.status_code == 200
+    assert [learner["email"] for learner in response.json()] == ["ada@example.com"]
+
+    response = client.delete("/api/innovations/delete/ICPC", headers=headers)
+    assert response.status_code == 200
+    assert client.get("/api/innovators/current/courses", headers=headers).json()["courses"] == []
+    assert client.delete("/api/innovations/delete/ICPC", headers=headers).status_code == 404
+
+    response = client.delete("/api/innovators/delete-innovator", params={"email": "ada@example.com"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "ada@example.com"
+    assert client.post("/api/auth/login", data={"username": "ada@example.com", "password": PASSWORD}).status_code != 200
+
+def test_requests_need_a_token(client):
+    assert client.get("/api/innovators/current/courses").status_code == 401
+    assert client.post("/api/innovations/ICPC/enroll").status_code == 401
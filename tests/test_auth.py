@@ -0,0 +1,66 @@
+from sqlalchemy import event, select, update
+from passlib.hash import argon2
+from crud.hashing import argon2_setting, pwd_ctx, ARGON2_TIME_COST
+from database.database import engine
+from models import models
+from conftest import signup, PASSWORD
+import pytest
+
+
+def test_login_returns_the_profile_with_the_tokens(client):
+    innovator = signup(client, "profile@example.com", "Katherine Johnson")
+    response = client.post("/api/auth/login", data={"username": "profile@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+
+    body = response.json()
+    assert body["token_type"] == "bearer"
+    assert body["access_token"] and body["refresh_token"]
+    assert body["profile"] == innovator
+    assert "hashed_password" not in body["profile"]
+    # Deprecated alias of the profile, still sent to older clients
+    assert body["verification_token"] == body["profile"]
+
+def test_login_reads_the_innovator_once(client):
+    signup(client, "once@example.com")
+    statements = []
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/api/auth/login", data={"username": "once@example.com", "password": PASSWORD})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["profile"]["email"] == "once@example.com"
+    # No lookup of the innovator again through the token just minted
+    assert len([statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]) == 1
+
+def test_login_upgrades_a_hash_made_with_old_parameters(client, db):
+    innovator = signup(client, "rehash@example.com")
+    old_hash = argon2.using(time_cost=ARGON2_TIME_COST + 1, memory_cost=8, parallelism=1).hash(PASSWORD)
+    db.execute(update(models.Innovator).where(models.Innovator.id == innovator["id"]).values(hashed_password=old_hash))
+    assert pwd_ctx.needs_update(old_hash)
+
+    response = client.post("/api/auth/login", data={"username": "rehash@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+
+    stored_hash = db.execute(select(models.Innovator.hashed_password).where(models.Innovator.id == innovator["id"])).scalar_one()
+    assert stored_hash != old_hash
+    assert not pwd_ctx.needs_update(stored_hash)
+    assert pwd_ctx.verify(PASSWORD, stored_hash)
+
+def test_wrong_password_keeps_the_stored_hash(client, db):
+    innovator = signup(client, "wrong@example.com")
+    old_hash = argon2.using(time_cost=ARGON2_TIME_COST + 1, memory_cost=8, parallelism=1).hash(PASSWORD)
+    db.execute(update(models.Innovator).where(models.Innovator.id == innovator["id"]).values(hashed_password=old_hash))
+
+    response = client.post("/api/auth/login", data={"username": "wrong@example.com", "password": "not " + PASSWORD})
+    assert response.status_code == 401
+    assert db.execute(select(models.Innovator.hashed_password).where(models.Innovator.id == innovator["id"])).scalar_one() == old_hash
+
+@pytest.mark.parametrize("value, message", [("64MiB", "must be an integer"), ("0", "must be at least 1")])
+def test_argon2_settings_are_validated(monkeypatch, value, message):
+    monkeypatch.setenv("ARGON2_TIME_COST", value)
+    with pytest.raises(ValueError, match=message):
+        argon2_setting("ARGON2_TIME_COST", 3, 1)
@@ -0,0 +1,64 @@
+from sqlalchemy import insert, select
+from datetime import datetime, timedelta, timezone
+from recommender.co_enrollment import CoEnrollmentIndex, build_co_enrollment_artifact, build_if_due
+from models import models
+from conftest import signup, create_course
+import recommender.co_enrollment
+import os
+
+
+def test_reload_keeps_enrollments_newer_than_the_build(client, headers, db, tmp_path):
+    for name in ("ICPC", "HackMIT", "TreeHacks"):
+        create_course(client, headers, name)
+    ids = dict(db.execute(select(models.Innovation.course_name, models.Innovation.id)).all())
+    learner_ids = [signup(client, f"learner{i}@example.com")["id"] for i in range(2)]
+    long_ago = datetime.now(timezone.utc) - timedelta(days=1)
+    db.execute(insert(models.innovation_learner_association), [
+        {"innovation_id": ids[name], "innovator_id": learner_id, "enrolled_at": long_ago}
+        for learner_id in learner_ids for name in ("ICPC", "HackMIT")
+    ])
+
+    index = CoEnrollmentIndex(str(tmp_path / "co_enrollment.joblib"))
+    # Recorded by this worker: one enrollment the build holds, one made after it
+    index.record_enrollment(ids["HackMIT"], [ids["ICPC"]], enrolled_at=long_ago)
+    index.record_enrollment(ids["TreeHacks"], [ids["ICPC"]], enrolled_at=datetime.now(timezone.utc))
+
+    build_co_enrollment_artifact(db, index.path)
+    index._maybe_reload()
+
+    assert dict(index._delta_counts) == {ids["TreeHacks"]: 1}
+    assert index.recommend([ids["ICPC"]])[:2] == [ids["HackMIT"], ids["TreeHacks"]]
+
+def test_withdrawals_cancel_the_enrollments_they_undo(tmp_path):
+    index = CoEnrollmentIndex(str(tmp_path / "co_enrollment.joblib"))
+    index.record_enrollment(1, [])
+    index.record_enrollment(2, [1])
+    index.record_enrollment(3, [1, 2])
+    index.record_enrollment(2, [4])
+    assert set(index.recommend([1])) == {2, 3}
+
+    # Deleting the learner of the first three takes them out of every pair at once
+    index.record_withdrawals([3, 1, 2])
+    assert {item_id: count for item_id, count in index._delta_counts.items() if count} == {2: 1}
+    assert index.recommend([4]) == [2]
+    assert index.recommend([1]) == []
+
+def test_the_delta_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(recommender.co_enrollment, "MAX_DELTA_EVENTS", 10)
+    index = CoEnrollmentIndex(str(tmp_path / "co_enrollment.joblib"))
+    for item_id in range(100):
+        index.record_enrollment(item_id, [item_id + 1])
+
+    assert len(index._delta_events) <= 10
+    # What is left is exactly the events still kept
+    assert sum(index._delta_counts.values()) == len(index._delta_events)
+    assert set(index.recommend([99])) == {98, 100}
+    assert index.recommend([0]) == []
+
+def test_build_runs_only_once_the_artifact_is_due(db, tmp_path):
+    path = str(tmp_path / "co_enrollment.joblib")
+    assert build_if_due(lambda: db, 3600, path)
+    assert not build_if_due(lambda: db, 3600, path)
+
+    os.utime(path, (0, 0))
+    assert build_if_due(lambda: db, 3600, path)
@@ -0,0 +1,31 @@
+from recommender.content_similarity import ContentSimilarityIndex, build_content_similarity_artifact
+from sqlalchemy import insert, select
+from models import models
+
+
+def course(name: str, description: str):
+    return {
+        "course_name": name,
+        "course_description": description,
+        "course_duration": 4,
+        "course_price": "0",
+        "course_tutor": "Grace Hopper",
+        "course_image_path": "/static/images/icpc.png",
+        "course_domain": "Similarity"
+    }
+
+def test_rewritten_course_leaves_the_lists_it_no_longer_belongs_to(db, tmp_path):
+    db.execute(insert(models.Innovation), [
+        course("Graph Algorithms", "shortest paths spanning trees graph search"),
+        course("Competitive Graphs", "graph search shortest paths contests"),
+        course("Pottery", "clay wheel glaze kiln")
+    ])
+    ids = dict(db.execute(select(models.Innovation.course_name, models.Innovation.id).where(models.Innovation.course_domain == "Similarity")).all())
+    index = ContentSimilarityIndex(str(tmp_path / "content_similarity.joblib"))
+    build_content_similarity_artifact(db, index.path)
+    assert ids["Competitive Graphs"] in index.related(ids["Graph Algorithms"])
+
+    index.upsert(ids["Competitive Graphs"], "Ceramics", "clay glaze kiln firing", "Arts")
+
+    assert ids["Competitive Graphs"] not in index.related(ids["Graph Algorithms"])
+    assert ids["Competitive Graphs"] in index.related(ids["Pottery"])
@@ -0,0 +1,26 @@
+from conftest import create_course
+import msgpack
+
+
+def vary(response) -> set:
+    return {field.strip() for field in response.headers.get("vary", "").split(",")}
+
+def test_msgpack_carries_the_same_content_as_json(client, headers):
+    create_course(client, headers, "ICPC")
+
+    as_json = client.get("/api/innovations/all", headers=headers)
+    as_msgpack = client.get("/api/innovations/all", headers={**headers, "Accept": "application/msgpack"})
+    assert as_json.headers["content-type"] == "application/json"
+    assert as_msgpack.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+    assert {"Accept", "Accept-Encoding"} <= vary(as_json)
+    assert {"Accept", "Accept-Encoding"} <= vary(as_msgpack)
+
+def test_uncompressed_responses_still_vary_on_accept_encoding(client, headers):
+    response = client.get("/api/innovations/domain/No Such Domain", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in vary(response)
+
+    response = client.get("/api/innovators/get-innovator", params={"email": "ada@example.com"}, headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert {"Accept", "Accept-Encoding"} <= vary(response)
@@ -0,0 +1,162 @@
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from database.database import Base, RoutingSession, SessionLocal, get_db, is_sqlite, make_engine
+from crud.enrollment import EnrollmentBatcher, ENROLLED, ALREADY_ENROLLED, FULL
+from models import models
+from conftest import signup, login, create_course
+from main import app
+import asyncio
+import httpx
+import pytest
+import time
+
+LEARNERS = 120
+CAPACITY = 50
+
+
+def test_enroll(client, headers):
+    create_course(client, headers, "ICPC")
+
+    response = client.post("/api/innovations/ICPC/enroll", headers=headers)
+    assert response.status_code == 201, response.text
+    assert response.json() == {"course_name": "ICPC", "status": ENROLLED}
+
+    response = client.post("/api/innovations/ICPC/enroll", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == ALREADY_ENROLLED
+
+    assert client.post("/api/innovations/Unknown/enroll", headers=headers).status_code == 404
+
+def test_enroll_full(client, headers):
+    create_course(client, headers, "HackMIT")
+    response = client.put("/api/innovations/HackMIT/capacity", headers=headers, json={"seat_capacity": 1})
+    assert response.json() == {"course_name": "HackMIT", "seat_capacity": 1, "seats_taken": 0}
+
+    assert client.post("/api/innovations/HackMIT/enroll", headers=headers).status_code == 201
+    signup(client, "grace@example.com", "Grace Hopper")
+    assert client.post("/api/innovations/HackMIT/enroll", headers=login(client, "grace@example.com")).status_code == 409
+
+def test_deleting_an_innovator_gives_back_their_seat(client, headers):
+    create_course(client, headers, "TreeHacks")
+    client.put("/api/innovations/TreeHacks/capacity", headers=headers, json={"seat_capacity": 1})
+    signup(client, "grace@example.com", "Grace Hopper")
+    grace = login(client, "grace@example.com")
+    assert client.post("/api/innovations/TreeHacks/enroll", headers=grace).status_code == 201
+    assert client.post("/api/innovations/TreeHacks/enroll", headers=headers).status_code == 409
+
+    assert client.delete("/api/innovators/delete-innovator", params={"email": "grace@example.com"}, headers=headers).status_code == 200
+    response = client.put("/api/innovations/TreeHacks/capacity", headers=headers, json={"seat_capacity": 1})
+    assert response.json()["seats_taken"] == 0
+    assert client.post("/api/innovations/TreeHacks/enroll", headers=headers).status_code == 201
+
+
+def _seed(db, course_name: str):
+    db.execute(insert(models.Innovation).values(
+        course_name=course_name, course_description="stress", content={}, course_duration=1, course_price="0",
+        course_tutor="stress", course_image_path="/static/images/icpc.png", course_domain="stress"
+    ))
+    db.execute(insert(models.Innovator), [
+        {"fullname": "stress", "email": f"stress{i}@example.com", "hashed_password": "-", "status": "student", "language": "en"}
+        for i in range(LEARNERS)
+    ])
+    innovation_id = db.scalar(select(models.Innovation.id).where(models.Innovation.course_name == course_name))
+    db.execute(insert(models.InnovationSeats).values(innovation_id=innovation_id, capacity=CAPACITY, taken=0, last_grant=0))
+    innovator_ids = db.scalars(select(models.Innovator.id).where(models.Innovator.fullname == "stress")).all()
+    return innovation_id, innovator_ids
+
+@pytest.fixture
+def stress_course(db):
+    """
+      A capped course and its would-be learners. On SQLite everything goes through the test
+      session, on Postgres the rows are committed so every request gets its own session and
+      batches really race for the seats.
+    """
+    if is_sqlite(db):
+        innovation_id, innovator_ids = _seed(db, "Stress")
+        db.flush()
+        yield innovation_id, innovator_ids, lambda: db, db
+        return
+
+    seed_db = SessionLocal()
+    innovation_id, innovator_ids = _seed(seed_db, "Stress")
+    seed_db.commit()
+    try:
+        yield innovation_id, innovator_ids, SessionLocal, seed_db
+    finally:
+        association = models.innovation_learner_association
+        seed_db.rollback()
+        seed_db.execute(delete(association).where(association.c.innovation_id == innovation_id))
+        seed_db.execute(delete(models.InnovationSeats).where(models.InnovationSeats.innovation_id == innovation_id))
+        seed_db.execute(delete(models.Innovation).where(models.Innovation.id == innovation_id))
+        seed_db.execute(delete(models.Innovator).where(models.Innovator.id.in_(innovator_ids)))
+        seed_db.commit()
+        seed_db.close()
+
+def _burst(innovator_ids, session_factory):
+    """Enroll every innovator at once, each twice, in small batches"""
+    async def enroll_all():
+        batcher = EnrollmentBatcher(window_ms=2, max_batch=16)
+        requests = list(innovator_ids) + list(innovator_ids[::3])
+        sessions = [session_factory() for _ in requests]
+        try:
+            statuses = await asyncio.gather(*[batcher.enroll("Stress", innovator_id, session) for innovator_id, session in zip(requests, sessions)])
+        finally:
+            for session in set(sessions):
+                session.close()
+        return list(zip(requests, statuses))
+    return asyncio.run(enroll_all())
+
+def test_enrollment_burst_respects_capacity(stress_course):
+    innovation_id, innovator_ids, session_factory, db = stress_course
+    association = models.innovation_learner_association
+
+    results = _burst(innovator_ids, session_factory)
+    assert {status for _, status in results} <= {ENROLLED, ALREADY_ENROLLED, FULL}
+    assert len({innovator_id for innovator_id, status in results if status == ENROLLED}) == CAPACITY
+
+    db.expire_all()
+    enrolled = set(db.scalars(select(association.c.innovator_id).where(association.c.innovation_id == innovation_id)).all())
+    assert len(enrolled) == CAPACITY
+    assert db.scalar(select(models.InnovationSeats.taken).where(models.InnovationSeats.innovation_id == innovation_id)) == CAPACITY
+
+    # A second wave changes nothing, enrolled innovators are told so and the others find it full
+    for innovator_id, status in _burst(innovator_ids, session_factory):
+        assert status == (ALREADY_ENROLLED if innovator_id in enrolled else FULL)
+    assert db.scalar(select(func.count()).select_from(association).where(association.c.innovation_id == innovation_id)) == CAPACITY
+
+
+def test_concurrent_enrollments_share_a_small_pool(tmp_path):
+    # A file database with a pool smaller than the burst, requests holding their connection while they wait would exhaust it
+    small_engine = make_engine(f"sqlite:///{tmp_path / 'enrollment.db'}", pool_size=2, max_overflow=0, pool_timeout=2)
+    Base.metadata.create_all(bind=small_engine)
+    SmallSession = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False, bind=small_engine)
+
+    def get_small_db():
+        db = SmallSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_small_db
+    try:
+        client = TestClient(app)
+        emails = [f"burst{i}@example.com" for i in range(6)]
+        for email in emails:
+            signup(client, email)
+        tokens = [login(client, email) for email in emails]
+        create_course(client, tokens[0], "Pool Party")
+
+        async def burst():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as async_client:
+                return await asyncio.gather(*[async_client.post("/api/innovations/Pool Party/enroll", headers=token) for token in tokens])
+
+        started_at = time.monotonic()
+        responses = asyncio.run(burst())
+        assert [response.status_code for response in responses] == [201] * len(tokens)
+        assert time.monotonic() - started_at < 2
+        assert small_engine.pool.checkedout() == 0
+    finally:
+        app.dependency_overrides.clear()
+        small_engine.dispose()
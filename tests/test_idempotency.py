@@ -0,0 +1,20 @@
+from conftest import create_course
+
+
+def test_successful_enrollment_is_replayed(client, headers):
+    create_course(client, headers, "ICPC")
+    retry = {**headers, "Idempotency-Key": "enroll-icpc"}
+
+    first = client.post("/api/innovations/ICPC/enroll", headers=retry)
+    replayed = client.post("/api/innovations/ICPC/enroll", headers=retry)
+    assert first.status_code == replayed.status_code == 201
+    assert replayed.headers["idempotent-replayed"] == "true"
+
+def test_client_errors_are_not_replayed(client, headers):
+    retry = {**headers, "Idempotency-Key": "enroll-hackmit"}
+    assert client.post("/api/innovations/HackMIT/enroll", headers=retry).status_code == 404
+
+    create_course(client, headers, "HackMIT")
+    response = client.post("/api/innovations/HackMIT/enroll", headers=retry)
+    assert response.status_code == 201
+    assert "idempotent-replayed" not in response.headers
@@ -0,0 +1,65 @@
+from PIL import Image
+from conftest import create_course
+import crud.images
+import router.innovation
+import asyncio
+import io
+import os
+import pytest
+
+
+@pytest.fixture
+def image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(crud.images, "IMAGE_DIR", str(tmp_path))
+    return tmp_path
+
+def png() -> bytes:
+    body = io.BytesIO()
+    Image.new("RGB", (8, 8), "navy").save(body, "PNG")
+    return body.getvalue()
+
+def stored_files(image_dir):
+    return [path for path in image_dir.rglob("*") if path.is_file()]
+
+
+def test_upload_for_an_unknown_course_stores_nothing(client, headers, image_dir):
+    response = client.post("/api/innovations/No Such Course/image", headers=headers, content=png())
+    assert response.status_code == 404
+    assert stored_files(image_dir) == []
+
+def test_upload_for_a_course_deleted_meanwhile_is_discarded(client, headers, image_dir, monkeypatch):
+    create_course(client, headers, "ICPC")
+    scheduled = []
+    monkeypatch.setattr(router.innovation, "set_innovation_image_crud", lambda *args: False)
+    monkeypatch.setattr(router.innovation, "schedule_variants", lambda *args: scheduled.append(args))
+
+    response = client.post("/api/innovations/ICPC/image", headers=headers, content=png())
+    assert response.status_code == 404
+    assert stored_files(image_dir) == []
+    assert scheduled == []
+
+def test_malformed_content_length_is_a_bad_request(client, headers, image_dir):
+    create_course(client, headers, "ICPC")
+    for content_length in ("ten", "-1"):
+        # Sent as the client wrote it, the transport does not parse request headers
+        response = client.post("/api/innovations/ICPC/image", headers={**headers, "Content-Length": content_length}, content=png())
+        assert response.status_code == 400, content_length
+    assert stored_files(image_dir) == []
+
+def test_variants_render_in_spawned_workers(image_dir):
+    async def chunks():
+        yield png()
+
+    async def store_and_schedule():
+        image = await crud.images.store_image(chunks())
+        crud.images.schedule_variants(image["digest"], image["path"])
+        return image, crud.images._image_pool
+    try:
+        image, pool = asyncio.run(store_and_schedule())
+        assert pool._mp_context.get_start_method() == "spawn"
+    finally:
+        crud.images.shutdown_image_pool()
+
+    # The worker wrote where the server process said, not where its own settings point
+    digest = image["digest"]
+    assert {path.name for path in stored_files(image_dir)} == {os.path.basename(image["path"]), f"{digest}.thumb.webp", f"{digest}.card.webp"}
@@ -0,0 +1,175 @@
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from database.database import Base, RoutingSession, current_request_state, get_db, make_engine, LISTING_QUERY_DEADLINE_MS
+from database.metrics import query_metrics
+from models import models
+from recommender.typeahead import TypeaheadIndex
+from conftest import signup, login, create_course
+from main import app
+import database.database
+import router.innovation
+import asyncio
+import time
+
+# Counts long enough to take seconds on SQLite
+SLOW_QUERY = "WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM counter WHERE n < 10000000) SELECT count(*) FROM counter"
+
+
+def test_listings_are_reachable_with_their_deadline(client, headers, monkeypatch):
+    create_course(client, headers, "ICPC")
+    create_course(client, headers, "Swift Student Challenge", "App Development")
+
+    deadlines = []
+    def spy(crud):
+        def listing(*args):
+            deadlines.append(current_request_state.get().deadline_ms)
+            return crud(*args)
+        return listing
+    monkeypatch.setattr(router.innovation, "get_all_innovations_crud", spy(router.innovation.get_all_innovations_crud))
+    monkeypatch.setattr(router.innovation, "get_all_innovations_by_domain_crud", spy(router.innovation.get_all_innovations_by_domain_crud))
+
+    response = client.get("/api/innovations/all", headers=headers)
+    assert response.status_code == 200
+    assert {"ICPC", "Swift Student Challenge"} <= {innovation["course_name"] for innovation in response.json()}
+
+    response = client.get("/api/innovations/domain/App Development", headers=headers)
+    assert response.status_code == 200
+    assert "Swift Student Challenge" in [innovation["course_name"] for innovation in response.json()]
+    assert client.get("/api/innovations/domain/No Such Domain", headers=headers).status_code == 404
+
+    assert deadlines == [LISTING_QUERY_DEADLINE_MS] * 3
+
+
+def test_change_feed_replays_catalog_writes_in_order(client, headers, db):
+    since = db.scalar(select(func.coalesce(func.max(models.InnovationChange.id), 0)))
+    course = create_course(client, headers, "Change Feed Basics")
+    create_course(client, headers, "Tombstones 101")
+    course["course_description"] = "Now with cursors"
+    assert client.put("/api/innovations/update/Change Feed Basics", headers=headers, json=course).status_code == 200
+    assert client.delete("/api/innovations/delete/Tombstones 101", headers=headers).status_code == 200
+
+    changes, cursor = [], since
+    while True:
+        # Pages of two, resumed from the cursor each one hands back
+        response = client.get("/api/innovations/changes", params={"since": cursor, "limit": 2}, headers=headers)
+        assert response.status_code == 200
+        feed = response.json()
+        changes += feed["changes"]
+        cursor = feed["next_cursor"]
+        if not feed["has_more"]:
+            break
+
+    assert [(change["operation"], change["course_name"]) for change in changes] == [
+        ("created", "Change Feed Basics"),
+        ("created", "Tombstones 101"),
+        ("updated", "Change Feed Basics"),
+        ("deleted", "Tombstones 101")
+    ]
+    assert [change["cursor"] for change in changes] == sorted(change["cursor"] for change in changes)
+    assert cursor == changes[-1]["cursor"]
+    # Live courses carry their current state, a deleted one only its tombstone
+    assert [change["innovation"]["course_name"] for change in changes if change["course_name"] == "Change Feed Basics"] == ["Change Feed Basics"] * 2
+    assert [change["innovation"] for change in changes if change["course_name"] == "Tombstones 101"] == [None, None]
+
+    response = client.get("/api/innovations/changes", params={"since": cursor}, headers=headers)
+    assert response.json() == {"changes": [], "next_cursor": cursor, "has_more": False}
+
+
+def test_client_disconnect_cancels_a_slow_query(tmp_path, monkeypatch):
+    # Real sessions of the request on a file database, so the route can reach the connection to interrupt
+    file_engine = make_engine(f"sqlite:///{tmp_path / 'disconnect.db'}")
+    Base.metadata.create_all(bind=file_engine)
+    monkeypatch.setattr(database.database, "SessionLocal", sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False, bind=file_engine))
+    client = TestClient(app)
+    signup(client, "impatient@example.com")
+    headers = login(client, "impatient@example.com")
+
+    def slow_lookup(course_name, db, current_innovator):
+        return db.execute(text(SLOW_QUERY)).scalar()
+    monkeypatch.setattr(router.innovation, "get_innovation_by_name_crud", slow_lookup)
+
+    async def give_up_after_a_moment():
+        messages = []
+        async def receive():
+            await asyncio.sleep(0.3)
+            return {"type": "http.disconnect"}
+        async def send(message):
+            messages.append(message)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/api/innovations/Slow Course", "raw_path": b"/api/innovations/Slow%20Course", "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"authorization", headers["Authorization"].encode())],
+            "client": ("testclient", 50000), "server": ("testserver", 80)
+        }
+        await app(scope, receive, send)
+        return messages
+
+    cancellations = query_metrics.cancellations["/api/innovations/{course_name}"]
+    started_at = time.monotonic()
+    messages = asyncio.run(give_up_after_a_moment())
+    try:
+        assert messages[0]["status"] == 499
+        assert time.monotonic() - started_at < 1.5
+        assert query_metrics.snapshot()["cancellations"]["/api/innovations/{course_name}"] == cancellations + 1
+    finally:
+        file_engine.dispose()
+
+
+def test_suggestions_do_not_touch_the_database(client, headers, monkeypatch):
+    create_course(client, headers, "Typeahead Tactics", "Search")
+
+    def no_database():
+        raise AssertionError("suggestions opened a database session")
+        yield
+    monkeypatch.setitem(app.dependency_overrides, get_db, no_database)
+
+    response = client.get("/api/innovations/suggest", params={"q": "typeahed"}, headers=headers)
+    assert response.status_code == 200
+    assert "Typeahead Tactics" in [suggestion["course_name"] for suggestion in response.json()]
+    assert client.get("/api/innovations/suggest", params={"q": "typeahed"}).status_code == 401
+
+
+def test_suggestions_follow_popularity_as_it_changes():
+    index = TypeaheadIndex()
+    for innovation_id, course_name in enumerate(("Graph Theory", "Graph Databases", "Graph Neural Networks"), start=1):
+        index.upsert(innovation_id, course_name, "Computer Science")
+    index.add_popularity(3, 5)
+    index.add_popularity(2, 2)
+    assert [course["id"] for course in index.suggest("graph")] == [3, 2, 1]
+
+    index.add_popularity(3, -4)
+    index.upsert(2, "Graph Databases II", "Computer Science")
+    assert [course["id"] for course in index.suggest("graph")] == [2, 3, 1]
+    assert index._word_courses["graph"] == [(-2, 2), (-1, 3), (0, 1)]
+
+
+def test_rebuild_keeps_suggestions_available_and_catalog_writes_made_meanwhile(client, headers, db):
+    create_course(client, headers, "Rebuild Rehearsal", "Search")
+    index = TypeaheadIndex()
+    index.upsert(-1, "Deleted Meanwhile", "Search")
+
+    class ConcurrentWrites:
+        """Reads the catalog, then lets other requests write to the index before returning it"""
+        def __init__(self, query):
+            self.query_ = query
+        def outerjoin(self, *args):
+            return ConcurrentWrites(self.query_.outerjoin(*args))
+        def group_by(self, *args):
+            return ConcurrentWrites(self.query_.group_by(*args))
+        def all(self):
+            rows = self.query_.all()
+            assert not index._lock.locked()
+            index.upsert(-2, "Created Meanwhile", "Search")
+            index.remove(-1)
+            return rows
+
+    class Session:
+        def query(self, *columns):
+            return ConcurrentWrites(db.query(*columns))
+
+    index.build(Session())
+    names = {course["course_name"] for course in index.suggest("meanwhile")}
+    assert names == {"Created Meanwhile"}
+    assert "Rebuild Rehearsal" in {course["course_name"] for course in index.suggest("rehearsal")}
+    assert index._writes_during_build is None
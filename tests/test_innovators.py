@@ -0,0 +1,22 @@
+from conftest import signup, PASSWORD
+from crud import hashing
+
+
+def test_signup_with_a_taken_email_is_refused_before_hashing(client, monkeypatch):
+    signup(client, "ada@example.com")
+    hashed = []
+    monkeypatch.setattr(hashing.Hash, "argon2", staticmethod(lambda password: hashed.append(password)))
+
+    response = client.post("/api/innovators/new", json={"fullname": "Ada", "email": "ada@example.com", "status": "student", "language": "en", "password": PASSWORD})
+    assert response.status_code == 409
+    assert hashed == []
+
+
+def test_batch_reports_missing_emails_as_sent(client, headers):
+    signup(client, "grace@example.com", "Grace Hopper")
+
+    response = client.post("/api/innovators/batch", json={"emails": ["grace@EXAMPLE.com", "Nobody@EXAMPLE.com", "grace@example.com"]}, headers=headers)
+    assert response.status_code == 200
+    assert [innovator["email"] for innovator in response.json()["innovators"]] == ["grace@example.com"]
+    assert response.json()["missing"] == ["Nobody@EXAMPLE.com"]
+    assert client.post("/api/innovators/batch", json={"emails": ["not an email"]}, headers=headers).status_code == 422
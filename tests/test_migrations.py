@@ -0,0 +1,25 @@
+from sqlalchemy import inspect, text
+from database.database import engine
+from database.migrations import upgrade_schema, ADDED_INDEXES
+
+
+def test_upgrade_adds_what_create_all_leaves_out():
+    # DDL is transactional on both backends, so the old schema is recreated and rolled back
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            for _, index_name in ADDED_INDEXES:
+                connection.execute(text(f"DROP INDEX {index_name}"))
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("ALTER TABLE innovation_learner_association DROP COLUMN enrolled_at"))
+
+            # A second run finds everything in place
+            upgrade_schema(connection)
+            upgrade_schema(connection)
+
+            inspector = inspect(connection)
+            assert "enrolled_at" in {column["name"] for column in inspector.get_columns("innovation_learner_association")}
+            for table_name, index_name in ADDED_INDEXES:
+                assert index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+        finally:
+            transaction.rollback()
@@ -0,0 +1,28 @@
+from conftest import create_course
+from crud.pages import page_cache
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_pages():
+    page_cache.clear()
+    yield
+    page_cache.clear()
+
+def test_page_etag_is_weak_and_revalidates(client, headers):
+    create_course(client, headers, "ICPC")
+    page_cache.invalidate()
+
+    response = client.get("/catalog", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["content-encoding"] == "gzip"
+    assert "ICPC" in response.text
+
+    assert client.get("/catalog", headers={"If-None-Match": f'"stale", {etag}'}).status_code == 304
+    assert client.get("/catalog", headers={"If-None-Match": etag.removeprefix("W/")}).status_code == 304
+    assert client.get("/catalog", headers={"If-None-Match": f'W/"{etag[3:-1]}-stale"'}).status_code == 200
+
+def test_only_the_catalog_embeds_the_course_data(client):
+    assert 'id="catalog-data"' in client.get("/catalog").text
+    assert 'id="catalog-data"' not in client.get("/home").text
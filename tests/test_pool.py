@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from database.database import Base, RoutingSession, TimedQueuePool, make_engine
+from conftest import signup, login, create_course
+from main import app
+import database.database
+import router.innovation
+import sqlite3
+import threading
+import time
+
+
+def slow_connect():
+    time.sleep(0.05)
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+def test_opening_a_connection_is_not_waiting():
+    pool = TimedQueuePool(slow_connect, pool_size=5, max_overflow=10)
+    connection = pool.connect()
+    assert pool.waiting == 0
+    assert pool.checkout_wait_ms() == 0.0
+    connection.close()
+
+def test_exhausted_pool_reports_waiting_checkouts():
+    pool = TimedQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=5)
+    held = pool.connect()
+    waiter = threading.Thread(target=lambda: pool.connect().close())
+    waiter.start()
+
+    time.sleep(0.1)
+    assert pool.waiting == 1
+    held.close()
+    waiter.join()
+
+    assert pool.waiting == 0
+    assert pool.checkout_wait_ms() >= 50
+
+
+def test_request_connections_are_back_in_the_pool_before_rendering(tmp_path, monkeypatch):
+    # Real request sessions on a file database, whose pool counts what is checked out
+    file_engine = make_engine(f"sqlite:///{tmp_path / 'release.db'}")
+    Base.metadata.create_all(bind=file_engine)
+    monkeypatch.setattr(database.database, "SessionLocal", sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False, bind=file_engine))
+    client = TestClient(app)
+    signup(client, "render@example.com")
+    headers = login(client, "render@example.com")
+    create_course(client, headers, "Render Later")
+
+    checked_out = {}
+    class RenderProbe:
+        """Stands in for an innovation, noting the checked out connections when the response reads it"""
+        def __init__(self, innovation):
+            self.innovation = innovation
+        def __getattr__(self, name):
+            checked_out.setdefault("rendering", file_engine.pool.checkedout())
+            return getattr(self.innovation, name)
+
+    listing = router.innovation.get_all_innovations_crud
+    def probed_listing(db, current_innovator):
+        innovations = listing(db, current_innovator)
+        checked_out["querying"] = file_engine.pool.checkedout()
+        return [RenderProbe(innovation) for innovation in innovations]
+    monkeypatch.setattr(router.innovation, "get_all_innovations_crud", probed_listing)
+
+    transactions = []
+    event.listen(file_engine, "commit", lambda connection: transactions.append("commit"))
+    event.listen(file_engine, "rollback", lambda connection: transactions.append("rollback"))
+    try:
+        response = client.get("/api/innovations/all", headers=headers)
+        assert response.status_code == 200
+        assert [innovation["course_name"] for innovation in response.json()] == ["Render Later"]
+        assert checked_out == {"querying": 1, "rendering": 0}
+        # The read-only transaction was committed, not left to be rolled back at teardown
+        assert transactions == ["commit"]
+    finally:
+        file_engine.dispose()
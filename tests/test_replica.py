@@ -0,0 +1,90 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select, text
+from starlette.requests import Request
+from database.database import RoutingSession, get_db, make_engine, READ_PRIMARY_HEADER
+import database.database
+import pytest
+import threading
+
+metadata = MetaData()
+servers = Table("servers", metadata, Column("id", Integer, primary_key=True), Column("name", String))
+replica_lag = Table("replica_lag", metadata, Column("seconds", Integer))
+
+
+@pytest.fixture
+def primary_and_replica(monkeypatch):
+    """Two in-memory SQLite databases, each naming itself, the replica reporting its lag from a table"""
+    primary, replica = make_engine("sqlite://"), make_engine("sqlite://")
+    for name, server in (("primary", primary), ("replica", replica)):
+        with server.begin() as connection:
+            metadata.create_all(connection)
+            connection.execute(insert(servers).values(name=name))
+            connection.execute(insert(replica_lag).values(seconds=0))
+
+    monkeypatch.setattr(database.database, "engine", primary)
+    monkeypatch.setattr(database.database, "replica_engine", replica)
+    monkeypatch.setattr(database.database, "REPLICA_LAG_QUERY", text("SELECT seconds FROM replica_lag"))
+    monkeypatch.setattr(database.database, "REPLICA_LAG_CHECK_SECONDS", 0)
+    monkeypatch.setattr(database.database, "_replica_state", (float("-inf"), False))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+def server_names(db):
+    return db.execute(select(servers.c.name).order_by(servers.c.id)).scalars().all()
+
+def request_with(headers: dict) -> Request:
+    return Request({"type": "http", "headers": [(name.encode(), value.encode()) for name, value in headers.items()]})
+
+
+def test_reads_go_to_the_replica_and_writes_to_the_primary(primary_and_replica):
+    primary, _ = primary_and_replica
+    with RoutingSession(bind=primary) as db:
+        assert server_names(db) == ["replica"]
+        db.commit()
+
+        db.execute(insert(servers).values(name="written"))
+        # Once written, the session reads its own writes from the primary
+        assert server_names(db) == ["primary", "written"]
+        db.rollback()
+
+def test_read_primary_header_pins_the_session_to_the_primary(primary_and_replica, monkeypatch):
+    primary, _ = primary_and_replica
+    monkeypatch.setattr(database.database, "SessionLocal", lambda: RoutingSession(bind=primary))
+
+    for headers, expected in (({}, ["replica"]), ({READ_PRIMARY_HEADER: "true"}, ["primary"])):
+        sessions = get_db(request_with(headers))
+        assert server_names(next(sessions)) == expected
+        sessions.close()
+
+def test_lagging_replica_falls_back_to_the_primary(primary_and_replica):
+    primary, replica = primary_and_replica
+    with replica.begin() as connection:
+        connection.execute(replica_lag.update().values(seconds=database.database.MAX_REPLICA_LAG_SECONDS + 1))
+    with RoutingSession(bind=primary) as db:
+        assert server_names(db) == ["primary"]
+
+    with replica.begin() as connection:
+        connection.execute(replica_lag.update().values(seconds=0))
+    with RoutingSession(bind=primary) as db:
+        assert server_names(db) == ["replica"]
+
+def test_one_lag_check_at_a_time(primary_and_replica, monkeypatch):
+    checks, started, release = [], threading.Event(), threading.Event()
+    connect = database.database.replica_engine.connect
+    def slow_connect():
+        checks.append(threading.get_ident())
+        started.set()
+        release.wait(5)
+        return connect()
+    monkeypatch.setattr(database.database.replica_engine, "connect", slow_connect)
+
+    checking = threading.Thread(target=database.database.replica_available)
+    checking.start()
+    started.wait(5)
+    # Others keep the cached answer instead of queueing up another check
+    assert [database.database.replica_available() for _ in range(3)] == [False] * 3
+    release.set()
+    checking.join()
+
+    assert len(checks) == 1
+    assert database.database._replica_state[1] is True
@@ -0,0 +1,35 @@
+from conftest import create_course
+import crud.innovation
+
+
+def test_versioned_section_is_privately_immutable(client, headers):
+    create_course(client, headers, "ICPC")
+    etag = client.get("/api/innovations/ICPC/sections/intro", headers=headers).headers["etag"]
+
+    response = client.get("/api/innovations/ICPC/sections/intro", params={"v": etag.strip('"')}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+def test_if_none_match_is_parsed(client, headers):
+    create_course(client, headers, "ICPC")
+    etag = client.get("/api/innovations/ICPC/sections/intro", headers=headers).headers["etag"]
+    opaque = etag.strip('"')
+
+    def status(if_none_match: str) -> int:
+        return client.get("/api/innovations/ICPC/sections/intro", headers={**headers, "If-None-Match": if_none_match}).status_code
+
+    assert status(etag) == 304
+    assert status(f'"stale", W/{etag}') == 304
+    assert status("*") == 304
+    assert status(f'"{opaque}-stale"') == 200
+    assert status(f'"stale{opaque}"') == 200
+    assert status(opaque) == 200
+
+def test_section_metadata_cache_is_bounded(client, headers, monkeypatch):
+    monkeypatch.setattr(crud.innovation, "SECTION_METADATA_CACHE_SIZE", 2)
+    monkeypatch.setattr(crud.innovation, "_section_metadata_cache", crud.innovation.OrderedDict())
+    for course_name in ("ICPC", "HackMIT", "TreeHacks"):
+        create_course(client, headers, course_name)
+        assert client.get(f"/api/innovations/{course_name}/sections", headers=headers).status_code == 200
+
+    assert list(crud.innovation._section_metadata_cache) == ["HackMIT", "TreeHacks"]